@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'anbargar.settings')
+os.environ.setdefault('ANBARGAR_ASYNC_VIEWS', '1')
+os.environ.setdefault('ANBARGAR_STREAM', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Serve /api/stream/ on the event loop rather than a thread per connection.
+from home.stream import StreamRouter  # noqa: E402
+
+application = StreamRouter(django_application)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'home.metrics.MetricsMiddleware',
+    'home.slowlog.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,13 +79,34 @@ WSGI_APPLICATION = 'anbargar.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# ANBARGAR_DB_PROFILE=production keeps connections open between requests,
+# starts transactions with the write lock (so concurrent writers queue on
+# busy_timeout instead of failing with "database is locked" when a read
+# transaction upgrades) and applies SQLITE_PRAGMAS to every new connection
+# (see home.signals.configure_sqlite). "development" keeps SQLite defaults.
+DB_PROFILE = os.environ.get('ANBARGAR_DB_PROFILE', 'development')
+if DB_PROFILE not in ('development', 'production'):
+    raise ImproperlyConfigured('ANBARGAR_DB_PROFILE must be "development" or "production".')
+PRODUCTION_DB = DB_PROFILE == 'production'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600 if PRODUCTION_DB else 0,
+        'CONN_HEALTH_CHECKS': PRODUCTION_DB,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if PRODUCTION_DB else {},
     }
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.environ.get('ANBARGAR_SQLITE_MMAP_MB', 256)) * 1024 * 1024,
+    'cache_size': -int(os.environ.get('ANBARGAR_SQLITE_CACHE_MB', 64)) * 1024,
+    'busy_timeout': int(os.environ.get('ANBARGAR_SQLITE_BUSY_TIMEOUT_MS', 10000)),
+} if PRODUCTION_DB else {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,3 +153,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/auth/'
 LOGIN_REDIRECT_URL = '/dashboard/'
+
+# Route the read-heavy API endpoints to the async views in home/async_views.py.
+# anbargar/asgi.py turns this on; leave it off under WSGI.
+ASYNC_API_VIEWS = os.environ.get('ANBARGAR_ASYNC_VIEWS') == '1'
+
+# Group commit: event POSTs are queued to one writer thread per process that
+# commits concurrent submissions together (home/writer.py). Off unless
+# ANBARGAR_GROUP_COMMIT=1.
+GROUP_COMMIT = os.environ.get('ANBARGAR_GROUP_COMMIT') == '1'
+GROUP_COMMIT_MAX_BATCH = 100
+GROUP_COMMIT_TIMEOUT = 30
+
+# Cache behind the catalog read-through cache (home/catalog_cache.py). Entries
+# are keyed by the business's catalog version, so a process never serves a
+# list older than the last committed item, unit or folder write. The local-memory cache is per process;
+# set ANBARGAR_CACHE_DIR to share a file-based cache between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['ANBARGAR_CACHE_DIR'],
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    } if os.environ.get('ANBARGAR_CACHE_DIR') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'anbargar',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+CATALOG_CACHE_TIMEOUT = 3600
+
+# /api/stream/ (home/stream.py): seconds between reads of the subscribed
+# businesses' versions, which catch writes made by other processes, and the
+# threads that run the stream's auth and stats queries under ASGI.
+STREAM_POLL_SECONDS = float(os.environ.get('ANBARGAR_STREAM_POLL_SECONDS', 5))
+STREAM_DB_THREADS = 4
+
+# The dashboard only opens /api/stream/ when this is on: under WSGI every open
+# stream holds a worker thread. anbargar/asgi.py turns it on.
+STREAM_ENABLED = os.environ.get('ANBARGAR_STREAM') == '1'
+
+# Bearer token accepted by /api/metrics/ in addition to staff users' API tokens.
+METRICS_TOKEN = os.environ.get('ANBARGAR_METRICS_TOKEN')
+
+# Slow-query log: statements slower than the threshold (ms) are written with
+# their EXPLAIN output to a rotating JSONL file. Disabled when unset.
+SLOW_QUERY_THRESHOLD_MS = float(os.environ['ANBARGAR_SLOW_QUERY_MS']) if os.environ.get('ANBARGAR_SLOW_QUERY_MS') else None
+SLOW_QUERY_LOG_PATH = BASE_DIR / 'logs' / 'slow_queries.jsonl'
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+# Bound parameters carry customer names, phones and tokens, so they are only
+# logged with ANBARGAR_SLOW_QUERY_LOG_PARAMS=1; otherwise just their count.
+SLOW_QUERY_LOG_PARAMS = os.environ.get('ANBARGAR_SLOW_QUERY_LOG_PARAMS') == '1'
@@ -2,11 +2,13 @@ from django.contrib import admin
 
 from .models import (
     Business,
+    BusinessStats,
     Customer,
     Event,
     EventItem,
     Folder,
     FolderItem,
+    InventorySnapshot,
     Item,
     ItemImage,
     ItemUnit,
@@ -16,6 +18,7 @@ from .models import (
 
 
 admin.site.register(Business)
+admin.site.register(BusinessStats)
 admin.site.register(Otp)
 admin.site.register(Folder)
 admin.site.register(Item)
@@ -26,3 +29,4 @@ admin.site.register(FolderItem)
 admin.site.register(Customer)
 admin.site.register(Event)
 admin.site.register(EventItem)
+admin.site.register(InventorySnapshot)
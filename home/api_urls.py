@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# Under ASGI (see anbargar/asgi.py) the read-heavy routes use native async views.
+read_views = async_views if settings.ASYNC_API_VIEWS else views
 
 
 urlpatterns = [
@@ -9,18 +13,28 @@ urlpatterns = [
     path("auth/session-token/", views.api_session_token, name="api_session_token"),
     path("otp/send/", views.api_send_otp, name="api_send_otp"),
     path("otp/verify/", views.api_verify_otp, name="api_verify_otp"),
-    path("dashboard/stats/", views.api_dashboard_stats, name="api_dashboard_stats"),
+    path("dashboard/stats/", read_views.api_dashboard_stats, name="api_dashboard_stats"),
+    path("bootstrap/", views.api_bootstrap, name="api_bootstrap"),
     path("folders/", views.api_folders, name="api_folders"),
     path("folders/<uuid:folder_id>/", views.api_folder_detail, name="api_folder_detail"),
-    path("items/", views.api_items, name="api_items"),
+    path("folders/<uuid:folder_id>/rollup/", views.api_folder_rollup, name="api_folder_rollup"),
+    path("folders/<uuid:folder_id>/merge/", views.api_folder_merge, name="api_folder_merge"),
+    path("items/", read_views.api_items, name="api_items"),
+    path("items/lookup/", views.api_items_lookup, name="api_items_lookup"),
     path("items/<uuid:item_id>/", views.api_item_detail, name="api_item_detail"),
     path("units/", views.api_units, name="api_units"),
     path("units/<uuid:unit_id>/", views.api_unit_detail, name="api_unit_detail"),
     path("customers/", views.api_customers, name="api_customers"),
     path("customers/<uuid:customer_id>/", views.api_customer_detail, name="api_customer_detail"),
-    path("events/", views.api_events, name="api_events"),
+    path("events/", read_views.api_events, name="api_events"),
+    path("events/bulk/", views.api_events_bulk, name="api_events_bulk"),
     path("events/<uuid:event_id>/", views.api_event_detail, name="api_event_detail"),
-    path("inventory/", views.api_inventory, name="api_inventory"),
+    path("inventory/", read_views.api_inventory, name="api_inventory"),
+    path("export/<str:dataset>.<str:fmt>", views.api_export, name="api_export"),
+    path("search/", views.api_search, name="api_search"),
+    path("sync/", views.api_sync, name="api_sync"),
+    path("stream/", views.api_stream, name="api_stream"),
+    path("metrics/", views.api_metrics, name="api_metrics"),
     path("upload/", views.api_upload, name="api_upload"),
-    path("ai/predict-stockout/", views.api_ai_predict_stockout, name="api_ai_predict_stockout"),
+    path("ai/predict-stockout/", read_views.api_ai_predict_stockout, name="api_ai_predict_stockout"),
 ]
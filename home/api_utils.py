@@ -20,3 +20,9 @@ def decode_access_token(token):
         )
     except signing.BadSignature:
         return None
+
+
+def get_access_token_expiry(token):
+    """Return the unix time after which a (valid) token is rejected."""
+    timestamp = token.rsplit(":", 2)[1]
+    return signing.b62_decode(timestamp) + int(timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES).total_seconds())
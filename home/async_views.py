@@ -0,0 +1,221 @@
+"""Native async variants of the read-heavy API views, routed under ASGI.
+
+They share parsing, filtering and serialization with ``views`` and use the
+async ORM, so a cached principal and a page of rows cost no thread hop for
+the view itself. Writes are delegated to the sync views.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import views
+from .api_utils import decode_access_token
+from .catalog_cache import acached_list
+from .metrics import phase
+from .models import Business, Event, FolderItem, Item
+from .principals import cache_principal, get_cached_principal
+from .stats import aget_business_stats
+from .versions import aget_versions, version_etag
+from .views import (
+    _error,
+    _filter_events,
+    _filter_inventory,
+    _get_bearer_token,
+    _json_response,
+    _mark_revalidate,
+    _page_response,
+    _paginate,
+    _serialize_event,
+    _serialize_inventory_entry,
+    _serialize_item,
+    _stockout_clock,
+    _stockout_predictions,
+    _stockout_querysets,
+)
+
+
+async def _aget_current_user(request):
+    with phase("auth"):
+        return await _aauthenticate_bearer(request)
+
+
+async def _aauthenticate_bearer(request):
+    token = _get_bearer_token(request)
+    if not token:
+        return None, _error("Authentication required.", status=401)
+
+    principal = get_cached_principal(token)
+    if principal:
+        return principal[0], None
+
+    payload = decode_access_token(token)
+    if not payload or "user_id" not in payload:
+        return None, _error("Invalid token.", status=401)
+
+    # Both lookups only need the token's user id.
+    user, business = await asyncio.gather(
+        User.objects.filter(id=payload["user_id"]).afirst(),
+        Business.objects.filter(users__id=payload["user_id"]).order_by("id").afirst(),
+    )
+    if user is None:
+        return None, _error("User not found.", status=401)
+
+    user._primary_business = business or await _acreate_business(user)
+    cache_principal(token, user, user._primary_business)
+    return user, None
+
+
+async def _aensure_business(user):
+    business = getattr(user, "_primary_business", None)
+    if business is None:
+        business = await user.businesses.afirst()
+    return business or await _acreate_business(user)
+
+
+async def _acreate_business(user):
+    business = await Business.objects.acreate(name="My Business")
+    await business.users.aadd(user)
+    return business
+
+
+def _business_condition(clock=None):
+    """``views._versioned(views._business_etag)`` for async views.
+
+    ``clock`` returns an extra ETag part, like ``views._stockout_clock``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = await _aversion_etag(request, *([clock()] if clock else []))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag:
+                response.headers.setdefault("ETag", etag)
+            return _mark_revalidate(response)
+
+        return inner
+
+    return decorator
+
+
+async def _aversion_etag(request, *parts):
+    if request.method not in ("GET", "HEAD"):
+        return None
+    user, error = await _aget_current_user(request)
+    if error:
+        return None
+    business = await _aensure_business(user)
+    # The catalog version comes along for the catalog cache key.
+    version, request.catalog_version = await aget_versions(business.id)
+    return version_etag(business.id, version, *parts)
+
+
+async def _alist_response(request, queryset, serialize):
+    queryset, limit, error = _paginate(request, queryset)
+    if error:
+        return error
+    return _page_response([obj async for obj in queryset], limit, serialize)
+
+
+@require_http_methods(["GET"])
+@_business_condition()
+async def api_dashboard_stats(request):
+    user, error = await _aget_current_user(request)
+    if error:
+        return error
+
+    business = await _aensure_business(user)
+
+    stats = await aget_business_stats(business)
+    stats["total_value"] = int(stats["total_value"])
+    return _json_response(stats)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@_business_condition()
+async def api_items(request):
+    if request.method == "POST":
+        return await sync_to_async(views.api_items)(request)
+
+    user, error = await _aget_current_user(request)
+    if error:
+        return error
+
+    business = await _aensure_business(user)
+    queryset = Item.objects.filter(business=business)
+    return await acached_list("items", business.id, request, lambda: _alist_response(request, queryset, _serialize_item))
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@_business_condition()
+async def api_events(request):
+    if request.method == "POST":
+        return await sync_to_async(views.api_events)(request)
+
+    user, error = await _aget_current_user(request)
+    if error:
+        return error
+
+    business = await _aensure_business(user)
+    try:
+        events = _filter_events(request, Event.objects.filter(business=business))
+    except ValueError as exc:
+        return _error(str(exc))
+    return await _alist_response(request, events, _serialize_event)
+
+
+@require_http_methods(["GET"])
+@_business_condition()
+async def api_inventory(request):
+    user, error = await _aget_current_user(request)
+    if error:
+        return error
+
+    business = await _aensure_business(user)
+
+    if "as_of" in request.GET:
+        # Replaying the ledger is CPU-bound; keep it off the event loop.
+        return await sync_to_async(views._inventory_as_of_response)(request, business)
+
+    entries = FolderItem.objects.filter(folder__business=business).select_related("item", "folder")
+    try:
+        if request.GET.get("subtree") in ("1", "true"):
+            # The subtree filter looks up the folder path with the sync ORM.
+            entries = await sync_to_async(_filter_inventory)(request, entries, business)
+        else:
+            entries = _filter_inventory(request, entries, business)
+    except ValueError as exc:
+        return _error(str(exc))
+    return await _alist_response(request, entries, _serialize_inventory_entry)
+
+
+@require_http_methods(["GET"])
+@_business_condition(_stockout_clock)
+async def api_ai_predict_stockout(request):
+    user, error = await _aget_current_user(request)
+    if error:
+        return error
+
+    business = await _aensure_business(user)
+
+    try:
+        days_history = int(request.GET.get("days_history", 30))
+    except ValueError:
+        return _error("days_history must be an integer.")
+
+    on_hand, daily_sales = _stockout_querysets(business, days_history)
+    on_hand, daily_sales = await asyncio.gather(_alist(on_hand), _alist(daily_sales))
+    return _json_response(_stockout_predictions(on_hand, daily_sales))
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
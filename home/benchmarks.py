@@ -0,0 +1,449 @@
+import asyncio
+import itertools
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .api_utils import create_access_token
+from .models import Customer, Event, Folder, Item, Otp, Unit
+
+# Routes deliberately left out of the benchmark, with the reason.
+EXCLUDED_ROUTES = {
+    "api_upload": "writes files to MEDIA_ROOT on every call",
+    "api_metrics": "operational endpoint, needs the metrics token or a staff user",
+    "api_stream": "long-lived event stream; it never completes",
+}
+
+_phones = itertools.count()
+
+
+def _unique_phone():
+    return f"0998{next(_phones) % 10 ** 7:07d}"
+
+
+def _create_otp(context):
+    phone = _unique_phone()
+    Otp.objects.create(phone=phone, code="123456", expires_at=timezone.now() + timedelta(minutes=2))
+    return {"phone": phone, "code": "123456"}
+
+
+def _event_payload(context):
+    return {
+        "type": "SELL",
+        "folder_id": str(context["folder"].id),
+        "items": [
+            {"item_id": str(item.id), "name": item.name, "quantity": 1}
+            for item in context["items"]
+        ],
+    }
+
+
+def build_scenarios(context):
+    """Describe one request per route in ``home/api_urls.py``.
+
+    ``budget`` is the maximum number of SQL statements a warm request (the
+    principal cache already populated) may issue; GETs include the data
+    version read behind their ETag. ``data`` may be a callable
+    that runs inside the rolled-back transaction before the request is timed.
+    """
+    folder, item, unit, customer, event = (
+        context["folder"],
+        context["item"],
+        context["unit"],
+        context["customer"],
+        context["event"],
+    )
+    return [
+        {"name": "api_register", "method": "post", "url": reverse("api_register"), "budget": 7, "auth": False,
+         "data": lambda ctx: {"phone": _unique_phone(), "name": "Bench", "password": "benchmark"}},
+        {"name": "api_login", "method": "post", "url": reverse("api_login"), "budget": 1, "auth": False,
+         "data": lambda ctx: {"phone": ctx["user"].username, "password": ctx["password"]}},
+        {"name": "api_session_token", "method": "get", "url": reverse("api_session_token"), "budget": 3,
+         "auth": False, "session": True},
+        {"name": "api_send_otp", "method": "post", "url": reverse("api_send_otp"), "budget": 2, "auth": False,
+         "data": lambda ctx: {"phone": _unique_phone()}},
+        {"name": "api_verify_otp", "method": "post", "url": reverse("api_verify_otp"), "budget": 8, "auth": False,
+         "data": _create_otp},
+        {"name": "api_dashboard_stats", "method": "get", "url": reverse("api_dashboard_stats"), "budget": 2},
+        {"name": "api_bootstrap", "method": "get", "url": reverse("api_bootstrap"), "budget": 5},
+        {"name": "api_bootstrap:page", "method": "get", "url": reverse("api_bootstrap"), "budget": 5,
+         "params": {"limit": 100}},
+        {"name": "api_bootstrap:stats", "method": "get", "url": reverse("api_bootstrap"), "budget": 2,
+         "params": {"include": "stats"}},
+        {"name": "api_folders", "method": "get", "url": reverse("api_folders"), "budget": 2},
+        {"name": "api_folders:page", "method": "get", "url": reverse("api_folders"), "budget": 2,
+         "params": {"limit": 100}},
+        {"name": "api_folder_detail", "method": "get", "url": reverse("api_folder_detail", args=[folder.id]),
+         "budget": 2},
+        {"name": "api_folder_rollup", "method": "get", "url": reverse("api_folder_rollup", args=[folder.id]),
+         "budget": 3},
+        {"name": "api_folder_merge", "method": "post", "url": reverse("api_folder_merge", args=[context["leaf"].id]),
+         "budget": 39, "data": lambda ctx: {"target_id": str(ctx["folder"].id)}},
+        {"name": "api_items", "method": "get", "url": reverse("api_items"), "budget": 2},
+        {"name": "api_items:page", "method": "get", "url": reverse("api_items"), "budget": 2,
+         "params": {"limit": 100}},
+        {"name": "api_items_lookup", "method": "get", "url": reverse("api_items_lookup"), "budget": 1,
+         "params": {"barcode": item.barcode}},
+        {"name": "api_items_lookup:batch", "method": "get", "url": reverse("api_items_lookup"), "budget": 1,
+         "params": {"barcode": [i.barcode for i in context["items"]], "sku": [i.sku for i in context["items"]]}},
+        {"name": "api_item_detail", "method": "get", "url": reverse("api_item_detail", args=[item.id]),
+         "budget": 2},
+        {"name": "api_units", "method": "get", "url": reverse("api_units"), "budget": 2},
+        {"name": "api_unit_detail", "method": "get", "url": reverse("api_unit_detail", args=[unit.id]),
+         "budget": 2},
+        {"name": "api_customers", "method": "get", "url": reverse("api_customers"), "budget": 2},
+        {"name": "api_customers:page", "method": "get", "url": reverse("api_customers"), "budget": 2,
+         "params": {"limit": 100}},
+        {"name": "api_customer_detail", "method": "get",
+         "url": reverse("api_customer_detail", args=[customer.id]), "budget": 2},
+        {"name": "api_events", "method": "get", "url": reverse("api_events"), "budget": 2},
+        {"name": "api_events:filtered", "method": "get", "url": reverse("api_events"), "budget": 2,
+         "params": {"type": "SELL", "limit": 100}},
+        {"name": "api_events:create", "method": "post", "url": reverse("api_events"),
+         "budget": 12 + len(context["items"]), "data": _event_payload},
+        {"name": "api_events_bulk", "method": "post", "url": reverse("api_events_bulk"), "budget": 16,
+         "data": lambda ctx: {"events": [_event_payload(ctx) for _ in range(20)]}},
+        {"name": "api_event_detail", "method": "patch", "url": reverse("api_event_detail", args=[event.id]),
+         "budget": 5, "data": lambda ctx: {"description": "benchmark"}},
+        {"name": "api_inventory", "method": "get", "url": reverse("api_inventory"), "budget": 2},
+        {"name": "api_inventory:page", "method": "get", "url": reverse("api_inventory"), "budget": 2,
+         "params": {"limit": 100, "max_quantity": 5}},
+        {"name": "api_inventory:as_of", "method": "get", "url": reverse("api_inventory"), "budget": 5,
+         "params": {"as_of": (timezone.now() - timedelta(days=1)).isoformat()}},
+        {"name": "api_export:inventory", "method": "get",
+         "url": reverse("api_export", args=["inventory", "ndjson"]), "budget": 2},
+        {"name": "api_export:events", "method": "get", "url": reverse("api_export", args=["events", "csv"]),
+         "budget": 2},
+        {"name": "api_search", "method": "get", "url": reverse("api_search"), "budget": 4,
+         "params": {"q": item.name}},
+        {"name": "api_search:customers", "method": "get", "url": reverse("api_search"), "budget": 3,
+         "params": {"q": (customer.phone or customer.first_name)[:4], "type": "customers"}},
+        {"name": "api_sync", "method": "get", "url": reverse("api_sync"), "budget": 8,
+         "params": {"since": 0, "limit": 100}},
+        {"name": "api_sync:caught_up", "method": "get", "url": reverse("api_sync"), "budget": 2,
+         "params": {"since": 2 ** 62}},
+        {"name": "api_ai_predict_stockout", "method": "get", "url": reverse("api_ai_predict_stockout"), "budget": 3},
+    ]
+
+
+def build_context(business, user, password):
+    folder = Folder.objects.filter(business=business).order_by("created_at").first()
+    items = list(Item.objects.filter(business=business).order_by("created_at")[:5])
+    return {
+        "business": business,
+        "user": user,
+        "password": password,
+        "folder": folder,
+        "leaf": Folder.objects.filter(business=business).order_by("-created_at").first(),
+        "items": items,
+        "item": items[0] if items else None,
+        "unit": Unit.objects.filter(business=business).first(),
+        "customer": Customer.objects.filter(business=business).first(),
+        "event": Event.objects.filter(business=business).first(),
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _send(client, scenario, context, headers):
+    data = scenario.get("data")
+    if callable(data):
+        data = data(context)
+
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        if scenario["method"] == "get":
+            response = client.get(scenario["url"], scenario.get("params"), **headers)
+        else:
+            response = getattr(client, scenario["method"])(
+                scenario["url"], data, content_type="application/json", **headers
+            )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.content
+    elapsed = time.perf_counter() - started
+    return response, elapsed, queries
+
+
+def run_benchmarks(business, user, password="benchmark", iterations=20, only=None, host="localhost"):
+    """Time every scenario and count its queries; writes are rolled back.
+
+    Returns a dict keyed by scenario name with latency percentiles (ms), the
+    worst query count seen and whether it stayed within budget.
+    """
+    context = build_context(business, user, password)
+    token_headers = {"HTTP_AUTHORIZATION": f"Bearer {create_access_token(user.id)}"}
+    client = Client(SERVER_NAME=host)
+    session_client = Client(SERVER_NAME=host)
+    session_client.force_login(user)
+    results = {}
+
+    for scenario in build_scenarios(context):
+        if only and scenario["name"].split(":")[0] not in only and scenario["name"] not in only:
+            continue
+
+        scenario_client = session_client if scenario.get("session") else client
+        headers = token_headers if scenario.get("auth", True) else {}
+        timings = []
+        query_counts = []
+        status = None
+
+        # The first pass warms the principal cache and is not recorded.
+        for iteration in range(iterations + 1):
+            with transaction.atomic():
+                response, elapsed, queries = _send(scenario_client, scenario, context, headers)
+                transaction.set_rollback(True)
+            status = response.status_code
+            if iteration:
+                timings.append(elapsed * 1000)
+                query_counts.append(len(queries))
+
+        worst = max(query_counts) if query_counts else 0
+        results[scenario["name"]] = {
+            "method": scenario["method"].upper(),
+            "path": scenario["url"],
+            "status": status,
+            "iterations": iterations,
+            "p50_ms": round(percentile(timings, 0.5), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "max_ms": round(max(timings), 3) if timings else 0.0,
+            "queries": worst,
+            "query_budget": scenario["budget"],
+            "within_budget": worst <= scenario["budget"],
+        }
+
+    return results
+
+
+CONTENTION_READS = (
+    ("api_dashboard_stats", {}),
+    ("api_inventory", {"limit": 100}),
+    ("api_items", {"limit": 100}),
+    ("api_events", {"limit": 50}),
+)
+
+
+def database_profile():
+    """Settings and pragmas in effect, so contention runs can be compared."""
+    with connection.cursor() as cursor:
+        pragmas = {}
+        for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+            cursor.execute(f"PRAGMA {name}")
+            pragmas[name] = cursor.fetchone()[0]
+    return {
+        "profile": getattr(settings, "DB_PROFILE", None),
+        "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+        "transaction_mode": connection.settings_dict.get("OPTIONS", {}).get("transaction_mode"),
+        **pragmas,
+    }
+
+
+def run_contention(business, user, readers=8, writers=2, duration=10.0, host="localhost"):
+    """Hammer the database with concurrent dashboard reads and event writes.
+
+    Each worker thread has its own connection and calls
+    ``close_old_connections`` after every request the way the request
+    cycle does, so ``CONN_MAX_AGE`` takes effect. Writes are committed.
+    Returns per-role throughput, latency percentiles (ms) and the number of
+    requests that failed with a locked database or a 5xx.
+    """
+    context = build_context(business, user, None)
+    headers = {"HTTP_AUTHORIZATION": f"Bearer {create_access_token(user.id)}"}
+    reads = [(reverse(name), params) for name, params in CONTENTION_READS]
+    event_url = reverse("api_events")
+    payload = {
+        "type": "BUY",
+        "folder_id": str(context["folder"].id),
+        "items": [{"item_id": str(item.id), "name": item.name, "quantity": 1} for item in context["items"][:2]],
+    }
+
+    def read(client, count):
+        url, params = reads[count % len(reads)]
+        return client.get(url, params, **headers)
+
+    def write(client, count):
+        return client.post(event_url, payload, content_type="application/json", **headers)
+
+    barrier = threading.Barrier(readers + writers)
+    samples = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def worker(role, send):
+        # The test client re-raises exceptions through a process-wide signal,
+        # which would blame one thread's error on every client; count 5xx instead.
+        client = Client(SERVER_NAME=host, raise_request_exception=False)
+        timings = []
+        failed = 0
+        try:
+            barrier.wait()
+            deadline = time.perf_counter() + duration
+            count = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                ok = send(client, count).status_code < 500
+                close_old_connections()
+                timings.append((time.perf_counter() - started) * 1000)
+                failed += not ok
+                count += 1
+        finally:
+            connection.close()
+            with lock:
+                samples[role].extend(timings)
+                errors[role] += failed
+
+    threads = [threading.Thread(target=worker, args=("read", read)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", write)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {"database": database_profile(), "duration_s": duration, "readers": readers, "writers": writers}
+    for role, timings in samples.items():
+        results[role] = {
+            "requests": len(timings),
+            "per_second": round(len(timings) / duration, 1),
+            "p50_ms": round(percentile(timings, 0.5), 3),
+            "p99_ms": round(percentile(timings, 0.99), 3),
+            "errors": errors[role],
+        }
+    return results
+
+
+# The routes that have native async variants (home/async_views.py).
+ASYNC_READS = CONTENTION_READS
+
+
+async def _asgi_get(app, path, params, headers, host):
+    """Send one GET through the ASGI handler the way a server would; returns the status."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(params).encode(),
+        "headers": [(b"host", host.encode())] + [(name.encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 0),
+        "server": (host, 80),
+    }
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The handler listens for a disconnect until the response is sent.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def run_read_load(business, user, handler="wsgi", concurrency=32, duration=10.0, host="localhost"):
+    """Hold ``concurrency`` dashboard reads in flight and report throughput and latency.
+
+    ``wsgi`` runs one test client per thread, like a threaded WSGI server;
+    ``asgi`` runs that many tasks on one event loop against Django's
+    ``ASGIHandler``. Which views serve the async-capable routes follows
+    ``ASYNC_API_VIEWS``. Requests cycle through ``ASYNC_READS``.
+    """
+    token = create_access_token(user.id)
+    reads = [(reverse(name), params) for name, params in ASYNC_READS]
+    samples = []
+    errors = 0
+
+    if handler == "asgi":
+        app = ASGIHandler()
+        headers = [("authorization", f"Bearer {token}")]
+
+        async def worker(deadline):
+            nonlocal errors
+            count = 0
+            while time.perf_counter() < deadline:
+                path, params = reads[count % len(reads)]
+                started = time.perf_counter()
+                status = await _asgi_get(app, path, params, headers, host)
+                samples.append((time.perf_counter() - started) * 1000)
+                errors += status is None or status >= 400
+                count += 1
+
+        async def main():
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(*(worker(deadline) for _ in range(concurrency)))
+
+        asyncio.run(main())
+    elif handler == "wsgi":
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+        barrier = threading.Barrier(concurrency)
+        lock = threading.Lock()
+
+        def worker():
+            nonlocal errors
+            client = Client(SERVER_NAME=host, raise_request_exception=False)
+            timings = []
+            failed = 0
+            try:
+                barrier.wait()
+                deadline = time.perf_counter() + duration
+                count = 0
+                while time.perf_counter() < deadline:
+                    path, params = reads[count % len(reads)]
+                    started = time.perf_counter()
+                    failed += client.get(path, params, **headers).status_code >= 400
+                    close_old_connections()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    count += 1
+            finally:
+                connection.close()
+                with lock:
+                    samples.extend(timings)
+                    errors += failed
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        raise ValueError(f"Unknown handler {handler!r}.")
+
+    return {
+        "handler": handler,
+        "async_views": getattr(settings, "ASYNC_API_VIEWS", False),
+        "database": database_profile(),
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "requests": len(samples),
+        "per_second": round(len(samples) / duration, 1),
+        "p50_ms": round(percentile(samples, 0.5), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "errors": errors,
+    }
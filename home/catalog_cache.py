@@ -0,0 +1,77 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .metrics import registry
+from .versions import aget_versions, get_versions
+
+CACHE_METRIC = "anbargar_catalog_cache_requests_total"
+CACHE_METRIC_HELP = "Catalog list reads by cache result."
+
+
+def request_generation(request, business_id):
+    """Catalog version of ``business_id`` for this request.
+
+    The ETag check has usually read it already (``catalog_version`` on the
+    request); otherwise it is read from the database. It lives in the
+    database, so an item, unit or folder write in one worker process
+    invalidates the lists cached by all of them, and only those writes move
+    it, so sales and purchases leave the lists cached.
+    """
+    version = getattr(request, "catalog_version", None)
+    return get_versions(business_id)[1] if version is None else version
+
+
+async def arequest_generation(request, business_id):
+    version = getattr(request, "catalog_version", None)
+    return (await aget_versions(business_id))[1] if version is None else version
+
+
+def _entry_key(kind, business_id, generation, request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f"catalog:{kind}:{business_id.hex}:{generation}:{digest}"
+
+
+def _hit(kind, body):
+    registry.increment(CACHE_METRIC, CACHE_METRIC_HELP, kind=kind, result="hit")
+    return HttpResponse(body, content_type="application/json")
+
+
+def _miss(kind):
+    registry.increment(CACHE_METRIC, CACHE_METRIC_HELP, kind=kind, result="miss")
+
+
+def cached_list(kind, business_id, request, build):
+    """Serve a list response from the cache, calling ``build()`` on a miss.
+
+    Entries hold the encoded JSON body, keyed by business, catalog version
+    and query string, so a hit skips the query, serialization and encoding.
+    Only 200 responses are stored.
+    """
+    key = _entry_key(kind, business_id, request_generation(request, business_id), request)
+    body = cache.get(key)
+    if body is not None:
+        return _hit(kind, body)
+    _miss(kind)
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.content, settings.CATALOG_CACHE_TIMEOUT)
+    return response
+
+
+async def acached_list(kind, business_id, request, build):
+    """``cached_list`` for async views; ``build`` is a coroutine function."""
+    key = _entry_key(kind, business_id, await arequest_generation(request, business_id), request)
+    body = await cache.aget(key)
+    if body is not None:
+        return _hit(kind, body)
+    _miss(kind)
+    response = await build()
+    if response.status_code == 200:
+        await cache.aset(key, response.content, settings.CATALOG_CACHE_TIMEOUT)
+    return response
+
@@ -0,0 +1,122 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_CHUNK_SIZE = 2000
+
+# dataset -> (output column, queryset lookup)
+EXPORT_FIELDS = {
+    "inventory": [
+        ("id", "id"),
+        ("folder_id", "folder_id"),
+        ("folder_name", "folder__name"),
+        ("item_id", "item_id"),
+        ("item_name", "item__name"),
+        ("quantity", "quantity"),
+        ("unit", "unit"),
+        ("updated_at", "updated_at"),
+    ],
+    "items": [
+        ("id", "id"),
+        ("name", "name"),
+        ("sku", "sku"),
+        ("barcode", "barcode"),
+        ("description", "description"),
+        ("value", "value"),
+        ("has_qr_code", "has_qr_code"),
+        ("created_at", "created_at"),
+    ],
+    "units": [
+        ("id", "id"),
+        ("name", "name"),
+        ("symbol", "symbol"),
+        ("description", "description"),
+        ("created_at", "created_at"),
+    ],
+    "folders": [
+        ("id", "id"),
+        ("name", "name"),
+        ("description", "description"),
+        ("parent_id", "parent_id"),
+        ("created_at", "created_at"),
+    ],
+    "customers": [
+        ("id", "id"),
+        ("first_name", "first_name"),
+        ("last_name", "last_name"),
+        ("phone", "phone"),
+        ("email", "email"),
+        ("address", "address"),
+        ("created_at", "created_at"),
+    ],
+    "events": [
+        ("id", "id"),
+        ("type", "type"),
+        ("description", "description"),
+        ("folder_id", "folder_id"),
+        ("origin_folder_id", "origin_folder_id"),
+        ("destination_folder_id", "destination_folder_id"),
+        ("customer_id", "customer_id"),
+        ("created_at", "created_at"),
+    ],
+}
+
+EVENT_ITEM_FIELDS = ["id", "item_id", "name", "sku", "barcode", "quantity", "unit", "value"]
+
+
+class _Echo:
+    """File-like object that hands back whatever csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(dataset, queryset):
+    """Stream rows of a dataset as dicts, reading the table in chunks."""
+    fields = EXPORT_FIELDS[dataset]
+    rows = queryset.order_by("created_at", "id").values(*[lookup for _, lookup in fields])
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {column: row[lookup] for column, lookup in fields}
+
+
+def export_event_rows(queryset):
+    """Stream events with their ``EventItem`` lines nested under ``items``."""
+    fields = EXPORT_FIELDS["events"]
+    events = queryset.order_by("created_at", "id").prefetch_related("event_items")
+    for event in events.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = {column: getattr(event, lookup) for column, lookup in fields}
+        row["items"] = [
+            {field: getattr(event_item, field) for field in EVENT_ITEM_FIELDS}
+            for event_item in event.event_items.all()
+        ]
+        yield row
+
+
+def export_columns(dataset, include_items=False):
+    columns = [column for column, _ in EXPORT_FIELDS[dataset]]
+    if include_items:
+        columns += [f"item_{field}" for field in EVENT_ITEM_FIELDS]
+    return columns
+
+
+def _flatten_event_rows(rows):
+    for row in rows:
+        lines = row.pop("items")
+        for line in lines or [{}]:
+            yield {**row, **{f"item_{field}": line.get(field) for field in EVENT_ITEM_FIELDS}}
+
+
+def ndjson_stream(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def csv_stream(rows, columns, include_items=False):
+    """Encode rows as CSV; nested event lines become one row per line."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    if include_items:
+        rows = _flatten_event_rows(rows)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
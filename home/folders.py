@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import F, FloatField, Q, Sum, Value
+from django.db.models.functions import Concat, Substr
+
+from .inventory import apply_inventory_deltas
+from .models import Event, Folder, FolderItem, InventorySnapshot
+from .sync import record_queryset
+
+
+class FolderTreeError(ValueError):
+    pass
+
+
+def build_path(folder, parent=None):
+    """Materialized path of ``folder``: ``/<root hex>/.../<own hex>/``."""
+    prefix = parent.path if parent is not None else "/"
+    return f"{prefix}{folder.id.hex}/"
+
+
+def subtree_filter(path, prefix=""):
+    """Match folders whose path starts with ``path`` as an indexable range.
+
+    ``/`` sorts right before ``0``, so every descendant path lies in
+    ``[path, path[:-1] + "0")`` under SQLite's default binary collation.
+    """
+    return Q(**{f"{prefix}path__gte": path, f"{prefix}path__lt": path[:-1] + "0"})
+
+
+def subtree(folder):
+    return Folder.objects.filter(subtree_filter(folder.path), business_id=folder.business_id)
+
+
+def is_in_subtree(folder, root):
+    return folder.path.startswith(root.path)
+
+
+def check_parent(folder, parent):
+    if parent is not None and folder.path and is_in_subtree(parent, folder):
+        raise FolderTreeError("A folder cannot be moved under itself or its descendants.")
+
+
+def rebase_paths(queryset, old_prefix, new_prefix):
+    """Swap ``old_prefix`` for ``new_prefix`` on every path in ``queryset`` in one UPDATE."""
+    return queryset.update(path=Concat(Value(new_prefix), Substr("path", len(old_prefix) + 1)))
+
+
+def subtree_rollup(folder):
+    """Stock and value per item across ``folder`` and all its descendants."""
+    rows = (
+        FolderItem.objects.filter(subtree_filter(folder.path, prefix="folder__"), folder__business_id=folder.business_id)
+        .values("item_id", "item__name")
+        .annotate(
+            total_quantity=Sum("quantity"),
+            total_value=Sum(F("quantity") * F("item__value"), output_field=FloatField()),
+        )
+        .order_by("item__name")
+    )
+    return list(rows)
+
+
+def merge_folders(source, target):
+    """Fold ``source`` into ``target`` and delete it.
+
+    Child folders are re-parented, stock is added to ``target`` and events
+    that referenced ``source`` point at ``target`` so the ledger still
+    replays to the same totals.
+    """
+    if source.pk == target.pk:
+        raise FolderTreeError("A folder cannot be merged into itself.")
+    check_parent(source, target)
+
+    with transaction.atomic():
+        rebase_paths(subtree(source).exclude(pk=source.pk), source.path, target.path)
+        record_queryset("folders", Folder.objects.filter(parent=source))
+        Folder.objects.filter(parent=source).update(parent=target)
+
+        deltas = {}
+        units = {}
+        for item_id, quantity, unit in FolderItem.objects.filter(folder=source).values_list("item_id", "quantity", "unit"):
+            deltas[(target.id, item_id)] = quantity
+            units[(target.id, item_id)] = unit
+        apply_inventory_deltas(deltas, units)
+
+        Event.objects.filter(folder=source).update(folder=target)
+        Event.objects.filter(origin_folder=source).update(origin_folder=target)
+        Event.objects.filter(destination_folder=source).update(destination_folder=target)
+        InventorySnapshot.objects.filter(business_id=source.business_id).delete()
+
+        source.delete()
+    target.refresh_from_db()
+    return target
+
+
+def delete_subtree(folder):
+    with transaction.atomic():
+        return subtree(folder).delete()
@@ -0,0 +1,146 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import EventType, FolderItem
+from .stats import apply_inventory_change, summarize_inventory_keys
+from .sync import record_inventory_keys
+
+# Keeps each UPDATE well below SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+
+def event_legs(event):
+    """Return the ``(folder_id, direction)`` pairs an event moves stock through."""
+    if event.type == EventType.BUY and event.folder_id:
+        return [(event.folder_id, 1)]
+    if event.type == EventType.SELL and event.folder_id:
+        return [(event.folder_id, -1)]
+    if event.type == EventType.MOVE and (event.origin_folder_id or event.destination_folder_id):
+        # One side is missing only once its folder was deleted; the other still moved.
+        legs = [(event.origin_folder_id, -1), (event.destination_folder_id, 1)]
+        return [(folder_id, direction) for folder_id, direction in legs if folder_id]
+    return []
+
+
+def collect_event_deltas(event, event_items, deltas=None, units=None, reverse=False):
+    """Accumulate net quantity changes per ``(folder_id, item_id)`` for an event.
+
+    ``deltas`` and ``units`` may be passed in to merge several events into a
+    single pass over ``apply_inventory_deltas``.
+    """
+    deltas = {} if deltas is None else deltas
+    units = {} if units is None else units
+    sign = -1 if reverse else 1
+    legs = event_legs(event)
+
+    for event_item in event_items:
+        if not event_item.item_id:
+            continue
+        for folder_id, direction in legs:
+            key = (folder_id, event_item.item_id)
+            deltas[key] = deltas.get(key, 0) + sign * direction * event_item.quantity
+            if not units.get(key):
+                units[key] = event_item.unit
+
+    return deltas, units
+
+
+class DeltaRuns:
+    """Net the deltas of consecutive events into runs that apply like the events one by one.
+
+    ``apply_inventory_deltas`` clamps each row at zero once, after the whole
+    net change. That matches applying the events in order only while no
+    event adds stock to a row an earlier event of the run took stock from
+    (``+10, -15, +5`` is 5 one by one but 0 netted), so such an event starts
+    a new run. Rows that receive stock in a run are created even when the run
+    nets to zero for them, as the first event would have.
+    """
+
+    def __init__(self):
+        self.runs = []
+        self._start()
+
+    def _start(self):
+        self.deltas, self.units, self.created, self.lowered = {}, {}, set(), set()
+        self.runs.append((self.deltas, self.units, self.created))
+
+    def add(self, event, event_items):
+        deltas, units = collect_event_deltas(event, event_items)
+        if any(delta > 0 and key in self.lowered for key, delta in deltas.items()):
+            self._start()
+        for key, delta in deltas.items():
+            if delta > 0:
+                self.created.add(key)
+            elif delta < 0:
+                self.lowered.add(key)
+            self.deltas[key] = self.deltas.get(key, 0) + delta
+            if not self.units.get(key):
+                self.units[key] = units[key]
+
+    def apply(self):
+        for deltas, units, created in self.runs:
+            apply_inventory_deltas(deltas, units, create=created)
+
+
+def apply_inventory_deltas(deltas, units=None, create=None):
+    """Apply net quantity changes to ``FolderItem`` rows with atomic updates.
+
+    Missing rows that would receive stock (or are listed in ``create``) are
+    inserted first (conflicts are ignored, so concurrent writers cannot
+    duplicate them), then every row is adjusted in the database as
+    ``MAX(quantity + delta, 0)``. Subtracting from a row that does not exist
+    is a no-op. The dashboard stats rollup is moved by the difference in the
+    touched rows.
+    """
+    units = units or {}
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if create is None:
+        create = {key for key, delta in deltas.items() if delta > 0}
+
+    keys = list(dict.fromkeys([*deltas, *create]))
+    if not keys:
+        return
+
+    changed = list(deltas)
+    now = timezone.now()
+
+    with transaction.atomic():
+        before = summarize_inventory_keys(keys)
+
+        FolderItem.objects.bulk_create(
+            [
+                FolderItem(folder_id=folder_id, item_id=item_id, quantity=0, unit=units.get((folder_id, item_id)) or "unit")
+                for folder_id, item_id in keys
+                if (folder_id, item_id) in create
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+        for start in range(0, len(changed), BATCH_SIZE):
+            batch = changed[start:start + BATCH_SIZE]
+            match = Q()
+            whens = []
+            for folder_id, item_id in batch:
+                condition = Q(folder_id=folder_id, item_id=item_id)
+                match |= condition
+                whens.append(When(condition, then=Value(float(deltas[(folder_id, item_id)]))))
+
+            FolderItem.objects.filter(match).update(
+                quantity=Greatest(
+                    F("quantity") + Case(*whens, default=Value(0.0), output_field=FloatField()),
+                    Value(0.0),
+                ),
+                updated_at=now,
+            )
+
+        record_inventory_keys(keys)
+        apply_inventory_change(before, summarize_inventory_keys(keys))
+
+
+def apply_event_inventory(event, event_items, reverse=False):
+    """Apply (or with ``reverse`` undo) the stock movements of a single event."""
+    deltas, units = collect_event_deltas(event, event_items, reverse=reverse)
+    apply_inventory_deltas(deltas, units)
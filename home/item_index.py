@@ -0,0 +1,85 @@
+import threading
+import time
+
+from .models import Item
+from .text import normalize_text
+
+ITEM_INDEX_TTL_SECONDS = 60
+ITEM_INDEX_MAX_BUSINESSES = 200
+
+# business_id -> ItemIndex
+_indexes = {}
+# business_id -> invalidation counter, so a build racing a write is not kept
+_generations = {}
+_lock = threading.Lock()
+
+
+def normalize_barcode(code):
+    return str(code).strip()
+
+
+def normalize_sku(code):
+    return str(code).strip().casefold()
+
+
+class ItemIndex:
+    """Items of one business keyed by barcode, SKU and normalized name.
+
+    When several items share a SKU the oldest wins; names map to every
+    matching item id so callers can tell ambiguous names apart.
+    """
+
+    __slots__ = ("by_barcode", "by_sku", "by_name", "expires_at")
+
+    def __init__(self, items, expires_at):
+        self.by_barcode = {}
+        self.by_sku = {}
+        self.by_name = {}
+        self.expires_at = expires_at
+        for item in items:
+            if item.barcode:
+                self.by_barcode[normalize_barcode(item.barcode)] = item
+            if item.sku:
+                self.by_sku.setdefault(normalize_sku(item.sku), item)
+            self.by_name.setdefault(normalize_text(item.name), []).append(item.id)
+
+    def resolve_name(self, name):
+        """Return the id of the only item with this name, or ``None``."""
+        matches = self.by_name.get(normalize_text(name), ())
+        return matches[0] if len(matches) == 1 else None
+
+
+def get_item_index(business_id):
+    """Return the ``ItemIndex`` of a business, building it with one query.
+
+    It is kept until an item of the business is written (see
+    ``invalidate_item_index``) or the TTL passes, which bounds staleness
+    from writes made by other processes.
+    """
+    now = time.time()
+    index = _indexes.get(business_id)
+    if index is not None and index.expires_at > now:
+        return index
+
+    generation = _generations.get(business_id, 0)
+    items = Item.objects.filter(business_id=business_id).order_by("created_at", "id").iterator(chunk_size=2000)
+    index = ItemIndex(items, now + ITEM_INDEX_TTL_SECONDS)
+
+    with _lock:
+        if _generations.get(business_id, 0) == generation:
+            while len(_indexes) >= ITEM_INDEX_MAX_BUSINESSES and business_id not in _indexes:
+                del _indexes[next(iter(_indexes))]
+            _indexes[business_id] = index
+    return index
+
+
+def invalidate_item_index(business_id):
+    with _lock:
+        _indexes.pop(business_id, None)
+        _generations[business_id] = _generations.get(business_id, 0) + 1
+
+
+def clear_item_indexes():
+    with _lock:
+        _indexes.clear()
+        _generations.clear()
@@ -0,0 +1,261 @@
+import itertools
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .inventory import BATCH_SIZE, collect_event_deltas
+from .models import EventItem, FolderItem, InventorySnapshot, InventorySnapshotLine
+from .stats import rebuild_business_stats
+from .sync import record_inventory_keys
+from .versions import bump_version
+
+REPLAY_CHUNK_SIZE = 5000
+SNAPSHOT_BATCH_SIZE = 2000
+QUANTITY_TOLERANCE = 1e-6
+
+LedgerEvent = namedtuple("LedgerEvent", "type folder_id origin_folder_id destination_folder_id")
+LedgerLine = namedtuple("LedgerLine", "item_id quantity unit")
+
+_LEDGER_COLUMNS = (
+    "event__created_at",
+    "event_id",
+    "event__type",
+    "event__folder_id",
+    "event__origin_folder_id",
+    "event__destination_folder_id",
+    "item_id",
+    "quantity",
+    "unit",
+)
+
+
+class LedgerState:
+    """Quantities per ``(folder_id, item_id)`` after replaying events up to ``position``.
+
+    Events are applied one at a time with the same rules as
+    ``apply_inventory_deltas``: a row is created by its first positive
+    movement and never drops below zero.
+    """
+
+    def __init__(self, quantities=None, units=None, position=None, events=0):
+        self.quantities = quantities if quantities is not None else {}
+        self.units = units if units is not None else {}
+        self.position = position
+        self.events = events
+
+    def apply(self, deltas, units):
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+            current = self.quantities.get(key)
+            if current is None:
+                if delta <= 0:
+                    continue
+                current = 0.0
+                self.units[key] = units.get(key) or "unit"
+            self.quantities[key] = max(current + delta, 0.0)
+
+
+def ledger_lines(business, after=None, until=None):
+    """Stream stock-moving event lines in ledger order as raw ``_LEDGER_COLUMNS`` rows.
+
+    The SQL comes from the ORM but rows are read straight off the cursor:
+    building UUID and datetime objects for every line dominated replay time,
+    so callers convert only the values they keep (see ``_as_uuid``).
+    """
+    lines = EventItem.objects.filter(event__business=business, item__isnull=False)
+    if after is not None:
+        created_at, event_id = after
+        # The plain range bound lets SQLite seek the index; the OR alone cannot.
+        lines = lines.filter(
+            Q(event__created_at__gt=created_at) | Q(event__created_at=created_at, event_id__gt=event_id),
+            event__created_at__gte=created_at,
+        )
+    if until is not None:
+        lines = lines.filter(event__created_at__lte=until)
+    return _raw_rows(lines.order_by("event__created_at", "event_id").values_list(*_LEDGER_COLUMNS))
+
+
+def _raw_rows(queryset):
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(REPLAY_CHUNK_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+
+def _as_uuid(value, cache):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    converted = cache.get(value)
+    if converted is None:
+        converted = cache[value] = uuid.UUID(value)
+    return converted
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def replay_ledger(business, state=None, until=None, checkpoint=None, checkpoint_every=100000):
+    """Replay the event ledger of ``business`` on top of ``state``.
+
+    Only events after ``state.position`` (and up to ``until``) are read, in
+    streamed chunks, so memory is bounded by the number of stock rows rather
+    than the ledger size. ``checkpoint(state)`` is called every
+    ``checkpoint_every`` events.
+    """
+    state = state or LedgerState()
+    ids = {}
+    rows = ledger_lines(business, after=state.position, until=until)
+    position = None
+
+    for position, event_rows in itertools.groupby(rows, key=lambda row: (row[0], row[1])):
+        event = None
+        lines = []
+        for row in event_rows:
+            if event is None:
+                event = LedgerEvent(row[2], _as_uuid(row[3], ids), _as_uuid(row[4], ids), _as_uuid(row[5], ids))
+            lines.append(LedgerLine(_as_uuid(row[6], ids), row[7], row[8]))
+
+        deltas, units = collect_event_deltas(event, lines)
+        state.apply(deltas, units)
+        state.events += 1
+        if checkpoint and state.events % checkpoint_every == 0:
+            state.position = (_as_datetime(position[0]), _as_uuid(position[1], {}))
+            checkpoint(state)
+
+    if position is not None:
+        state.position = (_as_datetime(position[0]), _as_uuid(position[1], {}))
+    return state
+
+
+def save_snapshot(business, state):
+    with transaction.atomic():
+        snapshot = InventorySnapshot.objects.create(
+            business=business,
+            as_of=state.position[0],
+            last_event_id=state.position[1],
+            events_replayed=state.events,
+        )
+        InventorySnapshotLine.objects.bulk_create(
+            [
+                InventorySnapshotLine(
+                    snapshot=snapshot,
+                    folder_id=folder_id,
+                    item_id=item_id,
+                    quantity=quantity,
+                    unit=state.units.get((folder_id, item_id)) or "unit",
+                )
+                for (folder_id, item_id), quantity in state.quantities.items()
+            ],
+            batch_size=SNAPSHOT_BATCH_SIZE,
+        )
+    return snapshot
+
+
+def latest_snapshot(business, at=None):
+    """Return the newest snapshot, or the newest one taken at or before ``at``."""
+    snapshots = InventorySnapshot.objects.filter(business=business)
+    if at is not None:
+        snapshots = snapshots.filter(as_of__lte=at)
+    return snapshots.order_by("-as_of", "-last_event_id").first()
+
+
+def load_snapshot(snapshot):
+    quantities = {}
+    units = {}
+    ids = {}
+    lines = snapshot.lines.values_list("folder_id", "item_id", "quantity", "unit")
+    for folder_id, item_id, quantity, unit in _raw_rows(lines):
+        key = (_as_uuid(folder_id, ids), _as_uuid(item_id, ids))
+        quantities[key] = quantity
+        units[key] = unit
+    return LedgerState(
+        quantities,
+        units,
+        position=(snapshot.as_of, snapshot.last_event_id),
+        events=snapshot.events_replayed,
+    )
+
+
+def inventory_as_of(business, at):
+    """Replay stock up to ``at`` from the nearest earlier snapshot.
+
+    Only events between that snapshot and ``at`` are read, so the cost tracks
+    the time since the last checkpoint rather than the size of the ledger.
+    """
+    snapshot = latest_snapshot(business, at=at)
+    state = load_snapshot(snapshot) if snapshot else LedgerState()
+    return replay_ledger(business, state, until=at)
+
+
+def diff_inventory(business, state):
+    """Yield ``((folder_id, item_id), stored, rebuilt)`` where ``FolderItem`` disagrees.
+
+    ``stored`` is ``None`` for rows the ledger creates but that do not exist;
+    rows with no ledger history are compared against zero.
+    """
+    seen = set()
+    rows = FolderItem.objects.filter(folder__business=business).values_list("folder_id", "item_id", "quantity")
+    for folder_id, item_id, quantity in rows.iterator(chunk_size=REPLAY_CHUNK_SIZE):
+        key = (folder_id, item_id)
+        seen.add(key)
+        rebuilt = state.quantities.get(key, 0.0)
+        if abs(quantity - rebuilt) > QUANTITY_TOLERANCE:
+            yield key, quantity, rebuilt
+
+    for key, rebuilt in state.quantities.items():
+        if key not in seen:
+            yield key, None, rebuilt
+
+
+def apply_rebuilt_inventory(business, differences, state):
+    """Write replayed quantities over drifted ``FolderItem`` rows and refresh the stats rollup."""
+    differences = list(differences)
+    now = timezone.now()
+
+    with transaction.atomic():
+        FolderItem.objects.bulk_create(
+            [
+                FolderItem(
+                    folder_id=folder_id,
+                    item_id=item_id,
+                    quantity=rebuilt,
+                    unit=state.units.get((folder_id, item_id)) or "unit",
+                )
+                for (folder_id, item_id), stored, rebuilt in differences
+                if stored is None
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+        existing = [(key, rebuilt) for key, stored, rebuilt in differences if stored is not None]
+        for start in range(0, len(existing), BATCH_SIZE):
+            batch = dict(existing[start:start + BATCH_SIZE])
+            match = Q()
+            for folder_id, item_id in batch:
+                match |= Q(folder_id=folder_id, item_id=item_id)
+            rows = list(FolderItem.objects.filter(match))
+            for row in rows:
+                row.quantity = batch[(row.folder_id, row.item_id)]
+                row.updated_at = now
+            FolderItem.objects.bulk_update(rows, ["quantity", "updated_at"])
+
+        record_inventory_keys([key for key, stored, rebuilt in differences])
+        rebuild_business_stats(business)
+        bump_version(business.id)
+    return len(differences)
@@ -0,0 +1,79 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from home.benchmarks import run_benchmarks
+from home.models import Business
+
+
+class Command(BaseCommand):
+    help = (
+        "Hit every API route through the test client against an existing tenant and record "
+        "p50/p95 latency and query counts. Fails when an endpoint exceeds its query budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--business", help="Business id to benchmark (default: most recently created).")
+        parser.add_argument("--password", default="benchmark", help="Password of the business user, for api_login.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--only", nargs="*", help="Limit the run to these route names.")
+        parser.add_argument("--host", default="localhost", help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against a previous --output file.")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by("-created_at")
+        if options["business"]:
+            businesses = businesses.filter(id=options["business"])
+        business = businesses.first()
+        if not business:
+            raise CommandError("No business found; run generate_tenant first.")
+        user = business.users.order_by("id").first()
+        if not user:
+            raise CommandError(f"Business {business.id} has no users.")
+
+        results = run_benchmarks(
+            business,
+            user,
+            password=options["password"],
+            iterations=options["iterations"],
+            only=options["only"],
+            host=options["host"],
+        )
+
+        baseline = {}
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as handle:
+                baseline = json.load(handle).get("endpoints", {})
+
+        self.stdout.write(f"{'endpoint':32} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'budget':>7}")
+        for name, result in results.items():
+            line = (
+                f"{name:32} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+                f"{result['queries']:8} {result['query_budget']:7}"
+            )
+            previous = baseline.get(name)
+            if previous and previous.get("p50_ms"):
+                line += f"  p50 {100 * (result['p50_ms'] / previous['p50_ms'] - 1):+.0f}%"
+            if not result["within_budget"]:
+                line = self.style.ERROR(line + "  OVER BUDGET")
+            self.stdout.write(line)
+
+        if options["output"]:
+            report = {
+                "generated_at": timezone.now().isoformat(),
+                "business_id": str(business.id),
+                "iterations": options["iterations"],
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "endpoints": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, indent=2)
+
+        over_budget = [name for name, result in results.items() if not result["within_budget"]]
+        if over_budget:
+            raise CommandError("Query budget exceeded: " + ", ".join(over_budget))
@@ -0,0 +1,70 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from home.benchmarks import run_read_load
+from home.models import Business
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep concurrent reads of the async-capable routes in flight against an existing tenant "
+        "and report throughput and p50/p99 latency, through the WSGI or the ASGI handler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--business", help="Business id to use (default: most recently created).")
+        parser.add_argument(
+            "--handler",
+            choices=("wsgi", "asgi"),
+            help="Request handler (default: asgi when ANBARGAR_ASYNC_VIEWS=1, else wsgi).",
+        )
+        parser.add_argument("--concurrency", type=int, default=32, help="Requests kept in flight.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run.")
+        parser.add_argument("--host", default="localhost", help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against a previous --output file.")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by("-created_at")
+        if options["business"]:
+            businesses = businesses.filter(id=options["business"])
+        business = businesses.first()
+        if not business:
+            raise CommandError("No business found; run generate_tenant first.")
+        user = business.users.order_by("id").first()
+        if not user:
+            raise CommandError(f"Business {business.id} has no users.")
+
+        handler = options["handler"] or ("asgi" if settings.ASYNC_API_VIEWS else "wsgi")
+        result = run_read_load(
+            business,
+            user,
+            handler=handler,
+            concurrency=options["concurrency"],
+            duration=options["duration"],
+            host=options["host"],
+        )
+
+        baseline = {}
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as handle:
+                baseline = json.load(handle)
+
+        self.stdout.write(
+            f"handler={result['handler']}, async_views={result['async_views']}, "
+            + ", ".join(f"{key}={value}" for key, value in result["database"].items())
+        )
+        self.stdout.write(f"{'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        line = f"{result['per_second']:9.1f} {result['p50_ms']:9.2f} {result['p99_ms']:9.2f} {result['errors']:7}"
+        if baseline.get("per_second"):
+            line += f"  req/s {100 * (result['per_second'] / baseline['per_second'] - 1):+.0f}%"
+        if baseline.get("p99_ms"):
+            line += f"  p99 {100 * (result['p99_ms'] / baseline['p99_ms'] - 1):+.0f}%"
+        self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(result, handle, indent=2)
+            self.stdout.write(f"Wrote {options['output']}.")
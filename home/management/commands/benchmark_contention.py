@@ -0,0 +1,70 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.benchmarks import run_contention
+from home.models import Business
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent dashboard reads and event writes against an existing tenant and report "
+        "throughput, p50/p99 latency and locked-database errors. Writes are committed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--business", help="Business id to use (default: most recently created).")
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run.")
+        parser.add_argument("--host", default="localhost", help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against a previous --output file.")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by("-created_at")
+        if options["business"]:
+            businesses = businesses.filter(id=options["business"])
+        business = businesses.first()
+        if not business:
+            raise CommandError("No business found; run generate_tenant first.")
+        user = business.users.order_by("id").first()
+        if not user:
+            raise CommandError(f"Business {business.id} has no users.")
+        if not business.folders.exists() or not business.items.exists():
+            raise CommandError(f"Business {business.id} needs at least one folder and item.")
+
+        results = run_contention(
+            business,
+            user,
+            readers=options["readers"],
+            writers=options["writers"],
+            duration=options["duration"],
+            host=options["host"],
+        )
+
+        baseline = {}
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as handle:
+                baseline = json.load(handle)
+
+        database = results["database"]
+        self.stdout.write(", ".join(f"{key}={value}" for key, value in database.items()))
+        self.stdout.write(f"{'role':6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for role in ("read", "write"):
+            result = results[role]
+            line = (
+                f"{role:6} {result['per_second']:9.1f} {result['p50_ms']:9.2f} "
+                f"{result['p99_ms']:9.2f} {result['errors']:7}"
+            )
+            previous = baseline.get(role)
+            if previous and previous.get("per_second"):
+                line += f"  req/s {100 * (result['per_second'] / previous['per_second'] - 1):+.0f}%"
+            if previous and previous.get("p99_ms"):
+                line += f"  p99 {100 * (result['p99_ms'] / previous['p99_ms'] - 1):+.0f}%"
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Wrote {options['output']}.")
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.sync import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sync journal rows superseded by a later change of the same row. "
+        "Lossless: clients at any cursor still receive every row changed after it."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = compact()
+        self.stdout.write(f"Deleted {count} superseded changes in {time.perf_counter() - started:.1f}s.")
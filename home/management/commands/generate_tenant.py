@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from home.synthetic import generate_tenant
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic tenants (business, user, folders, items, customers and event history) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--businesses", type=int, default=1)
+        parser.add_argument("--folders", type=int, default=20, help="Folders per business.")
+        parser.add_argument("--fanout", type=int, default=5, help="Child folders per parent folder.")
+        parser.add_argument("--items", type=int, default=1000)
+        parser.add_argument("--customers", type=int, default=500)
+        parser.add_argument("--events", type=int, default=10000)
+        parser.add_argument("--lines-per-event", type=int, default=3, help="Maximum lines per event.")
+        parser.add_argument("--days", type=int, default=365, help="Spread the event history over this many days.")
+        parser.add_argument("--password", default="benchmark", help="Password for the generated users.")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        for index in range(options["businesses"]):
+            seed = None if options["seed"] is None else options["seed"] + index
+            business, user = generate_tenant(
+                name=f"Benchmark Business {index + 1}",
+                password=options["password"],
+                folders=options["folders"],
+                fanout=options["fanout"],
+                items=options["items"],
+                customers=options["customers"],
+                events=options["events"],
+                lines_per_event=options["lines_per_event"],
+                days=options["days"],
+                seed=seed,
+                log=lambda message: self.stdout.write(f"  {message}"),
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Business {business.id} ready; log in as {user.username} / {options['password']}.")
+            )
@@ -0,0 +1,55 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.models import Business, BusinessStats
+from home.stats import STATS_FIELDS, compute_business_stats, rebuild_business_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-business dashboard stats rollup and report drift against a fresh aggregate."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--business", help="Only rebuild the business with this id.")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only verify the stored stats; exit with an error if any business has drifted.",
+        )
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by("created_at")
+        if options["business"]:
+            businesses = businesses.filter(id=options["business"])
+            if not businesses.exists():
+                raise CommandError(f"Business {options['business']} not found.")
+
+        stored_by_business = {
+            row["business_id"]: row
+            for row in BusinessStats.objects.values("business_id", *STATS_FIELDS)
+        }
+        drifted = 0
+
+        for business in businesses.iterator():
+            stored = stored_by_business.get(business.id)
+            fresh = compute_business_stats(business) if options["check"] else rebuild_business_stats(business)
+
+            if stored is None:
+                self.stdout.write(f"{business.id} ({business.name}): no stored stats")
+                drifted += 1
+                continue
+
+            differences = [
+                f"{field} {stored[field]} -> {fresh[field]}"
+                for field in STATS_FIELDS
+                if not math.isclose(stored[field], fresh[field], rel_tol=1e-9, abs_tol=1e-6)
+            ]
+            if differences:
+                drifted += 1
+                self.stdout.write(f"{business.id} ({business.name}): " + ", ".join(differences))
+
+        if options["check"] and drifted:
+            raise CommandError(f"{drifted} business(es) have stale dashboard stats.")
+
+        action = "Verified" if options["check"] else "Rebuilt"
+        self.stdout.write(self.style.SUCCESS(f"{action} dashboard stats; {drifted} business(es) had drifted."))
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.ledger import (
+    apply_rebuilt_inventory,
+    diff_inventory,
+    latest_snapshot,
+    load_snapshot,
+    replay_ledger,
+    save_snapshot,
+)
+from home.models import Business, InventorySnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the event ledger per business into inventory snapshots and report "
+        "(or with --apply, fix) drift against the stored folder inventory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--business", help="Only rebuild the business with this id.")
+        parser.add_argument(
+            "--checkpoint-every",
+            type=int,
+            default=100000,
+            help="Write a snapshot after this many replayed events.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue from the latest snapshot instead of replaying from the first event.",
+        )
+        parser.add_argument("--apply", action="store_true", help="Overwrite drifted inventory rows with the replay.")
+        parser.add_argument("--show", type=int, default=20, help="Number of drifted rows to print per business.")
+
+    def handle(self, *args, **options):
+        if options["checkpoint_every"] < 1:
+            raise CommandError("--checkpoint-every must be positive.")
+
+        businesses = Business.objects.order_by("created_at")
+        if options["business"]:
+            businesses = businesses.filter(id=options["business"])
+            if not businesses.exists():
+                raise CommandError(f"Business {options['business']} not found.")
+
+        drifted = 0
+        for business in businesses.iterator():
+            drifted += self.rebuild(business, options)
+
+        action = "Fixed" if options["apply"] else "Found"
+        self.stdout.write(self.style.SUCCESS(f"{action} {drifted} drifted inventory row(s)."))
+
+    def rebuild(self, business, options):
+        started = time.perf_counter()
+        state = None
+        if options["resume"]:
+            snapshot = latest_snapshot(business)
+            if snapshot:
+                state = load_snapshot(snapshot)
+                self.stdout.write(
+                    f"{business.id} ({business.name}): resuming after {snapshot.events_replayed} events "
+                    f"at {snapshot.as_of.isoformat()}"
+                )
+        else:
+            InventorySnapshot.objects.filter(business=business).delete()
+
+        resumed_events = state.events if state else 0
+        checkpointed = [state.position if state else None]
+
+        def checkpoint(current):
+            save_snapshot(business, current)
+            checkpointed[0] = current.position
+            self.stdout.write(f"  checkpoint after {current.events} events")
+
+        state = replay_ledger(
+            business,
+            state,
+            checkpoint=checkpoint,
+            checkpoint_every=options["checkpoint_every"],
+        )
+        if state.position and state.position != checkpointed[0]:
+            save_snapshot(business, state)
+
+        differences = list(diff_inventory(business, state))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{business.id} ({business.name}): replayed {state.events - resumed_events} events "
+            f"in {elapsed:.1f}s, {len(differences)} row(s) differ"
+        )
+        for (folder_id, item_id), stored, rebuilt in differences[:options["show"]]:
+            stored_text = "missing" if stored is None else f"{stored:g}"
+            self.stdout.write(f"  folder {folder_id} item {item_id}: stored {stored_text}, ledger {rebuilt:g}")
+
+        if options["apply"] and differences:
+            apply_rebuilt_inventory(business, differences, state)
+        return len(differences)
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.models import Business
+from home.search import SEARCH_TABLES, reindex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of items and customers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--business", help="Only reindex the business with this id.")
+        parser.add_argument("--type", choices=sorted(SEARCH_TABLES), help="Only reindex items or customers.")
+
+    def handle(self, *args, **options):
+        business_id = None
+        if options["business"]:
+            business = Business.objects.filter(id=options["business"]).first()
+            if business is None:
+                raise CommandError(f"Business {options['business']} not found.")
+            business_id = business.id
+
+        kinds = [options["type"]] if options["type"] else list(SEARCH_TABLES)
+        for kind in kinds:
+            started = time.perf_counter()
+            count = reindex(kind, business_id)
+            self.stdout.write(f"Indexed {count} {kind} in {time.perf_counter() - started:.1f}s.")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
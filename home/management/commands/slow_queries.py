@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from home.slowlog import normalize_sql, read_records
+
+SORT_KEYS = {
+    "total": lambda group: group["total_ms"],
+    "max": lambda group: group["max_ms"],
+    "count": lambda group: group["count"],
+}
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow-query log by normalized statement shape, worst offenders first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Log file to read (defaults to SLOW_QUERY_LOG_PATH).")
+        parser.add_argument("--top", type=int, default=10, help="Number of shapes to show.")
+        parser.add_argument("--sort", choices=sorted(SORT_KEYS), default="total", help="Rank shapes by this figure.")
+        parser.add_argument("--view", help="Only include statements issued by this view.")
+
+    def handle(self, *args, **options):
+        groups = {}
+        for record in read_records(options["path"]):
+            if options["view"] and record.get("view") != options["view"]:
+                continue
+            shape = normalize_sql(record.get("sql", ""))
+            duration = record.get("duration_ms") or 0.0
+            group = groups.setdefault(
+                shape,
+                {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "views": {}, "plan": None, "params": None},
+            )
+            group["count"] += 1
+            group["total_ms"] += duration
+            view = record.get("view") or "-"
+            group["views"][view] = group["views"].get(view, 0) + 1
+            if duration >= group["max_ms"]:
+                group["max_ms"] = duration
+                group["plan"] = record.get("plan")
+                group["params"] = record.get("params")
+
+        if not groups:
+            self.stdout.write("No slow queries recorded.")
+            return
+
+        ranked = sorted(groups.items(), key=lambda entry: SORT_KEYS[options["sort"]](entry[1]), reverse=True)
+        for rank, (shape, group) in enumerate(ranked[:options["top"]], start=1):
+            views = ", ".join(
+                f"{view} x{count}" for view, count in sorted(group["views"].items(), key=lambda entry: -entry[1])
+            )
+            self.stdout.write(
+                f"#{rank} count={group['count']} total={group['total_ms']:.1f}ms "
+                f"mean={group['total_ms'] / group['count']:.1f}ms max={group['max_ms']:.1f}ms"
+            )
+            self.stdout.write(f"  views: {views}")
+            self.stdout.write(f"  sql: {shape}")
+            if group["params"] is not None:
+                self.stdout.write(f"  slowest params: {group['params']}")
+            for line in group["plan"] or ():
+                self.stdout.write(f"  plan: {line}")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(groups)} distinct statement shape(s)."))
@@ -0,0 +1,239 @@
+import contextvars
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SERVER_TIMING_PHASES = ("auth", "serialize", "encode")
+
+_current = contextvars.ContextVar("anbargar_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Per-request SQL counters and phase timings; also a DB execute wrapper."""
+
+    __slots__ = ("phases", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.phases = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += perf_counter() - started
+
+    def server_timing(self, total_seconds):
+        entries = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_queries} queries"']
+        for name in SERVER_TIMING_PHASES:
+            if name in self.phases:
+                entries.append(f"{name};dur={self.phases[name] * 1000:.2f}")
+        entries.append(f"total;dur={total_seconds * 1000:.2f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def phase(name):
+    """Time a block as part of the current request's ``name`` phase.
+
+    A no-op outside a request handled by ``MetricsMiddleware``.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[name] = metrics.phases.get(name, 0.0) + perf_counter() - started
+
+
+def _add_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+@asynccontextmanager
+async def aexecute_wrapper(wrapper):
+    """``connection.execute_wrapper`` for async middleware.
+
+    Connections are per thread, and under ASGI a request's queries (sync
+    views and the async ORM alike) run on the thread that serves its
+    thread-sensitive sync code, not on the event loop. The wrapper is
+    installed on that thread's connection.
+    """
+    await sync_to_async(_add_wrapper)(wrapper)
+    try:
+        yield
+    finally:
+        await sync_to_async(_remove_wrapper)(wrapper)
+
+
+class _RouteStats:
+    __slots__ = ("buckets", "duration_sum", "count", "db_queries", "db_seconds", "bytes_sum", "bytes_count", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.duration_sum = 0.0
+        self.count = 0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.bytes_sum = 0
+        self.bytes_count = 0
+        self.statuses = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """In-process aggregate of request metrics, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        # (name, sorted label items) -> count
+        self._counters = {}
+        self._help = {}
+
+    def observe(self, route, method, status, duration, metrics, size=None):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = _RouteStats()
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.duration_sum += duration
+            stats.count += 1
+            stats.db_queries += metrics.db_queries
+            stats.db_seconds += metrics.db_seconds
+            if size is not None:
+                stats.bytes_sum += size
+                stats.bytes_count += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def increment(self, name, help_text, **labels):
+        """Add one to a labelled counter rendered alongside the route metrics."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help[name] = help_text
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._counters.clear()
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                "# HELP anbargar_request_duration_seconds Request latency by route.",
+                "# TYPE anbargar_request_duration_seconds histogram",
+            ]
+            for (route, method), stats in routes:
+                labels = f'route="{_escape(route)}",method="{method}"'
+                cumulative = 0
+                for bound, bucket in zip(DURATION_BUCKETS, stats.buckets):
+                    cumulative += bucket
+                    lines.append(f'anbargar_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'anbargar_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f"anbargar_request_duration_seconds_sum{{{labels}}} {stats.duration_sum:.6f}")
+                lines.append(f"anbargar_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+            lines += ["# HELP anbargar_requests_total Requests by route and status.", "# TYPE anbargar_requests_total counter"]
+            for (route, method), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(
+                        f'anbargar_requests_total{{route="{_escape(route)}",method="{method}",status="{status}"}} {count}'
+                    )
+
+            lines += ["# HELP anbargar_db_queries_total SQL statements issued.", "# TYPE anbargar_db_queries_total counter"]
+            for (route, method), stats in routes:
+                lines.append(f'anbargar_db_queries_total{{route="{_escape(route)}",method="{method}"}} {stats.db_queries}')
+
+            lines += ["# HELP anbargar_db_seconds_total Time spent executing SQL.", "# TYPE anbargar_db_seconds_total counter"]
+            for (route, method), stats in routes:
+                lines.append(
+                    f'anbargar_db_seconds_total{{route="{_escape(route)}",method="{method}"}} {stats.db_seconds:.6f}'
+                )
+
+            lines += ["# HELP anbargar_response_bytes Serialized response size.", "# TYPE anbargar_response_bytes summary"]
+            for (route, method), stats in routes:
+                labels = f'route="{_escape(route)}",method="{method}"'
+                lines.append(f"anbargar_response_bytes_sum{{{labels}}} {stats.bytes_sum}")
+                lines.append(f"anbargar_response_bytes_count{{{labels}}} {stats.bytes_count}")
+
+            for name in sorted(self._help):
+                lines += [f"# HELP {name} {self._help[name]}", f"# TYPE {name} counter"]
+                for (counter, labels), count in sorted(self._counters.items()):
+                    if counter == name:
+                        rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+                        lines.append(f"{name}{{{rendered}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Record latency, SQL and response size per route and emit ``Server-Timing``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = perf_counter()
+        try:
+            async with aexecute_wrapper(metrics):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        duration = perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        size = None if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, duration, metrics, size)
+        response["Server-Timing"] = metrics.server_timing(duration)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='home_customer_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='home_event_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='home_folder_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folderitem',
+            index=models.Index(fields=['folder', 'created_at', 'id'], name='home_folderitem_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='home_item_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='home_unit_page_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:41
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('total_items', models.IntegerField(default=0)),
+                ('total_folders', models.IntegerField(default=0)),
+                ('total_value', models.FloatField(default=0.0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='home.business')),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:43
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_business_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'phone'], name='home_customer_biz_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['business', 'type', 'created_at'], name='home_event_biz_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventitem',
+            index=models.Index(fields=['item', 'event'], name='home_eventitem_item_evt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folderitem',
+            index=models.Index(fields=['folder', 'quantity'], name='home_folderitem_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(models.F('business'), django.db.models.functions.text.Lower('name'), name='home_item_biz_lname_idx'),
+        ),
+    ]
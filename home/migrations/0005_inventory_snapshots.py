@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:51
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField()),
+                ('last_event_id', models.UUIDField()),
+                ('events_replayed', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='home.business')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshotLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('unit', models.CharField(max_length=50)),
+                ('quantity', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('folder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_lines', to='home.folder')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_lines', to='home.item')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='home.inventorysnapshot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inventorysnapshot',
+            index=models.Index(fields=['business', 'as_of', 'last_event_id'], name='home_invsnap_position_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='inventorysnapshotline',
+            unique_together={('snapshot', 'folder', 'item')},
+        ),
+    ]
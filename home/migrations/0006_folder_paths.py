@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Folder = apps.get_model("home", "Folder")
+    every_folder = list(Folder.objects.only("id", "parent_id"))
+    folders = {folder.id: folder for folder in every_folder}
+    children = {}
+    for folder in every_folder:
+        children.setdefault(folder.parent_id, []).append(folder)
+
+    # Folders caught in a parent cycle are never reached from a root; detach them.
+    pending = [(folder, "/") for folder in children.get(None, [])]
+    while folders:
+        while pending:
+            folder, prefix = pending.pop()
+            folder.path = f"{prefix}{folder.id.hex}/"
+            folders.pop(folder.id)
+            pending.extend((child, folder.path) for child in children.get(folder.id, []))
+        if folders:
+            orphan = next(iter(folders.values()))
+            children[orphan.parent_id].remove(orphan)
+            orphan.parent_id = None
+            pending.append((orphan, "/"))
+
+    Folder.objects.bulk_update(every_folder, ["path", "parent_id"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_inventory_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=2048),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['business', 'path'], name='home_folder_path_idx'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_folder_paths'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='item',
+            name='home_item_biz_lname_idx',
+        ),
+    ]
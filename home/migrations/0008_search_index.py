@@ -0,0 +1,95 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# A frozen copy of the tables and the text folding of home/search.py and
+# home/text.py as of this migration; later changes to them reindex with
+# ``manage.py reindex_search``.
+TABLES = (
+    ("home_item_fts", "Item", ("name", "sku", "barcode", "description")),
+    ("home_customer_fts", "Customer", ("name", "phone", "address")),
+)
+BATCH_SIZE = 2000
+
+_FOLD = {
+    "ي": "ی",
+    "ى": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "\u0640": "",
+    "\u200c": "",
+    "\u200d": "",
+    "\u0670": "",
+    **{chr(code): "" for code in range(0x064B, 0x0653)},
+}
+_DIGITS = {
+    chr(code): str(unicodedata.digit(chr(code)))
+    for code in range(0x80, 0x10000)
+    if unicodedata.category(chr(code)) == "Nd"
+}
+_TABLE = str.maketrans({**_FOLD, **_DIGITS})
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fold(value):
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKC", str(value)).translate(_TABLE).casefold()
+    return _SPACE_RE.sub(" ", value).strip()
+
+
+def item_row(item):
+    return (item.id.hex, item.business_id.hex, fold(item.name), fold(item.sku), fold(item.barcode), fold(item.description))
+
+
+def customer_row(customer):
+    name = f"{customer.first_name} {customer.last_name or ''}"
+    return (customer.id.hex, customer.business_id.hex, fold(name), fold(customer.phone), fold(customer.address))
+
+
+ROWS = {"Item": item_row, "Customer": customer_row}
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, model_name, columns in TABLES:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                f"{', '.join(('key', 'business') + columns)}, "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3', detail=column)"
+            )
+            insert = f"INSERT INTO {table} VALUES ({', '.join(['%s'] * (len(columns) + 2))})"
+            batch = []
+            for obj in apps.get_model("home", model_name).objects.order_by().iterator(chunk_size=BATCH_SIZE):
+                batch.append(ROWS[model_name](obj))
+                if len(batch) >= BATCH_SIZE:
+                    cursor.executemany(insert, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert, batch)
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, _, _ in TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_drop_item_name_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
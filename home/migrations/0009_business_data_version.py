@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='data_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# The synced kinds as of this migration (home/sync.py SYNC_KINDS).
+SYNC_MODELS = (
+    ("items", "Item"),
+    ("folders", "Folder"),
+    ("units", "Unit"),
+    ("customers", "Customer"),
+    ("events", "Event"),
+    ("inventory", "FolderItem"),
+)
+
+
+def backfill_changes(apps, schema_editor):
+    """Journal every existing row, so ``since=0`` returns the full dataset."""
+    table = apps.get_model("home", "SyncChange")._meta.db_table
+    now = schema_editor.connection.ops.adapt_datetimefield_value(timezone.now())
+    with schema_editor.connection.cursor() as cursor:
+        for kind, model_name in SYNC_MODELS:
+            business_column = "folder__business_id" if model_name == "FolderItem" else "business_id"
+            queryset = apps.get_model("home", model_name).objects.order_by().values_list(business_column, "id")
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(
+                f"INSERT INTO {table} (business_id, object_id, kind, deleted, created_at) "
+                f"SELECT rows.*, %s, %s, %s FROM ({sql}) AS rows",
+                [kind, False, now, *params],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_business_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_changes', to='home.business')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business', 'id'], name='home_syncchange_cursor_idx'), models.Index(fields=['kind', 'object_id'], name='home_syncchange_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_sync_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='destination_folder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='destination_events', to='home.folder'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='folder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='folder_events', to='home.folder'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='origin_folder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='origin_events', to='home.folder'),
+        ),
+    ]
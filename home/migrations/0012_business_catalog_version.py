@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_restrict_event_folders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='catalog_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -8,6 +8,10 @@ class Business(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     users = models.ManyToManyField(User, related_name="businesses")
+    # Bumped on every write to the business's data; API GETs derive their ETag from it.
+    data_version = models.BigIntegerField(default=0)
+    # Bumped on item, unit and folder writes only; keys the catalog list cache.
+    catalog_version = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -15,6 +19,20 @@ class Business(models.Model):
         return self.name
 
 
+class BusinessStats(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.OneToOneField(Business, on_delete=models.CASCADE, related_name="stats")
+    total_items = models.IntegerField(default=0)
+    total_folders = models.IntegerField(default=0)
+    total_value = models.FloatField(default=0.0)
+    low_stock_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.business}"
+
+
 class Otp(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     phone = models.CharField(max_length=20, db_index=True)
@@ -39,9 +57,17 @@ class Folder(models.Model):
         blank=True,
         null=True,
     )
+    # Materialized path of ancestor ids, maintained from ``parent`` (see home.folders).
+    path = models.CharField(max_length=2048, default="", editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "created_at", "id"], name="home_folder_page_idx"),
+            models.Index(fields=["business", "path"], name="home_folder_path_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -58,6 +84,11 @@ class Item(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "created_at", "id"], name="home_item_page_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -79,6 +110,11 @@ class Unit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "created_at", "id"], name="home_unit_page_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -104,6 +140,10 @@ class FolderItem(models.Model):
 
     class Meta:
         unique_together = ("folder", "item")
+        indexes = [
+            models.Index(fields=["folder", "created_at", "id"], name="home_folderitem_page_idx"),
+            models.Index(fields=["folder", "quantity"], name="home_folderitem_qty_idx"),
+        ]
 
 
 class Customer(models.Model):
@@ -117,6 +157,12 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "created_at", "id"], name="home_customer_page_idx"),
+            models.Index(fields=["business", "phone"], name="home_customer_biz_phone_idx"),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name or ''}".strip()
 
@@ -131,6 +177,7 @@ class Event(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     type = models.CharField(max_length=10, choices=EventType.choices)
     business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="events")
+    # A deleted folder leaves NULL here; the other leg of a MOVE still replays (see inventory.event_legs).
     origin_folder = models.ForeignKey(
         Folder,
         on_delete=models.SET_NULL,
@@ -163,6 +210,12 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "created_at", "id"], name="home_event_page_idx"),
+            models.Index(fields=["business", "type", "created_at"], name="home_event_biz_type_idx"),
+        ]
+
 
 class EventItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -176,3 +229,65 @@ class EventItem(models.Model):
     value = models.FloatField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["item", "event"], name="home_eventitem_item_evt_idx"),
+        ]
+
+
+class InventorySnapshot(models.Model):
+    """Stock per folder and item after replaying the ledger up to an event.
+
+    ``as_of`` and ``last_event_id`` are the ``(created_at, id)`` position of the
+    last event included, so a replay can resume right after it.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="inventory_snapshots")
+    as_of = models.DateTimeField()
+    last_event_id = models.UUIDField()
+    events_replayed = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "as_of", "last_event_id"], name="home_invsnap_position_idx"),
+        ]
+
+
+class InventorySnapshotLine(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    snapshot = models.ForeignKey(InventorySnapshot, on_delete=models.CASCADE, related_name="lines")
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="snapshot_lines")
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="snapshot_lines")
+    unit = models.CharField(max_length=50)
+    quantity = models.FloatField(default=0.0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("snapshot", "folder", "item")
+
+
+class SyncChange(models.Model):
+    """A create, update or delete of a synced row, for ``/api/sync/``.
+
+    ``id`` is the sync cursor. SQLite holds the write lock from the first
+    write to commit, so ids are handed out in commit order and a cursor
+    never skips a row committed later.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="sync_changes")
+    kind = models.CharField(max_length=20)
+    object_id = models.UUIDField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "id"], name="home_syncchange_cursor_idx"),
+            models.Index(fields=["kind", "object_id"], name="home_syncchange_object_idx"),
+        ]
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from .api_utils import get_access_token_expiry
+
+PRINCIPAL_CACHE_TTL_SECONDS = 300
+PRINCIPAL_CACHE_MAX_ENTRIES = 10000
+
+# token -> (user, business, expires_at)
+_principals = {}
+_lock = threading.Lock()
+
+
+def get_cached_principal(token):
+    """Return the cached ``(user, business)`` for a token, or ``None``."""
+    entry = _principals.get(token)
+    if entry is None:
+        return None
+
+    user, business, expires_at = entry
+    if expires_at <= time.time():
+        with _lock:
+            _principals.pop(token, None)
+        return None
+    return user, business
+
+
+def cache_principal(token, user, business):
+    """Remember the principal of an already verified token.
+
+    Entries never outlive the token itself.
+    """
+    now = time.time()
+    expires_at = min(now + PRINCIPAL_CACHE_TTL_SECONDS, get_access_token_expiry(token))
+    if expires_at <= now:
+        return
+
+    with _lock:
+        if len(_principals) >= PRINCIPAL_CACHE_MAX_ENTRIES:
+            for key in [key for key, entry in _principals.items() if entry[2] <= now]:
+                del _principals[key]
+        while len(_principals) >= PRINCIPAL_CACHE_MAX_ENTRIES:
+            del _principals[next(iter(_principals))]
+        _principals[token] = (user, business, expires_at)
+
+
+def _invalidate(predicate):
+    with _lock:
+        for key in [key for key, entry in _principals.items() if predicate(entry)]:
+            del _principals[key]
+
+
+def invalidate_user(user_id):
+    _invalidate(lambda entry: entry[0].pk == user_id)
+
+
+def invalidate_business(business_id):
+    _invalidate(lambda entry: entry[1] is not None and entry[1].pk == business_id)
+
+
+def clear_principals():
+    with _lock:
+        _principals.clear()
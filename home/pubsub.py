@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Business
+
+logger = logging.getLogger(__name__)
+
+POLL_BATCH_SIZE = 500
+
+
+class Subscription:
+    """One listener for committed writes to a business.
+
+    Created on an event loop, it waits on an ``asyncio.Event`` and costs no
+    thread; created elsewhere, it waits on a ``threading.Event``.
+    """
+
+    __slots__ = ("business_id", "loop", "event")
+
+    def __init__(self, business_id, loop=None):
+        self.business_id = business_id
+        self.loop = loop
+        self.event = asyncio.Event() if loop else threading.Event()
+
+    def wait(self, timeout):
+        """Block until a change or ``timeout``; True when something changed."""
+        changed = self.event.wait(timeout)
+        self.event.clear()
+        return changed
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+def _set_all(events):
+    for event in events:
+        event.set()
+
+
+class ChangeBroker:
+    """Fan committed writes out to the stream subscribers of this process.
+
+    ``versions.bump_version`` publishes after commit. A publish wakes every
+    subscriber of the business: one callback per event loop, however many
+    connections it serves. Writes from other processes (more workers,
+    management commands) are noticed by a poller thread that reads the
+    versions of all subscribed businesses in one query every
+    ``STREAM_POLL_SECONDS``; it only runs while someone is subscribed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._generations = {}
+        self._versions = {}
+        self._poller = None
+
+    def subscribe(self, business_id):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        subscription = Subscription(business_id, loop)
+        with self._lock:
+            self._subscribers.setdefault(business_id, set()).add(subscription)
+            if self._poller is None and getattr(settings, "STREAM_POLL_SECONDS", 0):
+                self._poller = threading.Thread(target=self._poll, name="stream-poller", daemon=True)
+                self._poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.business_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.business_id]
+                self._generations.pop(subscription.business_id, None)
+                self._versions.pop(subscription.business_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def generation(self, business_id):
+        """Number of publishes for ``business_id`` since its first subscriber."""
+        return self._generations.get(business_id, 0)
+
+    def seen(self, business_id, version):
+        """Record a version a subscriber has read, so the poller does not report it again."""
+        with self._lock:
+            if business_id in self._subscribers:
+                self._versions[business_id] = max(version, self._versions.get(business_id, version))
+
+    def publish(self, business_id):
+        """Wake the subscribers of ``business_id``; safe to call from any thread."""
+        with self._lock:
+            subscribers = self._subscribers.get(business_id)
+            if not subscribers:
+                return
+            self._generations[business_id] = self._generations.get(business_id, 0) + 1
+            subscribers = list(subscribers)
+        by_loop = {}
+        for subscription in subscribers:
+            if subscription.loop is None:
+                subscription.event.set()
+            else:
+                by_loop.setdefault(subscription.loop, []).append(subscription.event)
+        for loop, events in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_set_all, events)
+            except RuntimeError:
+                # The loop has closed; its subscribers are gone with it.
+                pass
+
+    def _poll(self):
+        try:
+            while True:
+                time.sleep(settings.STREAM_POLL_SECONDS)
+                with self._lock:
+                    if not self._subscribers:
+                        self._poller = None
+                        return
+                    business_ids = list(self._subscribers)
+                try:
+                    self._check_versions(business_ids)
+                except Exception:
+                    logger.exception("Polling business versions failed.")
+        finally:
+            connection.close()
+
+    def _check_versions(self, business_ids):
+        connection.close_if_unusable_or_obsolete()
+        for start in range(0, len(business_ids), POLL_BATCH_SIZE):
+            batch = business_ids[start:start + POLL_BATCH_SIZE]
+            for business_id, version in Business.objects.filter(id__in=batch).values_list("id", "data_version"):
+                with self._lock:
+                    if business_id not in self._subscribers:
+                        continue
+                    known = self._versions.setdefault(business_id, version)
+                    if version <= known:
+                        continue
+                    self._versions[business_id] = version
+                self.publish(business_id)
+
+
+broker = ChangeBroker()
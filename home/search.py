@@ -0,0 +1,280 @@
+import re
+import uuid
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Customer, Item
+from .text import normalize_text
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# At most this many of the newest matches, plus as many exact hits per column
+# group, are ranked, so a one-letter query over a million customers costs
+# about the same as a precise one.
+RANK_CANDIDATES = 2000
+REINDEX_BATCH_SIZE = 2000
+
+# FTS5 shadow tables. ``key`` and ``business`` hold id hexes so rows can be
+# deleted per object and matches restricted per tenant through the index;
+# the remaining columns hold ``normalize_text`` output, so Arabic/Persian
+# letter variants, diacritics and digits match the way names do elsewhere.
+# Weights rank name hits above codes above free text. FTS5's bm25() is not
+# used: it reads the whole doclist of every term (including the tenant's
+# ``business`` token) for document frequencies on each query.
+SEARCH_TABLES = {
+    "items": {
+        "table": "home_item_fts",
+        "model": Item,
+        "columns": ("name", "sku", "barcode", "description"),
+        "weights": (10.0, 6.0, 6.0, 1.0),
+        "fallback": ("name", "sku", "barcode", "description"),
+    },
+    "customers": {
+        "table": "home_customer_fts",
+        "model": Customer,
+        "columns": ("name", "phone", "address"),
+        "weights": (10.0, 6.0, 1.0),
+        "fallback": ("first_name", "last_name", "phone", "address"),
+    },
+}
+
+# unicode61 splits on anything that is not a letter or a number.
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def create_table_sql(kind):
+    spec = SEARCH_TABLES[kind]
+    columns = ", ".join(("key", "business") + spec["columns"])
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {spec['table']} USING fts5("
+        f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3', detail=column)"
+    )
+
+
+def search_enabled():
+    return connection.vendor == "sqlite"
+
+
+def _item_row(item):
+    return (
+        item.id.hex,
+        item.business_id.hex,
+        normalize_text(item.name),
+        normalize_text(item.sku),
+        normalize_text(item.barcode),
+        normalize_text(item.description),
+    )
+
+
+def _customer_row(customer):
+    return (
+        customer.id.hex,
+        customer.business_id.hex,
+        normalize_text(f"{customer.first_name} {customer.last_name or ''}"),
+        normalize_text(customer.phone),
+        normalize_text(customer.address),
+    )
+
+
+_ROWS = {"items": _item_row, "customers": _customer_row}
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def _delete_sql(table):
+    return f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {table} MATCH %s)"
+
+
+def _insert(cursor, kind, rows):
+    spec = SEARCH_TABLES[kind]
+    placeholders = ", ".join(["%s"] * (len(spec["columns"]) + 2))
+    cursor.executemany(f"INSERT INTO {spec['table']} VALUES ({placeholders})", rows)
+
+
+def _keys_expression(objs):
+    return "key:(" + " OR ".join(_quote(obj.id.hex) for obj in objs) + ")"
+
+
+def index_objects(kind, objs):
+    """Replace the search rows of items or customers.
+
+    Signals cover single saves; callers using ``bulk_create``/``bulk_update``
+    pass the written objects here.
+    """
+    if not search_enabled() or not objs:
+        return
+    table = SEARCH_TABLES[kind]["table"]
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), REINDEX_BATCH_SIZE):
+            batch = objs[start:start + REINDEX_BATCH_SIZE]
+            cursor.execute(_delete_sql(table), [_keys_expression(batch)])
+            _insert(cursor, kind, [_ROWS[kind](obj) for obj in batch])
+
+
+def index_object(kind, obj):
+    index_objects(kind, [obj])
+
+
+def unindex_object(kind, obj):
+    if not search_enabled():
+        return
+    table = SEARCH_TABLES[kind]["table"]
+    with connection.cursor() as cursor:
+        cursor.execute(_delete_sql(table), [_keys_expression([obj])])
+
+
+def unindex_business(business_id):
+    """Drop every search row of a business in one statement per table."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        for spec in SEARCH_TABLES.values():
+            cursor.execute(_delete_sql(spec["table"]), [f"business:{_quote(business_id.hex)}"])
+
+
+def reindex(kind, business_id=None):
+    """Rebuild the search rows of ``kind``, for one business or all of them.
+
+    Rows are streamed from the model table and inserted in batches; returns
+    the number of indexed objects.
+    """
+    if not search_enabled():
+        return 0
+    spec = SEARCH_TABLES[kind]
+    queryset = spec["model"].objects.order_by()
+    with connection.cursor() as cursor:
+        if business_id is None:
+            cursor.execute(f"DELETE FROM {spec['table']}")
+        else:
+            queryset = queryset.filter(business_id=business_id)
+            cursor.execute(_delete_sql(spec["table"]), [f"business:{_quote(business_id.hex)}"])
+
+        count = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=REINDEX_BATCH_SIZE):
+            batch.append(_ROWS[kind](obj))
+            if len(batch) >= REINDEX_BATCH_SIZE:
+                _insert(cursor, kind, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            _insert(cursor, kind, batch)
+            count += len(batch)
+        if business_id is None:
+            cursor.execute(f"INSERT INTO {spec['table']}({spec['table']}) VALUES ('optimize')")
+    return count
+
+
+def query_tokens(query):
+    return _TOKEN_RE.findall(normalize_text(query))
+
+
+def match_expression(tokens, columns, business_id, prefix=True):
+    """FTS5 query for ``tokens`` as typed so far.
+
+    Every word must match a whole word except the last, which matches as a
+    prefix unless ``prefix`` is false. Tokens are quoted, so user input
+    cannot inject FTS5 operators.
+    """
+    last = f"{_quote(tokens[-1])}*" if prefix else _quote(tokens[-1])
+    terms = " AND ".join([_quote(token) for token in tokens[:-1]] + [last])
+    return f"business:{_quote(business_id.hex)} AND {{{' '.join(columns)}}}: ({terms})"
+
+
+def score(tokens, values, weights):
+    """Rank of one row: the best column weight per token, halved for prefix-only hits.
+
+    Ties prefer the shorter matching text.
+    """
+    total = 0.0
+    length = 0
+    words = [_TOKEN_RE.findall(value) for value in values]
+    for position, token in enumerate(tokens):
+        prefix = position == len(tokens) - 1
+        best, best_length = 0.0, 0
+        for column_words, value, weight in zip(words, values, weights):
+            if token in column_words:
+                hit = weight
+            elif prefix and any(word.startswith(token) for word in column_words):
+                hit = weight / 2
+            else:
+                continue
+            if hit > best or (hit == best and len(value) < best_length):
+                best, best_length = hit, len(value)
+        total += best
+        length += best_length
+    return total, -length
+
+
+def column_tiers(kind):
+    """Searched columns grouped by weight, heaviest first."""
+    spec = SEARCH_TABLES[kind]
+    tiers = {}
+    for column, weight in zip(spec["columns"], spec["weights"]):
+        tiers.setdefault(weight, []).append(column)
+    return [tiers[weight] for weight in sorted(tiers, reverse=True)]
+
+
+def _newest_matches(cursor, kind, expression):
+    spec = SEARCH_TABLES[kind]
+    table = spec["table"]
+    cursor.execute(
+        f"SELECT key, {', '.join(spec['columns'])} FROM {table} WHERE {table} MATCH %s "
+        f"ORDER BY rowid DESC LIMIT %s",
+        [expression, RANK_CANDIDATES + 1],
+    )
+    return cursor.fetchall()
+
+
+def search_ids(kind, business_id, query, limit=SEARCH_LIMIT):
+    """Ids of the best ``limit`` matches of ``query``, best first.
+
+    When more than ``RANK_CANDIDATES`` rows match, the newest are ranked
+    together with the rows where every word matches exactly in one column
+    group, heaviest group first, so an older exact hit is not crowded out by
+    newer prefix or low-weight hits.
+    """
+    spec = SEARCH_TABLES[kind]
+    if not search_enabled():
+        # No FTS5: unranked substring match on the raw columns.
+        condition = Q()
+        for field in spec["fallback"]:
+            condition |= Q(**{f"{field}__icontains": query})
+        queryset = spec["model"].objects.filter(condition, business_id=business_id).order_by("created_at")
+        return list(queryset.values_list("id", flat=True)[:limit])
+
+    tokens = query_tokens(query)
+    if not tokens:
+        return []
+    with connection.cursor() as cursor:
+        rows = _newest_matches(cursor, kind, match_expression(tokens, spec["columns"], business_id))
+        if len(rows) > RANK_CANDIDATES:
+            rows = rows[:RANK_CANDIDATES]
+            seen = {row[0] for row in rows}
+            exact = 0
+            for columns in column_tiers(kind):
+                hits = _newest_matches(cursor, kind, match_expression(tokens, columns, business_id, prefix=False))
+                hits = hits[:RANK_CANDIDATES]
+                # Hits not seen yet are older than every row above, so the
+                # candidates stay newest first.
+                rows.extend(row for row in hits if row[0] not in seen)
+                seen.update(row[0] for row in hits)
+                exact += len(hits)
+                if exact >= limit:
+                    # Exact hits confined to lighter columns rank below these.
+                    break
+    # sort() is stable, so equal scores keep the newest first.
+    rows.sort(key=lambda row: score(tokens, row[1:], spec["weights"]), reverse=True)
+    return [uuid.UUID(row[0]) for row in rows[:limit]]
+
+
+def search(kind, business_id, query, limit=SEARCH_LIMIT):
+    """Matching items or customers of one business, best first."""
+    ids = search_ids(kind, business_id, query, limit)
+    if not ids:
+        return []
+    found = SEARCH_TABLES[kind]["model"].objects.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,258 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models import Min, Q, Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .folders import build_path, check_parent, rebase_paths, subtree, subtree_filter
+from .models import Business, Customer, Event, EventItem, Folder, FolderItem, InventorySnapshot, Item, Unit
+from .item_index import invalidate_item_index
+from .principals import invalidate_business, invalidate_user
+from .search import index_object, unindex_business, unindex_object
+from .sync import record_change, record_queryset, sync_kind
+from .stats import adjust_business_stats, apply_inventory_change, summarize_inventory
+from .versions import bump_catalog_version, bump_version
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(m2m_changed, sender=Business.users.through)
+def business_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+
+    if reverse:
+        invalidate_user(instance.pk)
+        return
+
+    invalidate_business(instance.pk)
+    for user_id in pk_set or ():
+        invalidate_user(user_id)
+
+
+@receiver(post_delete, sender=Business)
+def business_deleted(sender, instance, **kwargs):
+    invalidate_business(instance.pk)
+    unindex_business(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+def _is_cascade(origin, model):
+    """True when a delete was started by something other than ``model`` itself."""
+    return not (isinstance(origin, model) or getattr(origin, "model", None) is model)
+
+
+@receiver(post_save, sender=Item)
+def item_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_business_stats(instance.business_id, total_items=1)
+        return
+
+    old_value = getattr(instance, "_stats_old_value", None)
+    if old_value == instance.value:
+        return
+
+    quantity = FolderItem.objects.filter(item=instance).aggregate(total=Sum("quantity"))["total"] or 0
+    adjust_business_stats(instance.business_id, total_value=quantity * ((instance.value or 0) - (old_value or 0)))
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_written(sender, instance, **kwargs):
+    invalidate_item_index(instance.business_id)
+
+
+def _owner_business_id(instance):
+    if isinstance(instance, FolderItem):
+        return instance.folder.business_id
+    if isinstance(instance, EventItem):
+        return instance.event.business_id
+    return instance.business_id
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Unit)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=EventItem)
+@receiver(post_save, sender=FolderItem)
+@receiver(post_delete, sender=Folder)
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Unit)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=EventItem)
+@receiver(post_delete, sender=FolderItem)
+def business_data_written(sender, instance, origin=None, **kwargs):
+    # A delete cascading from a parent row was already counted for that row.
+    if origin is not None and _is_cascade(origin, sender):
+        return
+    bump_version(_owner_business_id(instance))
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Unit)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=FolderItem)
+def sync_row_saved(sender, instance, **kwargs):
+    record_change(_owner_business_id(instance), sync_kind(sender), instance.pk)
+
+
+@receiver(post_delete, sender=Folder)
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Unit)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=FolderItem)
+def sync_row_deleted(sender, instance, origin=None, **kwargs):
+    # A deleted business takes its journal along; stock rows of a deleted
+    # folder or item were journaled together before the delete.
+    if isinstance(origin, Business) or (sender is FolderItem and _is_cascade(origin, FolderItem)):
+        return
+    business_id = getattr(origin, "business_id", None) or _owner_business_id(instance)
+    record_change(business_id, sync_kind(sender), instance.pk, deleted=True)
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Folder)
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Unit)
+def catalog_written(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Business):
+        return
+    bump_catalog_version(instance.business_id)
+
+
+@receiver(post_save, sender=Item)
+def item_indexed(sender, instance, **kwargs):
+    index_object("items", instance)
+
+
+@receiver(post_save, sender=Customer)
+def customer_indexed(sender, instance, **kwargs):
+    index_object("customers", instance)
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Customer)
+def search_row_deleted(sender, instance, origin=None, **kwargs):
+    # A business delete drops all of its rows at once.
+    if isinstance(origin, Business):
+        return
+    unindex_object("items" if sender is Item else "customers", instance)
+
+
+@receiver(pre_save, sender=Item)
+def item_saving(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and "value" not in update_fields):
+        instance._stats_old_value = instance.value
+        return
+    instance._stats_old_value = Item.objects.filter(pk=instance.pk).values_list("value", flat=True).first()
+
+
+@receiver(pre_delete, sender=Item)
+def item_deleting(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Business):
+        return
+    before = summarize_inventory(FolderItem.objects.filter(item=instance))
+    apply_inventory_change(before, {})
+    adjust_business_stats(instance.business_id, total_items=-1)
+    record_queryset("inventory", FolderItem.objects.filter(item=instance), deleted=True)
+
+
+@receiver(pre_save, sender=Folder)
+def folder_saving(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {"parent", "parent_id"} & set(update_fields):
+        return
+
+    parent = Folder.objects.filter(pk=instance.parent_id).only("path").first() if instance.parent_id else None
+    if not instance._state.adding:
+        check_parent(instance, parent)
+    path = build_path(instance, parent)
+    if path != instance.path:
+        instance._old_path = instance.path
+        instance.path = path
+
+
+@receiver(post_save, sender=Folder)
+def folder_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_business_stats(instance.business_id, total_folders=1)
+
+    old_path = getattr(instance, "_old_path", None)
+    if old_path:
+        descendants = Folder.objects.filter(subtree_filter(old_path), business_id=instance.business_id)
+        rebase_paths(descendants.exclude(pk=instance.pk), old_path, instance.path)
+    instance._old_path = None
+
+
+@receiver(pre_delete, sender=Folder)
+def folder_deleting(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Business):
+        return
+    before = summarize_inventory(FolderItem.objects.filter(folder=instance))
+    apply_inventory_change(before, {})
+    adjust_business_stats(instance.business_id, total_folders=-1)
+    record_queryset("inventory", FolderItem.objects.filter(folder=instance), deleted=True)
+
+    # Children are detached by SET_NULL and become roots.
+    record_queryset("folders", Folder.objects.filter(parent=instance))
+    rebase_paths(subtree(instance).exclude(pk=instance.pk), instance.path, "/")
+
+    # Its events lose their legs in this folder, so snapshots from the first
+    # of them on no longer replay from the ledger.
+    first = (
+        Event.objects.filter(Q(folder=instance) | Q(origin_folder=instance) | Q(destination_folder=instance))
+        .aggregate(first=Min("created_at"))["first"]
+    )
+    if first is not None:
+        InventorySnapshot.objects.filter(business_id=instance.business_id, as_of__gte=first).delete()
+
+
+@receiver(pre_save, sender=FolderItem)
+def folder_item_saving(sender, instance, **kwargs):
+    instance._stats_before = {}
+    if not instance._state.adding:
+        instance._stats_before = summarize_inventory(FolderItem.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=FolderItem)
+def folder_item_saved(sender, instance, **kwargs):
+    before = getattr(instance, "_stats_before", {})
+    apply_inventory_change(before, summarize_inventory(FolderItem.objects.filter(pk=instance.pk)))
+
+
+@receiver(pre_delete, sender=FolderItem)
+def folder_item_deleting(sender, instance, origin=None, **kwargs):
+    # Item and folder deletes already subtracted their rows in one query.
+    if _is_cascade(origin, FolderItem):
+        return
+    apply_inventory_change(summarize_inventory(FolderItem.objects.filter(pk=instance.pk)), {})
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, origin=None, **kwargs):
+    # Snapshots taken after a deleted event no longer match its ledger.
+    if isinstance(origin, Business):
+        return
+    InventorySnapshot.objects.filter(business_id=instance.business_id, as_of__gte=instance.created_at).delete()
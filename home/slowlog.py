@@ -0,0 +1,205 @@
+import json
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .metrics import aexecute_wrapper
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?(?![\w\"])")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_RE = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals and IN/VALUES lists collapsed."""
+    shape = _STRING_RE.sub("?", sql)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _PLACEHOLDER_RE.sub("?", shape)
+    shape = _LIST_RE.sub("(...)", shape)
+    shape = _VALUES_RE.sub(r"\1", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+def _handler_for(path):
+    path = str(path)
+    with _handlers_lock:
+        handler = _handlers.get(path)
+        if handler is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                encoding="utf-8",
+                delay=True,
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _handlers[path] = handler
+    return handler
+
+
+def close_handlers():
+    with _handlers_lock:
+        for handler in _handlers.values():
+            handler.close()
+        _handlers.clear()
+
+
+def write_record(record, path=None):
+    handler = _handler_for(path or settings.SLOW_QUERY_LOG_PATH)
+    message = json.dumps(record, ensure_ascii=False, default=str)
+    handler.handle(logging.makeLogRecord({"msg": message, "levelno": logging.INFO, "levelname": "INFO"}))
+
+
+def read_records(path=None):
+    """Yield records from the log and its rotated backups, oldest file first."""
+    path = Path(path or settings.SLOW_QUERY_LOG_PATH)
+    files = [path.with_name(f"{path.name}.{index}") for index in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)]
+    for log_file in files + [path]:
+        if not log_file.exists():
+            continue
+        with log_file.open(encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+class SlowQueryRecorder:
+    """Execute wrapper that logs statements slower than ``threshold_ms``.
+
+    ``source`` is a callable returning the name to attribute a statement to;
+    it is evaluated lazily so a request's view is known once URLs resolve.
+    Bound parameters are replaced by their count unless ``log_params`` (by
+    default ``SLOW_QUERY_LOG_PARAMS``) is set.
+    """
+
+    def __init__(self, threshold_ms, source=None, path=None, log_params=None):
+        self.threshold = threshold_ms / 1000
+        self.source = source or (lambda: None)
+        self.path = path
+        self.log_params = settings.SLOW_QUERY_LOG_PARAMS if log_params is None else log_params
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+
+        started = perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = perf_counter() - started
+        if elapsed >= self.threshold:
+            self.record(sql, params, many, elapsed, context["connection"])
+        return result
+
+    def format_params(self, params, many):
+        if many:
+            return f"{len(params)} parameter sets"
+        if not self.log_params:
+            return f"{len(params or ())} parameters (redacted)"
+        if isinstance(params, dict):
+            return params
+        return list(params or ())
+
+    def explain(self, db, sql, params):
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        prefix = "EXPLAIN QUERY PLAN " if db.vendor == "sqlite" else "EXPLAIN "
+        self._explaining = True
+        try:
+            with db.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+        except DatabaseError as exc:
+            return [f"EXPLAIN failed: {exc}"]
+        finally:
+            self._explaining = False
+        return [row[-1] for row in rows]
+
+    def record(self, sql, params, many, elapsed, db):
+        write_record(
+            {
+                "ts": timezone.now().isoformat(),
+                "duration_ms": round(elapsed * 1000, 3),
+                "view": self.source(),
+                "sql": sql,
+                "params": self.format_params(params, many),
+                "plan": None if many else self.explain(db, sql, params),
+            },
+            self.path,
+        )
+
+
+@contextmanager
+def capture_slow_queries(threshold_ms=None, source=None, path=None):
+    """Log slow statements issued on the default connection inside the block.
+
+    Does nothing unless ``threshold_ms`` or ``SLOW_QUERY_THRESHOLD_MS`` is set.
+    """
+    if threshold_ms is None:
+        threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold_ms is None:
+        yield
+        return
+    if not callable(source):
+        name = source
+        source = lambda: name  # noqa: E731
+    with connection.execute_wrapper(SlowQueryRecorder(threshold_ms, source, path)):
+        yield
+
+
+class SlowQueryMiddleware:
+    """Attribute slow statements to the view that issued them."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            return self.get_response(request)
+
+        with capture_slow_queries(source=self.view_name(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            return await self.get_response(request)
+
+        recorder = SlowQueryRecorder(settings.SLOW_QUERY_THRESHOLD_MS, self.view_name(request))
+        async with aexecute_wrapper(recorder):
+            return await self.get_response(request)
+
+    @staticmethod
+    def view_name(request):
+        def name():
+            match = request.resolver_match
+            return match.view_name if match else request.path
+        return name
@@ -197,13 +197,50 @@ async function loadToken() {
     }
 }
 
-async function loadStats() {
-    const data = await apiFetch("/api/dashboard/stats/");
+async function loadStats(data) {
+    if (data === undefined) data = await apiFetch("/api/dashboard/stats/");
     updateStats(data);
 }
 
-async function loadFolders() {
-    const data = await apiFetch("/api/folders/");
+// Live KPIs: read /api/stream/ through fetch (EventSource cannot send the
+// bearer token) and reconnect when it ends, e.g. when the token expires.
+async function watchChanges() {
+    let lastEventId = null;
+    while (state.token) {
+    try {
+        const headers = { Authorization: `Bearer ${state.token}` };
+        if (lastEventId) headers["Last-Event-ID"] = lastEventId;
+        const response = await fetch("/api/stream/", { headers });
+        if (response.status === 401) await loadToken();
+        if (!response.ok || !response.body) throw new Error(response.statusText);
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = "";
+        for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf("\n\n")) >= 0) {
+            const fields = {};
+            buffer.slice(0, end).split("\n").forEach((line) => {
+            const colon = line.indexOf(": ");
+            if (colon > 0) fields[line.slice(0, colon)] = line.slice(colon + 2);
+            });
+            buffer = buffer.slice(end + 2);
+            if (fields.event === "change") {
+            lastEventId = fields.id;
+            updateStats(JSON.parse(fields.data).stats);
+            }
+        }
+        }
+    } catch (error) {
+        await new Promise((resolve) => setTimeout(resolve, 5000));
+    }
+    }
+}
+
+async function loadFolders(data) {
+    if (data === undefined) data = await apiFetch("/api/folders/");
     state.folders = data || [];
     renderTable(
     document.querySelector("#folders-table tbody"),
@@ -222,8 +259,8 @@ async function loadFolders() {
     fillSelectOptions(document.getElementById("event-destination"), state.folders, "انتخاب مقصد");
 }
 
-async function loadItems() {
-    const data = await apiFetch("/api/items/");
+async function loadItems(data) {
+    if (data === undefined) data = await apiFetch("/api/items/");
     state.items = data || [];
     renderTable(
     document.querySelector("#items-table tbody"),
@@ -241,8 +278,8 @@ async function loadItems() {
     updateEventItemSelects();
 }
 
-async function loadUnits() {
-    const data = await apiFetch("/api/units/");
+async function loadUnits(data) {
+    if (data === undefined) data = await apiFetch("/api/units/");
     state.units = data || [];
     renderTable(
     document.querySelector("#units-table tbody"),
@@ -260,8 +297,8 @@ async function loadUnits() {
     updateUnitDatalist();
 }
 
-async function loadCustomers() {
-    const data = await apiFetch("/api/customers/");
+async function loadCustomers(data) {
+    if (data === undefined) data = await apiFetch("/api/customers/");
     state.customers = data || [];
     renderTable(
     document.querySelector("#customers-table tbody"),
@@ -519,8 +556,8 @@ function receiptPopulateEvents() {
     if (current) select.value = current;
 }
 
-async function loadEvents() {
-    const data = await apiFetch("/api/events/");
+async function loadEvents(data) {
+    if (data === undefined) data = await apiFetch("/api/events/");
     state.events = data || [];
 
     const rows = state.events.map((event) => [
@@ -539,8 +576,8 @@ async function loadEvents() {
     receiptRenderSavedList();
 }
 
-async function loadInventory() {
-    const data = await apiFetch("/api/inventory/");
+async function loadInventory(data) {
+    if (data === undefined) data = await apiFetch("/api/inventory/");
     const rows = (data || []).map((entry) => [
     entry.item_name,
     entry.folder_name,
@@ -1057,14 +1094,16 @@ async function initDashboard() {
 
     ["folders-table","items-table","units-table","customers-table","events-table"].forEach(ensureActionColumn);
 
+    // One round trip for every section; the loaders render what it returns.
+    const data = await apiFetch("/api/bootstrap/");
     await Promise.all([
-    loadStats(),
-    loadFolders(),
-    loadItems(),
-    loadUnits(),
-    loadCustomers(),
-    loadEvents(),
-    loadInventory(),
+    loadStats(data.stats),
+    loadFolders(data.folders),
+    loadItems(data.items),
+    loadUnits(data.units),
+    loadCustomers(data.customers),
+    loadEvents(data.events),
+    loadInventory(data.inventory),
     ]);
 
     if (!document.querySelector(".item-row")) addEventItemRow();
@@ -1072,6 +1111,8 @@ async function initDashboard() {
     renderDashboardFeed();
     receiptPopulateEvents();
     receiptRenderSavedList();
+    // Only where the server streams on its event loop (see STREAM_ENABLED).
+    if (document.body.dataset.stream === "on") watchChanges();
 }
 
 initDashboard().catch((error) => showToast(error.message, "error"));
\ No newline at end of file
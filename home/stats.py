@@ -0,0 +1,119 @@
+import asyncio
+
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+
+from .models import BusinessStats, Folder, FolderItem, Item
+
+LOW_STOCK_THRESHOLD = 5
+STATS_FIELDS = ("total_items", "total_folders", "total_value", "low_stock_count")
+
+# Keeps each summary query well below SQLite's bound-parameter limit.
+SUMMARY_BATCH_SIZE = 500
+
+_stock_value = Sum(
+    Case(
+        When(item__value__isnull=False, then=F("quantity") * F("item__value")),
+        default=0.0,
+        output_field=FloatField(),
+    )
+)
+_low_stock = Count("id", filter=Q(quantity__gt=0, quantity__lt=LOW_STOCK_THRESHOLD))
+
+
+def compute_business_stats(business):
+    """Aggregate the dashboard stats for a business from scratch."""
+    inventory = FolderItem.objects.filter(folder__business=business).aggregate(
+        total_value=_stock_value,
+        low_stock_count=_low_stock,
+    )
+    return {
+        "total_items": Item.objects.filter(business=business).count(),
+        "total_folders": Folder.objects.filter(business=business).count(),
+        "total_value": inventory["total_value"] or 0.0,
+        "low_stock_count": inventory["low_stock_count"],
+    }
+
+
+async def acompute_business_stats(business):
+    """``compute_business_stats`` for async views; the three aggregates are awaited together."""
+    inventory, total_items, total_folders = await asyncio.gather(
+        FolderItem.objects.filter(folder__business=business).aaggregate(
+            total_value=_stock_value,
+            low_stock_count=_low_stock,
+        ),
+        Item.objects.filter(business=business).acount(),
+        Folder.objects.filter(business=business).acount(),
+    )
+    return {
+        "total_items": total_items,
+        "total_folders": total_folders,
+        "total_value": inventory["total_value"] or 0.0,
+        "low_stock_count": inventory["low_stock_count"],
+    }
+
+
+def rebuild_business_stats(business):
+    stats = compute_business_stats(business)
+    BusinessStats.objects.update_or_create(business=business, defaults=stats)
+    return stats
+
+
+def get_business_stats(business):
+    """Return the maintained stats, building the rollup on first use."""
+    stats = BusinessStats.objects.filter(business=business).values(*STATS_FIELDS).first()
+    if stats is None:
+        stats = rebuild_business_stats(business)
+    return stats
+
+
+async def aget_business_stats(business):
+    stats = await BusinessStats.objects.filter(business=business).values(*STATS_FIELDS).afirst()
+    if stats is None:
+        stats = await acompute_business_stats(business)
+        await BusinessStats.objects.aupdate_or_create(business=business, defaults=stats)
+    return stats
+
+
+def adjust_business_stats(business_id, **deltas):
+    """Shift stored counters by the given amounts with a single atomic UPDATE."""
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if changes:
+        BusinessStats.objects.filter(business_id=business_id).update(**changes)
+
+
+def summarize_inventory(queryset):
+    """Return ``{business_id: (stock_value, low_stock_rows)}`` for FolderItem rows."""
+    rows = (
+        queryset.values("folder__business_id")
+        .annotate(total_value=_stock_value, low_stock_count=_low_stock)
+        .order_by()
+    )
+    return {
+        row["folder__business_id"]: (row["total_value"] or 0.0, row["low_stock_count"])
+        for row in rows
+    }
+
+
+def summarize_inventory_keys(keys):
+    """Summarize the FolderItem rows identified by ``(folder_id, item_id)`` keys."""
+    summary = {}
+    for start in range(0, len(keys), SUMMARY_BATCH_SIZE):
+        match = Q()
+        for folder_id, item_id in keys[start:start + SUMMARY_BATCH_SIZE]:
+            match |= Q(folder_id=folder_id, item_id=item_id)
+        for business_id, (value, low) in summarize_inventory(FolderItem.objects.filter(match)).items():
+            total_value, low_count = summary.get(business_id, (0.0, 0))
+            summary[business_id] = (total_value + value, low_count + low)
+    return summary
+
+
+def apply_inventory_change(before, after):
+    """Apply the difference between two ``summarize_inventory`` results."""
+    for business_id in set(before) | set(after):
+        old_value, old_low = before.get(business_id, (0.0, 0))
+        new_value, new_low = after.get(business_id, (0.0, 0))
+        adjust_business_stats(
+            business_id,
+            total_value=new_value - old_value,
+            low_stock_count=new_low - old_low,
+        )
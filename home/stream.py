@@ -0,0 +1,221 @@
+"""Server-sent events for ``/api/stream/``.
+
+A connection gets a ``change`` event with the business's data version, sync
+cursor and dashboard stats when it opens and after every committed write
+(see ``pubsub``), and a comment line as a keepalive while nothing happens.
+The stream ends when the access token expires; clients reconnect with a new
+token and ``Last-Event-ID``.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.urls import resolve, reverse
+
+from .metrics import registry
+from .pubsub import broker
+from .stats import get_business_stats
+from .sync import latest_cursor
+from .versions import get_version
+
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+KEEPALIVE = b": keepalive\n\n"
+
+CONNECTIONS_METRIC = "anbargar_stream_connections_total"
+MESSAGES_METRIC = "anbargar_stream_messages_total"
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, "STREAM_DB_THREADS", 4), thread_name_prefix="stream-db")
+_snapshots = {}
+
+
+def snapshot(business):
+    """The payload of a ``change`` event. The version is read first, so the stats are never older than it."""
+    version = get_version(business.id)
+    broker.seen(business.id, version)
+    stats = dict(get_business_stats(business))
+    stats["total_value"] = int(stats["total_value"])
+    return {"version": version, "cursor": str(latest_cursor(business.id)), "stats": stats}
+
+
+def _run_db(func, *args):
+    # Stream threads outlive requests, so recycle their connections the way a request would.
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def _shared_snapshot(business):
+    """``snapshot`` read once for all connections of a business woken by the same publish."""
+    loop = asyncio.get_running_loop()
+    key = (loop, business.id, broker.generation(business.id))
+    future = _snapshots.get(key)
+    if future is None:
+        future = _snapshots[key] = loop.run_in_executor(_executor, _run_db, snapshot, business)
+        future.add_done_callback(lambda _: _snapshots.pop(key, None))
+    # A disconnecting client must not cancel the read for the others.
+    return await asyncio.shield(future)
+
+
+class ChangeStream:
+    """The events of one connection.
+
+    Iterating it blocks a thread per connection (WSGI); ``aevents()`` waits on
+    the event loop instead and is what ``StreamRouter`` serves under ASGI.
+    """
+
+    def __init__(self, business, last_event_id=None, expires_at=None):
+        self.business = business
+        self.last_event_id = last_event_id
+        self.expires_at = expires_at
+        self._events = None
+
+    def __iter__(self):
+        self._events = self._iterate()
+        return self._events
+
+    def close(self):
+        # Called by Django when the response is closed, e.g. on disconnect.
+        if self._events is not None:
+            self._events.close()
+
+    def _iterate(self):
+        subscription = self._open()
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            changed = True
+            while True:
+                if changed:
+                    message = self._message(snapshot(self.business))
+                    if message:
+                        yield message
+                timeout = self._timeout()
+                if timeout <= 0:
+                    return
+                changed = subscription.wait(timeout)
+                if not changed:
+                    yield self._keepalive()
+        finally:
+            self._close(subscription)
+
+    async def aevents(self):
+        subscription = self._open()
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            changed = True
+            while True:
+                if changed:
+                    message = self._message(await _shared_snapshot(self.business))
+                    if message:
+                        yield message
+                timeout = self._timeout()
+                if timeout <= 0:
+                    return
+                changed = await subscription.wait_async(timeout)
+                if not changed:
+                    yield self._keepalive()
+        finally:
+            self._close(subscription)
+
+    def _open(self):
+        registry.increment(CONNECTIONS_METRIC, "Server-sent event streams opened and closed.", event="opened")
+        return broker.subscribe(self.business.id)
+
+    def _close(self, subscription):
+        broker.unsubscribe(subscription)
+        registry.increment(CONNECTIONS_METRIC, "Server-sent event streams opened and closed.", event="closed")
+
+    def _timeout(self):
+        if self.expires_at is None:
+            return HEARTBEAT_SECONDS
+        return min(HEARTBEAT_SECONDS, self.expires_at - time.time())
+
+    def _message(self, payload):
+        # Woken without a new version (a duplicate publish or a reconnect
+        # that is up to date): nothing to send.
+        event_id = str(payload["version"])
+        if event_id == self.last_event_id:
+            return None
+        self.last_event_id = event_id
+        registry.increment(MESSAGES_METRIC, "Server-sent event messages by kind.", kind="change")
+        data = json.dumps(payload, separators=(",", ":"))
+        return f"id: {event_id}\nevent: change\ndata: {data}\n\n".encode()
+
+    def _keepalive(self):
+        registry.increment(MESSAGES_METRIC, "Server-sent event messages by kind.", kind="keepalive")
+        return KEEPALIVE
+
+
+@cache
+def stream_path():
+    return reverse("api_stream")
+
+
+class StreamRouter:
+    """ASGI application that serves ``/api/stream/`` on the event loop and passes everything else on.
+
+    Django's ASGI handler gives each request in flight its own thread for sync
+    code, so a stream held open there would hold a thread (and it reads a sync
+    iterator to the end before sending, which an endless stream never
+    reaches). Here the view (auth and errors) runs on a small shared pool, and
+    an open stream is a coroutine waiting on a ``pubsub`` subscription. The
+    view runs without middleware.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == stream_path():
+            await serve_stream(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
+
+
+async def serve_stream(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    request = ASGIRequest(scope, BytesIO(body))
+    view = resolve(scope["path"]).func
+    response = await asyncio.get_running_loop().run_in_executor(_executor, _run_db, view, request)
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response.items()]
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+
+    stream = getattr(response, "change_stream", None)
+    if stream is None:
+        await send({"type": "http.response.body", "body": response.content})
+        return
+
+    async def pump():
+        async for chunk in stream.aevents():
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def disconnected():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        outcome, _ = await asyncio.gather(*tasks, return_exceptions=True)
+    if isinstance(outcome, Exception):
+        raise outcome
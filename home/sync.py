@@ -0,0 +1,135 @@
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Customer, Event, Folder, FolderItem, Item, SyncChange, Unit
+
+SYNC_PAGE_SIZE = 1000
+SYNC_MAX_PAGE_SIZE = 5000
+# Keeps each key lookup well below SQLite's bound-parameter limit.
+KEY_BATCH_SIZE = 400
+
+SYNC_KINDS = {
+    "items": Item,
+    "folders": Folder,
+    "units": Unit,
+    "customers": Customer,
+    "events": Event,
+    "inventory": FolderItem,
+}
+_KIND_BY_MODEL = {model: kind for kind, model in SYNC_KINDS.items()}
+
+
+def sync_kind(model):
+    return _KIND_BY_MODEL.get(model)
+
+
+def _business_column(model):
+    # Inventory rows belong to a business through their folder.
+    return "folder__business_id" if model._meta.model_name == "folderitem" else "business_id"
+
+
+def record_change(business_id, kind, object_id, deleted=False):
+    SyncChange.objects.create(business_id=business_id, kind=kind, object_id=object_id, deleted=deleted)
+
+
+def record_changes(business_id, kind, object_ids, deleted=False):
+    """Journal a batch of rows written with ``bulk_create``/``update()``, which skip signals."""
+    SyncChange.objects.bulk_create(
+        [SyncChange(business_id=business_id, kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids],
+        batch_size=KEY_BATCH_SIZE,
+    )
+
+
+def record_queryset(kind, queryset, deleted=False):
+    """Journal every row of ``queryset`` with one ``INSERT ... SELECT``; returns the row count."""
+    business_column = _business_column(queryset.model)
+    sql, params = queryset.order_by().values_list(business_column, "id").query.sql_with_params()
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SyncChange._meta.db_table} "
+            f"(business_id, object_id, kind, deleted, created_at) "
+            f"SELECT rows.*, %s, %s, %s FROM ({sql}) AS rows",
+            [kind, deleted, now, *params],
+        )
+        return cursor.rowcount
+
+
+def record_inventory_keys(keys):
+    """Journal the ``FolderItem`` rows identified by ``(folder_id, item_id)`` keys."""
+    for start in range(0, len(keys), KEY_BATCH_SIZE):
+        match = Q()
+        for folder_id, item_id in keys[start:start + KEY_BATCH_SIZE]:
+            match |= Q(folder_id=folder_id, item_id=item_id)
+        record_queryset("inventory", FolderItem.objects.filter(match))
+
+
+def backfill(business_id=None):
+    """Journal every existing synced row, so ``since=0`` returns the full dataset.
+
+    Used for rows that predate the journal or were bulk-inserted without it.
+    """
+    count = 0
+    for kind, model in SYNC_KINDS.items():
+        queryset = model.objects.all()
+        if business_id is not None:
+            queryset = queryset.filter(**{_business_column(model): business_id})
+        count += record_queryset(kind, queryset)
+    return count
+
+
+def changes_since(business_id, cursor, limit=SYNC_PAGE_SIZE):
+    """The latest state of each row changed after ``cursor``, one page at a time.
+
+    Returns ``(changed, deleted, next_cursor, has_more)``: ``changed`` and
+    ``deleted`` map each kind to object ids. A row changed several times in
+    the page appears once, as of its last change.
+    """
+    page = list(
+        SyncChange.objects.filter(business_id=business_id, id__gt=cursor)
+        .order_by("id")
+        .values_list("id", "kind", "object_id", "deleted")[:limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    latest = {}
+    for change_id, kind, object_id, deleted in page:
+        latest[(kind, object_id)] = deleted
+
+    changed = {kind: [] for kind in SYNC_KINDS}
+    deleted = {kind: [] for kind in SYNC_KINDS}
+    for (kind, object_id), is_deleted in latest.items():
+        (deleted if is_deleted else changed)[kind].append(object_id)
+
+    next_cursor = page[-1][0] if page else cursor
+    return changed, deleted, next_cursor, has_more
+
+
+def fetch_rows(kind, business_id, object_ids):
+    """Live rows of ``kind`` among ``object_ids``, in that order.
+
+    Rows deleted after the page was read are skipped; their tombstones
+    come with a later cursor.
+    """
+    model = SYNC_KINDS[kind]
+    queryset = model.objects.filter(**{_business_column(model): business_id})
+    found = queryset.in_bulk(object_ids)
+    return [found[pk] for pk in object_ids if pk in found]
+
+
+def latest_cursor(business_id):
+    return SyncChange.objects.filter(business_id=business_id).aggregate(last=Max("id"))["last"] or 0
+
+
+def compact():
+    """Drop journal rows superseded by a later change of the same row.
+
+    Lossless: a client at any cursor still receives the last change of
+    every row changed after it. Returns the number of deleted rows.
+    """
+    superseded = SyncChange.objects.exclude(
+        id__in=SyncChange.objects.values("kind", "object_id").annotate(last=Max("id")).values("last")
+    )
+    return superseded.delete()[0]
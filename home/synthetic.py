@@ -0,0 +1,172 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .folders import build_path
+from .models import Business, Customer, Event, EventItem, EventType, Folder, FolderItem, Item, Unit
+from .search import reindex
+from .stats import rebuild_business_stats
+from .sync import backfill as sync_backfill
+from .versions import bump_catalog_version, bump_version
+
+INSERT_BATCH_SIZE = 2000
+EVENT_TYPE_WEIGHTS = [(EventType.SELL, 70), (EventType.BUY, 25), (EventType.MOVE, 5)]
+UNIT_SYMBOLS = [("Piece", "pcs"), ("Box", "box"), ("Kilogram", "kg"), ("Liter", "l"), ("Pack", "pk")]
+
+
+def insert_rows(model, objects):
+    """Insert model instances as-is, keeping explicit ``created_at`` values.
+
+    ``bulk_create`` runs ``pre_save`` and would stamp every row with the
+    current time, which defeats generating a historical ledger.
+    """
+    if not objects:
+        return
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    rows = [[field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] for obj in objects]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _build_folders(business, count, fanout):
+    """Build a warehouse -> zone -> shelf style tree laid out breadth first."""
+    folders = []
+    for index in range(count):
+        parent = folders[(index - 1) // fanout] if index else None
+        folder = Folder(name=f"Folder {index + 1}", business=business, parent=parent)
+        # bulk_create skips the pre_save hook that maintains the path.
+        folder.path = build_path(folder, parent)
+        folders.append(folder)
+    return folders
+
+
+def generate_tenant(
+    name="Benchmark Business",
+    phone=None,
+    password="benchmark",
+    folders=20,
+    fanout=5,
+    items=1000,
+    customers=500,
+    events=10000,
+    lines_per_event=3,
+    days=365,
+    seed=None,
+    log=None,
+):
+    """Create one business with a user, catalog, stock and an event history.
+
+    Returns ``(business, user)``. Events are spread over the last ``days``
+    days in chronological order and are written in batches so memory stays
+    bounded for multi-million row ledgers.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+
+    with transaction.atomic():
+        phone = phone or f"0999{rng.randrange(10 ** 7):07d}"
+        user = User.objects.create_user(username=phone, password=password, first_name=name)
+        business = Business.objects.create(name=name)
+        business.users.add(user)
+
+        folder_objs = _build_folders(business, max(folders, 1), max(fanout, 1))
+        Folder.objects.bulk_create(folder_objs, batch_size=INSERT_BATCH_SIZE)
+
+        Unit.objects.bulk_create(
+            [Unit(name=unit_name, symbol=symbol, business=business) for unit_name, symbol in UNIT_SYMBOLS]
+        )
+
+        item_objs = [
+            Item(
+                name=f"Item {index + 1}",
+                sku=f"SKU-{index + 1:07d}",
+                barcode=f"{business.id.hex[:8]}{index + 1:010d}",
+                value=round(rng.uniform(1, 500), 2),
+                business=business,
+            )
+            for index in range(items)
+        ]
+        Item.objects.bulk_create(item_objs, batch_size=INSERT_BATCH_SIZE)
+        log(f"Created {len(folder_objs)} folders and {len(item_objs)} items.")
+
+        stock = []
+        for item in item_objs:
+            for folder in rng.sample(folder_objs, min(len(folder_objs), rng.randint(1, 3))):
+                stock.append(FolderItem(folder=folder, item=item, unit="pcs", quantity=float(rng.randint(0, 200))))
+        FolderItem.objects.bulk_create(stock, batch_size=INSERT_BATCH_SIZE)
+
+        customer_objs = [
+            Customer(
+                first_name=f"Customer {index + 1}",
+                last_name=None,
+                phone=f"0912{index:07d}",
+                business=business,
+            )
+            for index in range(customers)
+        ]
+        Customer.objects.bulk_create(customer_objs, batch_size=INSERT_BATCH_SIZE)
+        log(f"Created {len(stock)} stock rows and {len(customer_objs)} customers.")
+
+        # bulk_create skips the signals that keep the search index in sync.
+        reindex("items", business.id)
+        reindex("customers", business.id)
+
+    types = [event_type for event_type, _ in EVENT_TYPE_WEIGHTS]
+    weights = [weight for _, weight in EVENT_TYPE_WEIGHTS]
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / max(events, 1)
+    created = 0
+
+    while created < events:
+        batch_events = []
+        batch_lines = []
+        for index in range(created, min(created + INSERT_BATCH_SIZE, events)):
+            event_type = rng.choices(types, weights)[0]
+            created_at = start + step * index
+            event = Event(type=event_type, business=business, created_at=created_at, updated_at=created_at)
+            if event_type == EventType.MOVE and len(folder_objs) > 1:
+                event.origin_folder, event.destination_folder = rng.sample(folder_objs, 2)
+            else:
+                event.folder = rng.choice(folder_objs)
+            if event_type == EventType.SELL and customer_objs and rng.random() < 0.5:
+                event.customer = rng.choice(customer_objs)
+            batch_events.append(event)
+
+            for item in rng.sample(item_objs, min(len(item_objs), rng.randint(1, max(lines_per_event, 1)))):
+                batch_lines.append(
+                    EventItem(
+                        event=event,
+                        item=item,
+                        name=item.name,
+                        sku=item.sku,
+                        barcode=item.barcode,
+                        quantity=float(rng.randint(1, 10)),
+                        unit="pcs",
+                        value=item.value,
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+
+        with transaction.atomic():
+            insert_rows(Event, batch_events)
+            insert_rows(EventItem, batch_lines)
+        created += len(batch_events)
+        log(f"Created {created}/{events} events.")
+
+    rebuild_business_stats(business)
+    bump_version(business.id)
+    bump_catalog_version(business.id)
+    # Everything above was bulk-inserted without journal rows.
+    sync_backfill(business.id)
+    return business, user
@@ -1,3 +1,1923 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import api_urls, async_views, views
+from .api_utils import create_access_token, get_access_token_expiry
+from .benchmarks import EXCLUDED_ROUTES, run_benchmarks
+from .catalog_cache import CACHE_METRIC
+from .inventory import apply_event_inventory
+from .item_index import clear_item_indexes
+from .ledger import diff_inventory, latest_snapshot, load_snapshot, replay_ledger
+from .metrics import registry
+from .models import (
+    Business,
+    BusinessStats,
+    Customer,
+    Event,
+    EventItem,
+    EventType,
+    Folder,
+    FolderItem,
+    InventorySnapshot,
+    Item,
+    SyncChange,
+    Unit,
+)
+from .principals import clear_principals, get_cached_principal
+from .pubsub import ChangeBroker, broker
+from .slowlog import close_handlers, normalize_sql, read_records
+from .stats import compute_business_stats, get_business_stats, rebuild_business_stats
+from .stream import StreamRouter
+from .sync import SYNC_KINDS
+from .synthetic import generate_tenant
+from .text import normalize_text
+from .writer import GroupCommitWriter
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        clear_principals()
+        clear_item_indexes()
+        self.user = User.objects.create_user(username="09120000000", password="secret")
+        self.business = Business.objects.create(name="Test Business")
+        self.business.users.add(self.user)
+        self.folder = Folder.objects.create(name="Main", business=self.business)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {create_access_token(self.user.id)}"}
+
+    def create_item(self, name, quantity=0, value=None, folder=None):
+        item = Item.objects.create(name=name, value=value, business=self.business)
+        if quantity:
+            FolderItem.objects.create(
+                folder=folder or self.folder,
+                item=item,
+                quantity=quantity,
+                unit="unit",
+            )
+        return item
+
+    def record_sale(self, item, quantity, days_ago=0):
+        event = Event.objects.create(type=EventType.SELL, business=self.business, folder=self.folder)
+        EventItem.objects.create(event=event, item=item, name=item.name, quantity=quantity)
+        if days_ago:
+            Event.objects.filter(id=event.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return event
+
+
+class PrincipalCacheTests(ApiTestCase):
+    url = reverse("api_dashboard_stats")
+
+    def test_repeat_requests_skip_auth_queries(self):
+        rebuild_business_stats(self.business)
+
+        with self.assertNumQueries(4):
+            self.client.get(self.url, **self.auth)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+    def test_membership_change_invalidates_principal(self):
+        self.client.get(self.url, **self.auth)
+        other = Business.objects.create(name="Other")
+        Item.objects.create(name="Elsewhere", business=other)
+
+        self.business.users.remove(self.user)
+        other.users.add(self.user)
+
+        self.assertEqual(self.client.get(self.url, **self.auth).json()["total_items"], 1)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get(self.url, **self.auth)
+        self.user.delete()
+
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 401)
+
+    def test_entries_expire_with_the_token(self):
+        token = self.auth["HTTP_AUTHORIZATION"].split(" ", 1)[1]
+        self.client.get(self.url, **self.auth)
+        self.assertIsNotNone(get_cached_principal(token))
+
+        with mock.patch("home.principals.time.time", return_value=get_access_token_expiry(token) + 1):
+            self.assertIsNone(get_cached_principal(token))
+
+
+class DashboardStatsTests(ApiTestCase):
+    url = reverse("api_dashboard_stats")
+
+    def setUp(self):
+        super().setUp()
+        rebuild_business_stats(self.business)
+
+    def assertStatsFresh(self):
+        stored = get_business_stats(self.business)
+        fresh = compute_business_stats(self.business)
+        self.assertEqual(
+            {**stored, "total_value": round(stored["total_value"], 6)},
+            {**fresh, "total_value": round(fresh["total_value"], 6)},
+        )
+
+    def test_rollup_follows_writes(self):
+        tea = self.create_item("Tea", quantity=3, value=10)
+        coffee = self.create_item("Coffee", quantity=20, value=2.5)
+        shelf = Folder.objects.create(name="Shelf", business=self.business)
+        self.assertStatsFresh()
+
+        self.client.post(
+            reverse("api_events"),
+            {"type": "BUY", "folder_id": str(shelf.id), "items": [{"item_id": str(tea.id), "name": "Tea", "quantity": 2}]},
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertStatsFresh()
+
+        self.client.patch(reverse("api_item_detail", args=[coffee.id]), {"value": 4}, content_type="application/json", **self.auth)
+        self.assertStatsFresh()
+
+        entry = FolderItem.objects.get(folder=self.folder, item=coffee)
+        entry.quantity = 1
+        entry.save()
+        self.assertStatsFresh()
+
+        self.client.delete(reverse("api_folder_detail", args=[shelf.id]), **self.auth)
+        self.assertStatsFresh()
+
+        self.client.delete(reverse("api_item_detail", args=[tea.id]), **self.auth)
+        self.assertStatsFresh()
+
+        self.assertEqual(
+            self.client.get(self.url, **self.auth).json(),
+            {"total_items": 1, "total_folders": 1, "total_value": 4, "low_stock_count": 1},
+        )
+
+    def test_stats_are_read_from_the_rollup(self):
+        self.client.get(self.url, **self.auth)
+
+        # The data version for the ETag, then the rollup.
+        with self.assertNumQueries(2):
+            self.client.get(self.url, **self.auth)
+
+    def test_rebuild_command_reports_drift(self):
+        self.create_item("Tea", quantity=3, value=10)
+        BusinessStats.objects.filter(business=self.business).update(total_items=42)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_dashboard_stats", "--check", stdout=io.StringIO())
+
+        output = io.StringIO()
+        call_command("rebuild_dashboard_stats", stdout=output)
+        self.assertIn("total_items 42 -> 1", output.getvalue())
+        call_command("rebuild_dashboard_stats", "--check", stdout=io.StringIO())
+
+
+class ListPaginationTests(ApiTestCase):
+    def fetch_all(self, url, **params):
+        seen = []
+        cursor = None
+        while True:
+            query = {**params, **({"cursor": cursor} if cursor else {})}
+            body = self.client.get(url, query, **self.auth).json()
+            seen.extend(row["id"] for row in body["results"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                return seen
+
+    def test_unpaginated_requests_return_plain_lists(self):
+        self.create_item("Tea")
+
+        body = self.client.get(reverse("api_items"), **self.auth).json()
+
+        self.assertEqual([row["name"] for row in body], ["Tea"])
+
+    def test_pages_cover_every_row_once(self):
+        items = [self.create_item(f"Item {index}") for index in range(7)]
+
+        seen = self.fetch_all(reverse("api_items"), limit=3)
+
+        self.assertEqual(seen, [str(item.id) for item in items])
+
+    def test_rows_inserted_between_pages_are_not_skipped_or_repeated(self):
+        for index in range(4):
+            self.create_item(f"Item {index}")
+        url = reverse("api_items")
+
+        first = self.client.get(url, {"limit": 2}, **self.auth).json()
+        self.create_item("Late")
+        rest = self.fetch_all(url, limit=2, cursor=first["next_cursor"])
+
+        ids = [row["id"] for row in first["results"]] + rest
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_event_filters(self):
+        tea = self.create_item("Tea", quantity=10)
+        shelf = Folder.objects.create(name="Shelf", business=self.business)
+        old_sale = self.record_sale(tea, 1, days_ago=10)
+        recent_sale = self.record_sale(tea, 1)
+        purchase = Event.objects.create(type=EventType.BUY, business=self.business, folder=shelf)
+        url = reverse("api_events")
+
+        def ids(**params):
+            return {row["id"] for row in self.client.get(url, params, **self.auth).json()}
+
+        self.assertEqual(ids(type="SELL"), {str(old_sale.id), str(recent_sale.id)})
+        self.assertEqual(ids(folder_id=str(shelf.id)), {str(purchase.id)})
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertEqual(ids(type="SELL", created_after=since), {str(recent_sale.id)})
+        self.assertEqual(self.client.get(url, {"created_after": "soon"}, **self.auth).status_code, 400)
+
+    def test_inventory_filters(self):
+        self.create_item("Low", quantity=2)
+        self.create_item("High", quantity=50)
+
+        response = self.client.get(reverse("api_inventory"), {"max_quantity": 5, "limit": 10}, **self.auth)
+
+        self.assertEqual([row["item_name"] for row in response.json()["results"]], ["Low"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("api_units"), {"cursor": "bogus"}, **self.auth)
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(ApiTestCase):
+    def export(self, name, **params):
+        response = self.client.get(reverse("api_export", args=name.split(".")), params, **self.auth)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_inventory_ndjson(self):
+        self.create_item("Tea", quantity=4)
+
+        response, body = self.export("inventory.ndjson")
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([(row["item_name"], row["folder_name"], row["quantity"]) for row in rows], [("Tea", "Main", 4)])
+
+    def test_events_csv_with_nested_lines(self):
+        tea = self.create_item("Tea", quantity=4)
+        coffee = self.create_item("Coffee", quantity=4)
+        event = self.record_sale(tea, 1)
+        EventItem.objects.create(event=event, item=coffee, name="Coffee", quantity=2)
+        self.record_sale(tea, 3)
+
+        _, body = self.export("events.csv", include_items="1")
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            {row["item_name"] for row in rows if row["id"] == str(event.id)},
+            {"Tea", "Coffee"},
+        )
+
+    def test_events_ndjson_nests_lines(self):
+        tea = self.create_item("Tea", quantity=4)
+        self.record_sale(tea, 1)
+
+        _, body = self.export("events.ndjson", include_items="true")
+
+        row = json.loads(body)
+        self.assertEqual(row["type"], "SELL")
+        self.assertEqual([line["name"] for line in row["items"]], ["Tea"])
+
+    def test_unknown_dataset(self):
+        response = self.client.get(reverse("api_export", args=["secrets", "csv"]), **self.auth)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryPlanTests(ApiTestCase):
+    """Run EXPLAIN QUERY PLAN on the statements hot endpoints actually issue."""
+
+    def setUp(self):
+        super().setUp()
+        tea = self.create_item("Tea", quantity=3, value=10)
+        self.create_item("Coffee", quantity=30, value=5)
+        self.record_sale(tea, 1, days_ago=2)
+        rebuild_business_stats(self.business)
+
+    def assertNoFullScans(self, method, url, data=None, **params):
+        with CaptureQueriesContext(connection) as queries:
+            if method == "get":
+                self.client.get(url, params, **self.auth)
+            else:
+                self.client.post(url, data, content_type="application/json", **self.auth)
+
+        statements = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].startswith(("SELECT", "UPDATE", "DELETE"))
+        ]
+        self.assertTrue(statements)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    # FTS5 lists the constraints it serves after the colon; none means a full scan.
+                    if re.search(r"VIRTUAL TABLE INDEX \d+:\S", detail):
+                        continue
+                    if detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail:
+                        self.fail(f"Full table scan ({detail}) in: {sql}")
+
+    def test_dashboard_stats(self):
+        self.assertNoFullScans("get", reverse("api_dashboard_stats"))
+
+    def test_stats_rebuild(self):
+        BusinessStats.objects.all().delete()
+        self.assertNoFullScans("get", reverse("api_dashboard_stats"))
+
+    def test_predict_stockout(self):
+        self.assertNoFullScans("get", reverse("api_ai_predict_stockout"))
+
+    def test_list_pages(self):
+        for name in ("api_items", "api_customers", "api_folders", "api_units", "api_events", "api_inventory"):
+            self.assertNoFullScans("get", reverse(name), limit=10)
+
+    def test_filtered_lists(self):
+        self.assertNoFullScans("get", reverse("api_events"), type="SELL", created_after="2020-01-01", limit=10)
+        self.assertNoFullScans("get", reverse("api_events"), folder_id=str(self.folder.id))
+        self.assertNoFullScans("get", reverse("api_inventory"), max_quantity=5)
+
+    def test_folder_rollup(self):
+        self.assertNoFullScans("get", reverse("api_folder_rollup", args=[self.folder.id]))
+
+    def test_inventory_as_of(self):
+        call_command("rebuild_inventory", stdout=io.StringIO())
+        self.assertNoFullScans("get", reverse("api_inventory"), as_of=timezone.now().isoformat())
+
+    def test_search(self):
+        self.assertNoFullScans("get", reverse("api_search"), q="te")
+
+    def test_event_creation(self):
+        self.assertNoFullScans("post", reverse("api_events"), {
+            "type": "SELL",
+            "folder_id": str(self.folder.id),
+            "customer_name": "Sara",
+            "customer_phone": "0912",
+            "items": [{"name": "tea", "quantity": 1}],
+        })
+
+    def test_bulk_event_creation(self):
+        self.assertNoFullScans("post", reverse("api_events_bulk"), {"events": [{
+            "type": "SELL",
+            "folder_id": str(self.folder.id),
+            "customer_phone": "0912",
+            "items": [{"name": "tea", "quantity": 1}],
+        }]})
+
+
+class PredictStockoutTests(ApiTestCase):
+    url = reverse("api_ai_predict_stockout")
+
+    def test_burn_rate_averages_sales_per_day(self):
+        item = self.create_item("Rice", quantity=10)
+        self.record_sale(item, 2, days_ago=1)
+        self.record_sale(item, 4, days_ago=1)
+        self.record_sale(item, 4, days_ago=2)
+        self.record_sale(item, 50, days_ago=60)
+
+        response = self.client.get(self.url, **self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        prediction = response.json()["predictions"][0]
+        self.assertEqual(prediction["avg_daily_sales"], 5)
+        self.assertEqual(prediction["days_until_stockout"], 2)
+        self.assertEqual(prediction["suggestion"], "Restock urgently.")
+        self.assertEqual(response.json()["total_low_stock_risk"], 1)
+
+    def test_items_without_stock_are_skipped(self):
+        self.create_item("Empty")
+        stocked = self.create_item("Stocked", quantity=3)
+
+        predictions = self.client.get(self.url, **self.auth).json()["predictions"]
+
+        self.assertEqual([p["item_id"] for p in predictions], [str(stocked.id)])
+        self.assertEqual(predictions[0]["days_until_stockout"], 999)
+
+    def test_query_count_does_not_grow_with_catalog(self):
+        for index in range(3):
+            self.record_sale(self.create_item(f"Item {index}", quantity=10), 1)
+
+        with self.assertNumQueries(5):
+            self.client.get(self.url, **self.auth)
+
+        for index in range(3, 30):
+            self.record_sale(self.create_item(f"Item {index}", quantity=10), 1)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, **self.auth)
+        self.assertEqual(len(response.json()["predictions"]), 30)
+
+
+class ConditionalGetTests(ApiTestCase):
+    def test_unchanged_resource_is_not_modified(self):
+        self.create_item("Bolt", quantity=3)
+        url = reverse("api_items")
+        response = self.client.get(url, **self.auth)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        # Only the data version is read; the view does not run.
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_writes_change_the_etag(self):
+        item = self.create_item("Bolt", quantity=3)
+        url = reverse("api_inventory")
+        etag = self.client.get(url, **self.auth)["ETag"]
+
+        self.client.post(
+            reverse("api_events"),
+            {
+                "type": "SELL",
+                "folder_id": str(self.folder.id),
+                "items": [{"item_id": str(item.id), "name": item.name, "quantity": 1}],
+            },
+            content_type="application/json",
+            **self.auth,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()[0]["quantity"], 2)
+
+    def test_one_bump_per_transaction(self):
+        item = self.create_item("Bolt", quantity=3)
+        version = Business.objects.get(id=self.business.id).data_version
+
+        with transaction.atomic():
+            event = Event.objects.create(type=EventType.SELL, business=self.business, folder=self.folder)
+            EventItem.objects.create(event=event, item=item, name=item.name, quantity=1)
+            FolderItem.objects.filter(item=item).first().save()
+        self.assertEqual(Business.objects.get(id=self.business.id).data_version, version + 1)
+
+        try:
+            with transaction.atomic():
+                Unit.objects.create(name="Box", business=self.business)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with transaction.atomic():
+            Unit.objects.create(name="Box", business=self.business)
+        self.assertEqual(Business.objects.get(id=self.business.id).data_version, version + 2)
+
+    def test_errors_and_other_businesses_get_no_match(self):
+        url = reverse("api_folders")
+        etag = self.client.get(url, **self.auth)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn("ETag", response)
+
+        other = User.objects.create_user(username="09120000001", password="secret")
+        other_auth = {"HTTP_AUTHORIZATION": f"Bearer {create_access_token(other.id)}"}
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **other_auth).status_code, 200)
+
+    def test_stockout_etag_expires_with_the_hour(self):
+        url = reverse("api_ai_predict_stockout")
+        etag = self.client.get(url, **self.auth)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+
+        with mock.patch("home.views.timezone.now", return_value=timezone.now() + timedelta(hours=1)):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 200)
+
+    def test_async_views_share_the_etag(self):
+        self.create_item("Bolt", quantity=3)
+        etag = self.client.get(reverse("api_items"), **self.auth)["ETag"]
+
+        request = RequestFactory().get(reverse("api_items"), HTTP_IF_NONE_MATCH=etag, **self.auth)
+        response = async_to_sync(async_views.api_items)(request)
+
+        self.assertEqual(response.status_code, 304)
+
+
+class CatalogCacheTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def cache_results(self, kind):
+        return (
+            registry.counter(CACHE_METRIC, kind=kind, result="hit"),
+            registry.counter(CACHE_METRIC, kind=kind, result="miss"),
+        )
+
+    def test_repeat_reads_are_served_from_the_cache(self):
+        self.create_item("Bolt")
+        url = reverse("api_items")
+        first = self.client.get(url, **self.auth)
+
+        # The ETag's data version is the only query; nothing is serialized.
+        with mock.patch("home.views._serialize_item") as serialize, self.assertNumQueries(1):
+            second = self.client.get(url, **self.auth)
+        serialize.assert_not_called()
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.cache_results("items"), (1, 1))
+        self.assertIn('anbargar_catalog_cache_requests_total{kind="items",result="hit"} 1', registry.render())
+
+    def test_query_strings_are_cached_separately(self):
+        for name in ("Box", "Pack"):
+            Unit.objects.create(name=name, symbol=name[0], business=self.business)
+        url = reverse("api_units")
+
+        page = self.client.get(url, {"limit": 1}, **self.auth).json()
+        everything = self.client.get(url, **self.auth).json()
+
+        self.assertEqual(len(page["results"]), 1)
+        self.assertEqual(len(everything), 2)
+        self.assertEqual(self.cache_results("units"), (0, 2))
+
+    def test_writes_invalidate_the_lists(self):
+        url = reverse("api_folders")
+        self.client.get(url, **self.auth)
+
+        # Its own transaction, as in a real request, so the data version moves.
+        with transaction.atomic():
+            self.client.post(url, {"name": "Back room"}, content_type="application/json", **self.auth)
+        names = [folder["name"] for folder in self.client.get(url, **self.auth).json()]
+
+        self.assertEqual(sorted(names), ["Back room", "Main"])
+        self.assertEqual(self.cache_results("folders"), (0, 2))
+
+    def test_writes_from_other_processes_invalidate_the_lists(self):
+        item = self.create_item("Bolt")
+        url = reverse("api_items")
+        self.client.get(url, **self.auth)
+
+        # Another worker's write reaches this one only through the database.
+        Item.objects.filter(pk=item.pk).update(name="Nut")
+        Business.objects.filter(pk=self.business.pk).update(catalog_version=F("catalog_version") + 1)
+
+        self.assertEqual([row["name"] for row in self.client.get(url, **self.auth).json()], ["Nut"])
+        self.assertEqual(self.cache_results("items"), (0, 2))
+
+    def test_stock_writes_keep_the_lists_cached(self):
+        item = self.create_item("Bolt", quantity=5)
+        url = reverse("api_items")
+        self.client.get(url, **self.auth)
+
+        with transaction.atomic():
+            self.client.post(
+                reverse("api_events"),
+                {"type": "SELL", "folder_id": str(self.folder.id), "items": [{"item_id": str(item.id), "name": "Bolt", "quantity": 1}]},
+                content_type="application/json",
+                **self.auth,
+            )
+        self.assertEqual(FolderItem.objects.get(item=item).quantity, 4)
+        self.client.get(url, **self.auth)
+
+        self.assertEqual(self.cache_results("items"), (1, 1))
+
+    def test_async_view_shares_the_cache(self):
+        self.create_item("Bolt")
+        expected = self.client.get(reverse("api_items"), **self.auth).content
+
+        request = RequestFactory().get(reverse("api_items"), **self.auth)
+        response = async_to_sync(async_views.api_items)(request)
+
+        self.assertEqual(response.content, expected)
+        self.assertEqual(self.cache_results("items"), (1, 1))
+
+
+class AsyncViewTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    def assertSameResponse(self, name, params=None):
+        request = self.factory.get(reverse(name), params or {}, **self.auth)
+        expected = getattr(views, name)(request)
+        clear_principals()
+        request = self.factory.get(reverse(name), params or {}, **self.auth)
+        actual = async_to_sync(getattr(async_views, name))(request)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(json.loads(actual.content), json.loads(expected.content))
+
+    def test_async_views_match_sync_views(self):
+        rice = self.create_item("Rice", quantity=10, value=3)
+        self.create_item("Tea", quantity=4, value=5)
+        self.record_sale(rice, 2, days_ago=1)
+        self.record_sale(rice, 3)
+
+        for name, params in (
+            ("api_dashboard_stats", None),
+            ("api_items", None),
+            ("api_items", {"limit": 1}),
+            ("api_events", {"type": "SELL", "limit": 1}),
+            ("api_events", {"type": "BOGUS"}),
+            ("api_inventory", {"folder_id": str(self.folder.id), "subtree": "1"}),
+            ("api_inventory", {"min_quantity": 5}),
+            ("api_ai_predict_stockout", {"days_history": 7}),
+        ):
+            with self.subTest(name=name, params=params):
+                self.assertSameResponse(name, params)
+
+    def test_async_views_require_a_token(self):
+        response = async_to_sync(async_views.api_items)(self.factory.get(reverse("api_items")))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_middleware_serves_async_requests(self):
+        response = await self.async_client.get(
+            reverse("api_items"), headers={"authorization": self.auth["HTTP_AUTHORIZATION"]}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        queries = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response["Server-Timing"])
+        self.assertGreater(int(queries.group(1)), 0)
+
+    async def test_slow_query_log_sees_async_requests(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(close_handlers)
+        log_path = Path(directory.name) / "slow.jsonl"
+
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_PATH=log_path):
+            response = await self.async_client.get(
+                reverse("api_units"), headers={"authorization": self.auth["HTTP_AUTHORIZATION"]}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        records = list(read_records(log_path))
+        self.assertTrue(records)
+        self.assertEqual({record["view"] for record in records}, {"api_units"})
+
+
+class InventoryEngineTests(ApiTestCase):
+    url = reverse("api_events")
+
+    def post_event(self, payload):
+        return self.client.post(self.url, payload, content_type="application/json", **self.auth)
+
+    def quantity(self, item, folder=None):
+        entry = FolderItem.objects.filter(folder=folder or self.folder, item=item).first()
+        return entry.quantity if entry else None
+
+    def test_buy_creates_and_increments_stock(self):
+        item = self.create_item("Tea")
+        lines = [{"item_id": str(item.id), "name": "Tea", "quantity": 4, "unit": "box"}]
+
+        self.post_event({"type": "BUY", "folder_id": str(self.folder.id), "items": lines})
+        self.post_event({"type": "BUY", "folder_id": str(self.folder.id), "items": lines})
+
+        entry = FolderItem.objects.get(folder=self.folder, item=item)
+        self.assertEqual(entry.quantity, 8)
+        self.assertEqual(entry.unit, "box")
+
+    def test_sell_clamps_at_zero(self):
+        item = self.create_item("Tea", quantity=3)
+
+        self.post_event({
+            "type": "SELL",
+            "folder_id": str(self.folder.id),
+            "items": [{"item_id": str(item.id), "name": "Tea", "quantity": 5}],
+        })
+
+        self.assertEqual(self.quantity(item), 0)
+
+    def test_move_updates_both_folders_and_delete_reverses(self):
+        item = self.create_item("Tea", quantity=10)
+        shelf = Folder.objects.create(name="Shelf", business=self.business)
+
+        response = self.post_event({
+            "type": "MOVE",
+            "origin_folder_id": str(self.folder.id),
+            "destination_folder_id": str(shelf.id),
+            "items": [{"item_id": str(item.id), "name": "Tea", "quantity": 4}],
+        })
+        self.assertEqual((self.quantity(item), self.quantity(item, shelf)), (6, 4))
+
+        self.client.delete(reverse("api_event_detail", args=[response.json()["id"]]), **self.auth)
+        self.assertEqual((self.quantity(item), self.quantity(item, shelf)), (10, 0))
+
+    def test_inventory_is_updated_in_one_statement(self):
+        items = [self.create_item(f"Item {index}", quantity=10) for index in range(20)]
+        lines = [{"item_id": str(item.id), "name": item.name, "quantity": 1} for item in items]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post_event({"type": "SELL", "folder_id": str(self.folder.id), "items": lines})
+
+        statements = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].startswith(("UPDATE \"home_folderitem\"", "INSERT INTO \"home_folderitem\""))
+        ]
+        self.assertEqual(len(statements), 1)
+        self.assertEqual({entry.quantity for entry in FolderItem.objects.all()}, {9})
+
+
+class LedgerRebuildTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tea = self.create_item("Tea", value=10)
+        self.shelf = Folder.objects.create(name="Shelf", business=self.business)
+        self.post_event("BUY", 10)
+        self.post_event("SELL", 3)
+        self.post_event("MOVE", 2)
+
+    def post_event(self, event_type, quantity):
+        folders = (
+            {"origin_folder_id": str(self.folder.id), "destination_folder_id": str(self.shelf.id)}
+            if event_type == "MOVE"
+            else {"folder_id": str(self.folder.id)}
+        )
+        return self.client.post(
+            reverse("api_events"),
+            {"type": event_type, **folders, "items": [{"item_id": str(self.tea.id), "name": "Tea", "quantity": quantity}]},
+            content_type="application/json",
+            **self.auth,
+        )
+
+    def rebuild(self, *args):
+        out = io.StringIO()
+        call_command("rebuild_inventory", *args, business=str(self.business.id), stdout=out)
+        return out.getvalue()
+
+    def test_replay_matches_inventory_and_checkpoints(self):
+        output = self.rebuild("--checkpoint-every", "2")
+
+        self.assertIn("replayed 3 events", output)
+        self.assertIn("0 row(s) differ", output)
+        self.assertEqual(
+            sorted(InventorySnapshot.objects.values_list("events_replayed", flat=True)),
+            [2, 3],
+        )
+        final = load_snapshot(latest_snapshot(self.business))
+        self.assertEqual(final.quantities, {(self.folder.id, self.tea.id): 5, (self.shelf.id, self.tea.id): 2})
+
+    def test_reports_and_fixes_drift(self):
+        FolderItem.objects.filter(folder=self.folder, item=self.tea).update(quantity=40)
+        FolderItem.objects.filter(folder=self.shelf, item=self.tea).delete()
+
+        output = self.rebuild()
+        self.assertIn("2 row(s) differ", output)
+        self.assertIn("stored 40, ledger 5", output)
+        self.assertIn("stored missing, ledger 2", output)
+
+        self.rebuild("--apply")
+        self.assertEqual(FolderItem.objects.get(folder=self.folder, item=self.tea).quantity, 5)
+        self.assertEqual(FolderItem.objects.get(folder=self.shelf, item=self.tea).quantity, 2)
+        self.assertEqual(get_business_stats(self.business), compute_business_stats(self.business))
+        self.assertIn("0 row(s) differ", self.rebuild())
+
+    def test_resume_replays_only_new_events(self):
+        self.rebuild()
+        self.post_event("BUY", 4)
+
+        output = self.rebuild("--resume")
+        self.assertIn("resuming after 3 events", output)
+        self.assertIn("replayed 1 events", output)
+        self.assertIn("0 row(s) differ", output)
+
+    def backdate_events(self, *days_ago):
+        for event, days in zip(Event.objects.order_by("created_at"), days_ago):
+            Event.objects.filter(id=event.id).update(created_at=timezone.now() - timedelta(days=days))
+
+    def as_of(self, days_ago, **params):
+        at = (timezone.now() - timedelta(days=days_ago)).isoformat()
+        response = self.client.get(reverse("api_inventory"), {"as_of": at, **params}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return {(row["folder_name"], row["item_name"]): row["quantity"] for row in response.json()}
+
+    def test_inventory_as_of_replays_the_ledger(self):
+        self.backdate_events(30, 20, 10)
+
+        self.assertEqual(self.as_of(40), {})
+        self.assertEqual(self.as_of(25), {("Main", "Tea"): 10})
+        self.assertEqual(self.as_of(15), {("Main", "Tea"): 7})
+        self.assertEqual(self.as_of(0), {("Main", "Tea"): 5, ("Shelf", "Tea"): 2})
+        self.assertEqual(self.as_of(0, folder_id=str(self.shelf.id)), {("Shelf", "Tea"): 2})
+
+    def test_inventory_as_of_starts_from_nearest_snapshot(self):
+        self.backdate_events(30, 20, 10)
+        self.rebuild("--checkpoint-every", "1")
+        second = InventorySnapshot.objects.get(events_replayed=2)
+        second.lines.update(quantity=99)
+
+        self.assertEqual(self.as_of(25), {("Main", "Tea"): 10})
+        self.assertEqual(self.as_of(15), {("Main", "Tea"): 99})
+        self.assertEqual(self.as_of(0), {("Main", "Tea"): 5, ("Shelf", "Tea"): 2})
+
+    def test_inventory_as_of_validates_timestamp(self):
+        response = self.client.get(reverse("api_inventory"), {"as_of": "yesterday"}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleting_an_event_drops_later_snapshots(self):
+        self.rebuild("--checkpoint-every", "1")
+        first = Event.objects.order_by("created_at").first()
+        last = Event.objects.order_by("created_at").last()
+
+        self.client.delete(reverse("api_event_detail", args=[last.id]), **self.auth)
+        self.assertEqual(InventorySnapshot.objects.count(), 2)
+
+        self.client.delete(reverse("api_event_detail", args=[first.id]), **self.auth)
+        self.assertFalse(InventorySnapshot.objects.exists())
+
+    def test_deleting_a_folder_keeps_the_ledger_consistent(self):
+        self.rebuild("--checkpoint-every", "1")
+
+        # The shelf's first event is the MOVE, the third.
+        response = self.client.delete(reverse("api_folder_detail", args=[self.shelf.id]), **self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(sorted(InventorySnapshot.objects.values_list("events_replayed", flat=True)), [1, 2])
+        self.assertIn("0 row(s) differ", self.rebuild())
+
+    def test_other_leg_of_a_move_survives_its_folder(self):
+        self.rebuild()
+
+        self.client.delete(reverse("api_folder_detail", args=[self.folder.id]), **self.auth)
+
+        self.assertFalse(InventorySnapshot.objects.exists())
+        self.assertEqual(FolderItem.objects.get(folder=self.shelf, item=self.tea).quantity, 2)
+        self.assertIn("0 row(s) differ", self.rebuild())
+
+    def test_moves_need_both_folders(self):
+        response = self.client.post(
+            reverse("api_events"),
+            {"type": "MOVE", "destination_folder_id": str(self.shelf.id), "items": [{"name": "Tea", "quantity": 1}]},
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class FolderTreeTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.zone = self.create_folder("Zone", self.folder)
+        self.shelf = self.create_folder("Shelf", self.zone)
+        self.other = self.create_folder("Other")
+        self.tea = self.create_item("Tea", quantity=4, value=10, folder=self.shelf)
+        FolderItem.objects.create(folder=self.zone, item=self.tea, quantity=1, unit="unit")
+
+    def create_folder(self, name, parent=None):
+        response = self.client.post(
+            reverse("api_folders"),
+            {"name": name, "parent_id": str(parent.id) if parent else None},
+            content_type="application/json",
+            **self.auth,
+        )
+        return Folder.objects.get(id=response.json()["id"])
+
+    def patch_parent(self, folder, parent):
+        return self.client.patch(
+            reverse("api_folder_detail", args=[folder.id]),
+            {"parent_id": str(parent.id) if parent else None},
+            content_type="application/json",
+            **self.auth,
+        )
+
+    def rollup(self, folder):
+        return self.client.get(reverse("api_folder_rollup", args=[folder.id]), **self.auth).json()
+
+    def path_of(self, folder):
+        return Folder.objects.values_list("path", flat=True).get(id=folder.id)
+
+    def test_paths_follow_parents(self):
+        self.assertEqual(self.path_of(self.shelf), f"/{self.folder.id.hex}/{self.zone.id.hex}/{self.shelf.id.hex}/")
+        self.assertEqual(self.path_of(self.other), f"/{self.other.id.hex}/")
+
+    def test_rollup_covers_descendants(self):
+        rollup = self.rollup(self.folder)
+        self.assertEqual(rollup["total_quantity"], 5)
+        self.assertEqual(rollup["total_value"], 50)
+        self.assertEqual(rollup["items"], [{"item_id": str(self.tea.id), "item_name": "Tea", "quantity": 5, "value": 50}])
+        self.assertEqual(self.rollup(self.other)["items"], [])
+
+    def test_inventory_subtree_filter(self):
+        response = self.client.get(
+            reverse("api_inventory"), {"folder_id": str(self.folder.id), "subtree": "1"}, **self.auth
+        )
+        self.assertEqual(sorted(row["folder_name"] for row in response.json()), ["Shelf", "Zone"])
+
+    def test_inventory_subtree_filter_is_scoped_to_the_business(self):
+        foreign = Folder.objects.create(name="Foreign", business=Business.objects.create(name="Other"))
+        response = self.client.get(reverse("api_inventory"), {"folder_id": str(foreign.id), "subtree": "1"}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_moving_a_subtree_rebases_descendants(self):
+        response = self.patch_parent(self.zone, self.other)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.path_of(self.shelf), f"/{self.other.id.hex}/{self.zone.id.hex}/{self.shelf.id.hex}/")
+        self.assertEqual(self.rollup(self.other)["total_quantity"], 5)
+        self.assertEqual(self.rollup(self.folder)["total_quantity"], 0)
+
+        self.patch_parent(self.zone, None)
+        self.assertEqual(self.path_of(self.shelf), f"/{self.zone.id.hex}/{self.shelf.id.hex}/")
+
+    def test_cycles_are_rejected(self):
+        for parent in (self.zone, self.shelf):
+            with self.subTest(parent=parent.name):
+                response = self.patch_parent(self.zone, parent)
+                self.assertEqual(response.status_code, 400)
+        self.zone.refresh_from_db()
+        self.assertEqual(self.zone.parent_id, self.folder.id)
+
+    def test_parent_must_belong_to_business(self):
+        foreign = Folder.objects.create(name="Foreign", business=Business.objects.create(name="Other"))
+        self.assertEqual(self.patch_parent(self.zone, foreign).status_code, 404)
+        response = self.client.post(
+            reverse("api_folders"), {"name": "X", "parent_id": str(foreign.id)}, content_type="application/json", **self.auth
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_deleting_a_folder_reroots_its_children(self):
+        self.client.delete(reverse("api_folder_detail", args=[self.zone.id]), **self.auth)
+
+        self.shelf.refresh_from_db()
+        self.assertIsNone(self.shelf.parent_id)
+        self.assertEqual(self.shelf.path, f"/{self.shelf.id.hex}/")
+
+    def test_deleting_a_subtree(self):
+        self.client.delete(reverse("api_folder_detail", args=[self.folder.id]) + "?subtree=1", **self.auth)
+
+        self.assertEqual(list(Folder.objects.filter(business=self.business)), [self.other])
+        self.assertFalse(FolderItem.objects.exists())
+        self.assertEqual(get_business_stats(self.business), compute_business_stats(self.business))
+
+    def test_merge_moves_children_stock_and_events(self):
+        event = Event.objects.create(type=EventType.BUY, business=self.business, folder=self.zone)
+        child = self.create_folder("Bin", self.zone)
+        FolderItem.objects.create(folder=self.other, item=self.tea, quantity=2, unit="unit")
+
+        response = self.client.post(
+            reverse("api_folder_merge", args=[self.zone.id]),
+            {"target_id": str(self.other.id)},
+            content_type="application/json",
+            **self.auth,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Folder.objects.filter(id=self.zone.id).exists())
+        self.assertEqual(FolderItem.objects.get(folder=self.other, item=self.tea).quantity, 3)
+        self.assertEqual(set(Folder.objects.filter(parent=self.other)), {self.shelf, child})
+        self.assertEqual(self.path_of(self.shelf), f"/{self.other.id.hex}/{self.shelf.id.hex}/")
+        event.refresh_from_db()
+        self.assertEqual(event.folder_id, self.other.id)
+        self.assertEqual(get_business_stats(self.business), compute_business_stats(self.business))
+
+    def test_merge_into_own_subtree_is_rejected(self):
+        response = self.client.post(
+            reverse("api_folder_merge", args=[self.zone.id]),
+            {"target_id": str(self.shelf.id)},
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ItemLookupTests(ApiTestCase):
+    url = reverse("api_items_lookup")
+
+    def setUp(self):
+        super().setUp()
+        self.tea = Item.objects.create(name="Tea", sku="TEA-1", barcode="6260001", business=self.business)
+        self.cup = Item.objects.create(name="Cup", sku="CUP-1", barcode="6260002", business=self.business)
+
+    def test_single_lookup_is_served_from_memory(self):
+        self.client.get(self.url, {"barcode": "6260001"}, **self.auth)
+
+        with self.assertNumQueries(0):
+            by_barcode = self.client.get(self.url, {"barcode": "6260001"}, **self.auth)
+            by_sku = self.client.get(self.url, {"sku": " cup-1 "}, **self.auth)
+        self.assertEqual(by_barcode.json()["id"], str(self.tea.id))
+        self.assertEqual(by_sku.json()["id"], str(self.cup.id))
+        self.assertEqual(self.client.get(self.url, {"barcode": "missing"}, **self.auth).status_code, 404)
+
+    def test_batch_lookup(self):
+        response = self.client.get(self.url, {"barcode": ["6260001", "missing"], "sku": "TEA-1,CUP-1"}, **self.auth)
+        body = response.json()
+        self.assertEqual(body["barcode"]["6260001"]["name"], "Tea")
+        self.assertIsNone(body["barcode"]["missing"])
+        self.assertEqual([body["sku"][code]["name"] for code in ("TEA-1", "CUP-1")], ["Tea", "Cup"])
+
+        response = self.client.post(self.url, {"barcodes": ["6260002"]}, content_type="application/json", **self.auth)
+        self.assertEqual(response.json()["barcode"]["6260002"]["name"], "Cup")
+
+    def test_post_string_is_one_comma_separated_value(self):
+        response = self.client.post(self.url, {"barcodes": "6260001,6260002"}, content_type="application/json", **self.auth)
+        self.assertEqual(list(response.json()["barcode"]), ["6260001", "6260002"])
+
+    def test_post_rejects_codes_that_are_not_strings(self):
+        for payload in ({"barcodes": 5}, {"skus": {"TEA-1": 1}}, {"barcodes": ["6260001", 6260002]}):
+            response = self.client.post(self.url, payload, content_type="application/json", **self.auth)
+            self.assertEqual(response.status_code, 400, payload)
+
+    def test_item_writes_invalidate_the_index(self):
+        self.client.get(self.url, {"barcode": "6260001"}, **self.auth)
+
+        self.client.patch(
+            reverse("api_item_detail", args=[self.tea.id]), {"barcode": "6260009"},
+            content_type="application/json", **self.auth,
+        )
+        self.assertEqual(self.client.get(self.url, {"barcode": "6260001"}, **self.auth).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {"barcode": "6260009"}, **self.auth).json()["name"], "Tea")
+
+        self.client.post(
+            reverse("api_items"), {"name": "Sugar", "barcode": "6260003"},
+            content_type="application/json", **self.auth,
+        )
+        self.assertEqual(self.client.get(self.url, {"barcode": "6260003"}, **self.auth).json()["name"], "Sugar")
+
+        self.client.delete(reverse("api_item_detail", args=[self.cup.id]), **self.auth)
+        self.assertEqual(self.client.get(self.url, {"sku": "CUP-1"}, **self.auth).status_code, 404)
+
+    def test_index_is_scoped_to_the_business(self):
+        Item.objects.create(name="Foreign", barcode="999", business=Business.objects.create(name="Other"))
+        self.assertEqual(self.client.get(self.url, {"barcode": "999"}, **self.auth).status_code, 404)
+
+
+class ItemNameResolutionTests(ApiTestCase):
+    def post_event(self, names):
+        return self.client.post(
+            reverse("api_events"),
+            {"type": "BUY", "folder_id": str(self.folder.id), "items": [{"name": name, "quantity": 1} for name in names]},
+            content_type="application/json",
+            **self.auth,
+        )
+
+    def linked_items(self, response):
+        event = Event.objects.get(id=response.json()["id"])
+        return [line.item_id for line in event.event_items.order_by("created_at")]
+
+    def test_normalize_text_folds_persian_forms_and_digits(self):
+        self.assertEqual(normalize_text(" كيك  ۱۲۳ "), normalize_text("کیک 123"))
+        self.assertEqual(normalize_text("می\u200cخواهم"), normalize_text("میخواهم"))
+        self.assertEqual(normalize_text("TEA ٤"), "tea 4")
+
+    def test_names_resolve_with_folding(self):
+        cake = self.create_item("كيك ۱۲۳")
+        tea = self.create_item("Green Tea")
+
+        response = self.post_event(["کیک 123", "green  TEA", "Unknown"])
+
+        self.assertEqual(self.linked_items(response), [cake.id, tea.id, None])
+
+    def test_ambiguous_names_stay_unlinked(self):
+        self.create_item("Tea")
+        self.create_item("tea")
+        self.assertEqual(self.linked_items(self.post_event(["TEA"])), [None])
+
+    def test_all_names_resolve_with_one_item_query(self):
+        for index in range(20):
+            self.create_item(f"Item {index}")
+        self.post_event(["Item 0"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_event([f"Item {index}" for index in range(20)])
+
+        self.assertNotIn(None, self.linked_items(response))
+        item_selects = [q["sql"] for q in queries.captured_queries if q["sql"].startswith('SELECT "home_item"')]
+        self.assertEqual(len(item_selects), 1)
+
+    def test_item_writes_invalidate_names(self):
+        tea = self.create_item("Tea")
+        self.post_event(["Tea"])
+
+        self.client.patch(
+            reverse("api_item_detail", args=[tea.id]), {"name": "Black Tea"},
+            content_type="application/json", **self.auth,
+        )
+        self.assertEqual(self.linked_items(self.post_event(["Tea", "black tea"])), [None, tea.id])
+
+    def test_bulk_events_use_the_same_resolution(self):
+        cake = self.create_item("كيك")
+        response = self.client.post(
+            reverse("api_events_bulk"),
+            {"events": [{"type": "BUY", "folder_id": str(self.folder.id), "items": [{"name": "کیک", "quantity": 2}]}]},
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(EventItem.objects.get().item_id, cake.id)
+
+
+class SearchTests(ApiTestCase):
+    url = reverse("api_search")
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, {"q": q, **params}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, results, kind="items"):
+        return [row.get("name") or row.get("first_name") for row in results[kind]]
+
+    def test_prefix_match_folds_persian_forms(self):
+        Item.objects.create(name="كيك شكلاتي", sku="CK-1", business=self.business)
+        Item.objects.create(name="Green Tea", barcode="6260001", business=self.business)
+
+        self.assertEqual(self.names(self.search("کیک شک")), ["كيك شكلاتي"])
+        self.assertEqual(self.names(self.search("gre")), ["Green Tea"])
+        self.assertEqual(self.names(self.search("۶۲۶۰")), ["Green Tea"])
+        self.assertEqual(self.names(self.search("tea cake")), [])
+
+    def test_name_hits_rank_above_description_hits(self):
+        Item.objects.create(name="Cup", description="Goes with tea", business=self.business)
+        Item.objects.create(name="Tea", business=self.business)
+        self.assertEqual(self.names(self.search("tea", type="items")), ["Tea", "Cup"])
+
+    def test_older_exact_hits_outrank_newer_prefix_hits(self):
+        Item.objects.create(name="Tea", business=self.business)
+        for index in range(5):
+            Item.objects.create(name=f"Teapot Large {index}", business=self.business)
+
+        with mock.patch("home.search.RANK_CANDIDATES", 2):
+            self.assertEqual(self.names(self.search("tea", type="items"))[0], "Tea")
+
+    def test_customers_match_name_phone_and_address(self):
+        Customer.objects.create(first_name="سارا", last_name="احمدی", phone="09121234567", business=self.business)
+        Customer.objects.create(first_name="Ali", address="خیابان ولیعصر", business=self.business)
+
+        self.assertEqual(self.names(self.search("۰۹۱۲۱", type="customers"), "customers"), ["سارا"])
+        self.assertEqual(self.names(self.search("احمد", type="customers"), "customers"), ["سارا"])
+        self.assertEqual(self.names(self.search("ولي", type="customers"), "customers"), ["Ali"])
+
+    def test_index_follows_writes(self):
+        tea = Item.objects.create(name="Tea", business=self.business)
+        self.client.patch(
+            reverse("api_item_detail", args=[tea.id]), {"name": "Coffee"},
+            content_type="application/json", **self.auth,
+        )
+        self.assertEqual(self.names(self.search("tea")), [])
+        self.assertEqual(self.names(self.search("cof")), ["Coffee"])
+
+        tea.delete()
+        self.assertEqual(self.names(self.search("cof")), [])
+
+        line = {"name": "Tea", "quantity": 1}
+        self.client.post(
+            reverse("api_events"),
+            {"type": "SELL", "folder_id": str(self.folder.id), "customer_name": "Sara Karimi", "items": [line]},
+            content_type="application/json", **self.auth,
+        )
+        self.client.post(
+            reverse("api_events_bulk"),
+            {"events": [{"type": "SELL", "folder_id": str(self.folder.id), "customer_phone": "09351112233",
+                         "items": [line]}]},
+            content_type="application/json", **self.auth,
+        )
+        self.assertEqual(self.names(self.search("kar"), "customers"), ["Sara"])
+        self.assertEqual(self.names(self.search("0935"), "customers"), ["Customer"])
+
+    def test_results_are_scoped_to_the_business(self):
+        other = Business.objects.create(name="Other")
+        Item.objects.create(name="Tea", business=other)
+        self.assertEqual(self.search("tea")["items"], [])
+
+        other.delete()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM home_item_fts")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_operators_in_the_query_are_plain_text(self):
+        Item.objects.create(name="Tea", business=self.business)
+        self.assertEqual(self.names(self.search('tea" OR *')), [])
+        self.assertEqual(self.names(self.search("NEAR(tea)")), [])
+        self.assertEqual(self.client.get(self.url, {"q": " "}, **self.auth).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"q": "tea", "type": "units"}, **self.auth).status_code, 400)
+
+    def test_reindex_command_rebuilds_the_tables(self):
+        Item.objects.create(name="Tea", business=self.business)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM home_item_fts")
+        self.assertEqual(self.search("tea")["items"], [])
+
+        call_command("reindex_search", stdout=io.StringIO())
+        self.assertEqual(self.names(self.search("tea")), ["Tea"])
+
+
+class BootstrapTests(ApiTestCase):
+    url = reverse("api_bootstrap")
+
+    def setUp(self):
+        super().setUp()
+        self.item = self.create_item("Bolt", quantity=3, value=10)
+        Customer.objects.create(first_name="Sara", business=self.business)
+        self.record_sale(self.item, 1)
+        rebuild_business_stats(self.business)
+
+    def test_sections_match_their_endpoints(self):
+        self.client.get(self.url, **self.auth)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        endpoints = {
+            "stats": "api_dashboard_stats",
+            "folders": "api_folders",
+            "items": "api_items",
+            "units": "api_units",
+            "customers": "api_customers",
+            "events": "api_events",
+            "inventory": "api_inventory",
+        }
+        self.assertEqual(list(data), list(endpoints))
+        for section, name in endpoints.items():
+            self.assertEqual(data[section], self.client.get(reverse(name), **self.auth).json(), section)
+
+    def test_include_limits_the_sections(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {"include": "items,stats"}, **self.auth)
+        self.assertEqual(list(response.json()), ["stats", "items"])
+
+        response = self.client.get(self.url, {"include": "stats,orders"}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("orders", response.json()["detail"])
+
+    def test_list_parameters_apply_to_every_list(self):
+        self.create_item("Nut", quantity=1)
+        data = self.client.get(self.url, {"limit": 1, "include": "items,inventory,stats"}, **self.auth).json()
+        self.assertEqual(len(data["items"]["results"]), 1)
+        self.assertIsNotNone(data["items"]["next_cursor"])
+        self.assertEqual(len(data["inventory"]["results"]), 1)
+        self.assertEqual(data["stats"]["total_items"], 2)
+
+        bad = self.client.get(self.url, {"limit": "x"}, **self.auth)
+        self.assertEqual(bad.status_code, 400)
+
+
+class SyncTests(ApiTestCase):
+    url = reverse("api_sync")
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params["since"] = since
+        response = self.client.get(self.url, params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, rows):
+        return sorted(row["id"] for row in rows)
+
+    def test_full_sync_then_nothing(self):
+        item = self.create_item("Bolt", quantity=3)
+        customer = Customer.objects.create(first_name="Sara", business=self.business)
+
+        first = self.sync()
+        self.assertEqual(self.ids(first["items"]), [str(item.id)])
+        self.assertEqual(self.ids(first["folders"]), [str(self.folder.id)])
+        self.assertEqual(self.ids(first["customers"]), [str(customer.id)])
+        self.assertEqual(first["inventory"][0]["quantity"], 3)
+        self.assertFalse(first["has_more"])
+
+        second = self.sync(first["cursor"])
+        self.assertEqual(second["cursor"], first["cursor"])
+        self.assertTrue(all(not second[kind] for kind in SYNC_KINDS))
+
+    def test_delta_contains_only_changes_and_tombstones(self):
+        bolt = self.create_item("Bolt", quantity=3)
+        self.create_item("Nut", quantity=3)
+        customer = Customer.objects.create(first_name="Sara", business=self.business)
+        cursor = self.sync()["cursor"]
+
+        self.client.patch(
+            reverse("api_item_detail", args=[bolt.id]), {"value": 9}, content_type="application/json", **self.auth
+        )
+        self.client.post(
+            reverse("api_events"),
+            {
+                "type": "SELL",
+                "folder_id": str(self.folder.id),
+                "items": [{"item_id": str(bolt.id), "name": "Bolt", "quantity": 1}],
+            },
+            content_type="application/json",
+            **self.auth,
+        )
+        self.client.delete(reverse("api_customer_detail", args=[customer.id]), **self.auth)
+
+        delta = self.sync(cursor)
+        self.assertEqual(self.ids(delta["items"]), [str(bolt.id)])
+        self.assertEqual(delta["items"][0]["value"], 9)
+        self.assertEqual(len(delta["events"]), 1)
+        self.assertEqual([(row["item_id"], row["quantity"]) for row in delta["inventory"]], [(str(bolt.id), 2)])
+        self.assertEqual(delta["deleted"]["customers"], [str(customer.id)])
+        self.assertEqual(delta["folders"], [])
+
+    def test_folder_delete_leaves_tombstones_for_its_stock(self):
+        child = Folder.objects.create(name="Shelf", business=self.business, parent=self.folder)
+        self.create_item("Bolt", quantity=3)
+        stock = FolderItem.objects.get(folder=self.folder)
+        cursor = self.sync()["cursor"]
+
+        self.client.delete(reverse("api_folder_detail", args=[self.folder.id]), **self.auth)
+
+        delta = self.sync(cursor)
+        self.assertEqual(delta["deleted"]["folders"], [str(self.folder.id)])
+        self.assertEqual(delta["deleted"]["inventory"], [str(stock.id)])
+        self.assertEqual([(row["id"], row["parent_id"]) for row in delta["folders"]], [(str(child.id), None)])
+
+    def test_inventory_rows_follow_renames_through_their_ids(self):
+        bolt = self.create_item("Bolt", quantity=3)
+        first = self.sync()
+        self.assertEqual(
+            first["inventory"],
+            [{"id": str(FolderItem.objects.get(item=bolt).id), "folder_id": str(self.folder.id),
+              "item_id": str(bolt.id), "quantity": 3, "unit": "unit"}],
+        )
+
+        self.client.patch(
+            reverse("api_item_detail", args=[bolt.id]), {"name": "Hex bolt"}, content_type="application/json", **self.auth
+        )
+
+        delta = self.sync(first["cursor"])
+        self.assertEqual([(row["id"], row["name"]) for row in delta["items"]], [(str(bolt.id), "Hex bolt")])
+        self.assertEqual(delta["inventory"], [])
+
+    def test_pages_follow_the_cursor(self):
+        for index in range(5):
+            Unit.objects.create(name=f"Unit {index}", symbol=str(index), business=self.business)
+
+        seen = []
+        cursor = 0
+        while True:
+            page = self.sync(cursor, limit=2)
+            seen += page["units"]
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                break
+        self.assertEqual(len(seen), 5)
+
+    def test_bulk_events_are_journaled(self):
+        item = self.create_item("Bolt", quantity=3)
+        cursor = self.sync()["cursor"]
+
+        self.client.post(
+            reverse("api_events_bulk"),
+            {
+                "events": [
+                    {
+                        "type": "BUY",
+                        "folder_id": str(self.folder.id),
+                        "items": [{"item_id": str(item.id), "name": "Bolt", "quantity": 2}],
+                    }
+                ]
+            },
+            content_type="application/json",
+            **self.auth,
+        )
+
+        delta = self.sync(cursor)
+        self.assertEqual(len(delta["events"]), 1)
+        self.assertEqual(delta["inventory"][0]["quantity"], 5)
+
+    def test_compaction_keeps_the_latest_change(self):
+        item = self.create_item("Bolt")
+        cursor = self.sync()["cursor"]
+        for value in (1, 2, 3):
+            item.value = value
+            item.save()
+
+        call_command("compact_sync_log", stdout=io.StringIO())
+
+        self.assertEqual(SyncChange.objects.filter(object_id=item.id).count(), 1)
+        self.assertEqual(self.sync(cursor)["items"][0]["value"], 3)
+
+    def test_other_businesses_are_not_visible(self):
+        other = Business.objects.create(name="Other")
+        Item.objects.create(name="Elsewhere", business=other)
+
+        self.assertEqual(self.sync()["items"], [])
+
+
+@override_settings(STREAM_POLL_SECONDS=0)
+class StreamTests(ApiTestCase):
+    url = reverse("api_stream")
+
+    def open(self, **headers):
+        response = self.client.get(self.url, **self.auth, **headers)
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = iter(response.streaming_content)
+        self.assertEqual(next(events), b"retry: 5000\n\n")
+        return events
+
+    def change(self, chunk):
+        lines = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if line)
+        self.assertEqual(lines["event"], "change")
+        payload = json.loads(lines["data"])
+        self.assertEqual(lines["id"], str(payload["version"]))
+        return payload
+
+    def test_requires_auth(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_dashboard_opens_the_stream_only_when_enabled(self):
+        self.client.force_login(self.user)
+        for enabled, flag in [(False, 'data-stream="off"'), (True, 'data-stream="on"')]:
+            with override_settings(STREAM_ENABLED=enabled):
+                self.assertContains(self.client.get(reverse("dashboard")), flag)
+
+    def test_sends_stats_on_connect_and_after_each_commit(self):
+        registry.reset()
+        item = self.create_item("Bolt", value=10)
+        events = self.open()
+        first = self.change(next(events))
+        self.assertEqual(first["stats"]["total_value"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("api_events"),
+                {"type": "BUY", "folder_id": str(self.folder.id),
+                 "items": [{"item_id": str(item.id), "name": "Bolt", "quantity": 3}]},
+                content_type="application/json",
+                **self.auth,
+            )
+        second = self.change(next(events))
+        self.assertGreater(second["version"], first["version"])
+        self.assertEqual(second["stats"]["total_value"], 30)
+        self.assertGreater(int(second["cursor"]), int(first["cursor"]))
+        self.assertEqual(registry.counter("anbargar_stream_messages_total", kind="change"), 2)
+
+    def test_up_to_date_reconnect_gets_keepalives(self):
+        version = Business.objects.get(id=self.business.id).data_version
+        with mock.patch("home.stream.HEARTBEAT_SECONDS", 0.01):
+            events = self.open(HTTP_LAST_EVENT_ID=str(version))
+            self.assertEqual(next(events), b": keepalive\n\n")
+
+    def test_closing_the_response_unsubscribes(self):
+        response = self.client.get(self.url, **self.auth)
+        events = iter(response.streaming_content)
+        next(events)
+        self.assertEqual(broker.subscriber_count(), 1)
+        response.close()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class ChangeBrokerTests(TransactionTestCase):
+    def setUp(self):
+        self.business = Business.objects.create(name="Test Business")
+        self.broker = ChangeBroker()
+
+    def test_publish_from_a_thread_wakes_loop_subscribers(self):
+        async def listen():
+            subscriptions = [self.broker.subscribe(self.business.id) for _ in range(3)]
+            other = self.broker.subscribe(uuid.uuid4())
+            threading.Thread(target=self.broker.publish, args=(self.business.id,)).start()
+            woken = await asyncio.gather(*(s.wait_async(5) for s in subscriptions))
+            idle = await other.wait_async(0.01)
+            for subscription in subscriptions + [other]:
+                self.broker.unsubscribe(subscription)
+            return woken, idle
+
+        self.assertEqual(async_to_sync(listen)(), ([True, True, True], False))
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    def test_poller_notices_writes_made_elsewhere(self):
+        with self.settings(STREAM_POLL_SECONDS=0.01):
+            subscription = self.broker.subscribe(self.business.id)
+            self.addCleanup(self.broker.unsubscribe, subscription)
+            self.broker.seen(self.business.id, 0)
+            # Another process bumping the version publishes nothing here.
+            Business.objects.filter(id=self.business.id).update(data_version=F("data_version") + 1)
+            self.assertTrue(subscription.wait(5))
+
+    def test_router_serves_the_stream_on_the_event_loop(self):
+        user = User.objects.create_user(username="09120000000", password="secret")
+        self.business.users.add(user)
+        token = create_access_token(user.id)
+        passed = []
+
+        async def django_application(scope, receive, send):
+            passed.append(scope["path"])
+
+        async def request(path, headers):
+            disconnect = asyncio.Event()
+            messages = []
+            scope = {
+                "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+                "headers": [(b"host", b"testserver")] + headers, "server": ("testserver", 80),
+            }
+
+            async def receive():
+                if not messages:
+                    return {"type": "http.request", "body": b""}
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                if b"event: change" in message.get("body", b""):
+                    disconnect.set()
+
+            await asyncio.wait_for(StreamRouter(django_application)(scope, receive, send), 5)
+            return messages
+
+        stream = async_to_sync(request)(reverse("api_stream"), [(b"authorization", f"Bearer {token}".encode())])
+        denied = async_to_sync(request)(reverse("api_stream"), [])
+        async_to_sync(request)(reverse("api_items"), [])
+
+        self.assertEqual(stream[0]["status"], 200)
+        self.assertIn(b"event: change", stream[-1]["body"])
+        self.assertEqual(denied[0]["status"], 401)
+        self.assertEqual(passed, [reverse("api_items")])
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class BulkEventTests(ApiTestCase):
+    url = reverse("api_events_bulk")
+
+    def post_events(self, events):
+        return self.client.post(self.url, {"events": events}, content_type="application/json", **self.auth)
+
+    def sale(self, name, quantity=1, **extra):
+        return {"type": "SELL", "folder_id": str(self.folder.id), "items": [{"name": name, "quantity": quantity}], **extra}
+
+    def test_events_are_created_and_inventory_applied(self):
+        tea = self.create_item("Tea", quantity=10)
+        coffee = self.create_item("Coffee")
+
+        response = self.post_events([
+            self.sale("tea", 3),
+            self.sale("TEA", 2, customer_name="Sara Ahmadi", customer_phone="0912"),
+            {"type": "BUY", "folder_id": str(self.folder.id), "items": [{"item_id": str(coffee.id), "name": "Coffee", "quantity": 7}]},
+        ])
+
+        body = response.json()
+        self.assertEqual((body["created"], body["failed"]), (3, 0))
+        self.assertEqual(FolderItem.objects.get(item=tea).quantity, 5)
+        self.assertEqual(FolderItem.objects.get(item=coffee).quantity, 7)
+        self.assertEqual(EventItem.objects.filter(item=tea).count(), 2)
+        self.assertEqual(Event.objects.get(id=body["results"][1]["event"]["id"]).customer.last_name, "Ahmadi")
+
+    def test_inventory_matches_posting_events_one_by_one(self):
+        tea = self.create_item("Tea")
+        other = Folder.objects.create(name="Other", business=self.business)
+
+        def movements(folder):
+            return [
+                {"type": event_type, "folder_id": str(folder.id), "items": [{"item_id": str(tea.id), "name": "Tea", "quantity": quantity}]}
+                for event_type, quantity in [("BUY", 10), ("SELL", 15), ("BUY", 5), ("SELL", 5)]
+            ]
+
+        for payload in movements(self.folder):
+            self.client.post(reverse("api_events"), payload, content_type="application/json", **self.auth)
+        self.post_events(movements(other))
+
+        self.assertEqual(FolderItem.objects.get(folder=self.folder, item=tea).quantity, 0)
+        self.assertEqual(FolderItem.objects.get(folder=other, item=tea).quantity, 0)
+        self.assertEqual(list(diff_inventory(self.business, replay_ledger(self.business))), [])
+
+    def test_failures_are_reported_per_event(self):
+        self.create_item("Tea", quantity=10)
+
+        response = self.post_events([
+            self.sale("Tea"),
+            {"type": "LEND", "items": [{"name": "Tea", "quantity": 1}]},
+            self.sale("Tea", quantity="lots"),
+            {"type": "SELL", "folder_id": str(uuid.uuid4()), "items": [{"name": "Tea", "quantity": 1}]},
+        ])
+
+        body = response.json()
+        self.assertEqual((body["created"], body["failed"]), (1, 3))
+        self.assertEqual(
+            [result.get("detail") for result in body["results"]],
+            [None, "Invalid event type.", "Event item quantity must be a number.", "Folder not found."],
+        )
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(FolderItem.objects.get().quantity, 9)
+
+    def test_customers_are_shared_across_the_batch(self):
+        self.create_item("Tea", quantity=10)
+
+        self.post_events([self.sale("Tea", customer_phone="0912") for _ in range(3)])
+
+        self.assertEqual(Event.objects.values("customer_id").distinct().count(), 1)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        for index in range(5):
+            self.create_item(f"Item {index}", quantity=1000)
+
+        def count_queries(events):
+            with CaptureQueriesContext(connection) as queries:
+                self.post_events(events)
+            return len(queries)
+
+        count_queries([self.sale("Item 0")])
+        small = count_queries([self.sale(f"Item {index % 5}", customer_phone="0912") for index in range(5)])
+        large = count_queries([self.sale(f"Item {index % 5}", customer_phone="0912") for index in range(80)])
+        self.assertEqual(small, large)
+
+
+class MetricsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_server_timing_reports_phases(self):
+        self.create_item("Bolt", quantity=3)
+        response = self.client.get(reverse("api_items"), **self.auth)
+
+        timing = response["Server-Timing"]
+        for name in ("db;", "auth;", "serialize;", "encode;", "total;"):
+            self.assertIn(name, timing)
+        self.assertRegex(timing, r'db;dur=[0-9.]+;desc="\d+ queries"')
+
+    def test_metrics_endpoint_requires_token_or_staff(self):
+        url = reverse("api_metrics")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 403)
+
+        with self.settings(METRICS_TOKEN="scrape-secret"):
+            response = self.client.get(url, HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, 200)
+
+        User.objects.filter(id=self.user.id).update(is_staff=True)
+        clear_principals()
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 200)
+
+    def test_metrics_are_recorded_per_route(self):
+        self.client.get(reverse("api_items"), **self.auth)
+        self.client.get(reverse("api_items"), **self.auth)
+        self.client.get(reverse("api_folders"), **self.auth)
+
+        with self.settings(METRICS_TOKEN="scrape-secret"):
+            body = self.client.get(reverse("api_metrics"), HTTP_AUTHORIZATION="Bearer scrape-secret").content.decode()
+
+        self.assertIn("# TYPE anbargar_request_duration_seconds histogram", body)
+        self.assertIn('anbargar_request_duration_seconds_count{route="api_items",method="GET"} 2', body)
+        self.assertIn('anbargar_request_duration_seconds_bucket{route="api_items",method="GET",le="+Inf"} 2', body)
+        self.assertIn('anbargar_requests_total{route="api_folders",method="GET",status="200"} 1', body)
+        self.assertRegex(body, r'anbargar_db_queries_total\{route="api_items",method="GET"\} [1-9]')
+        self.assertRegex(body, r'anbargar_response_bytes_count\{route="api_items",method="GET"\} 2')
+
+
+class SlowQueryLogTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(close_handlers)
+        self.log_path = Path(directory.name) / "slow.jsonl"
+        self.record_sale(self.create_item("Tea", quantity=10), 2, days_ago=1)
+
+    def capture(self, url, **settings):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_PATH=self.log_path, **settings):
+            self.client.get(url, **self.auth)
+        return list(read_records(self.log_path))
+
+    def test_records_view_plan_and_params(self):
+        records = self.capture(reverse("api_ai_predict_stockout"), SLOW_QUERY_LOG_PARAMS=True)
+
+        self.assertTrue(records)
+        self.assertEqual({record["view"] for record in records}, {"api_ai_predict_stockout"})
+        selects = [record for record in records if record["sql"].startswith("SELECT")]
+        self.assertTrue(selects)
+        self.assertTrue(all(record["plan"] for record in selects))
+        self.assertTrue(any(str(self.business.id.hex) in map(str, record["params"]) for record in selects))
+
+    def test_params_are_redacted_by_default(self):
+        records = self.capture(reverse("api_ai_predict_stockout"))
+
+        self.assertTrue(records)
+        self.assertTrue(all(record["plan"] for record in records if record["sql"].startswith("SELECT")))
+        self.assertNotIn(self.business.id.hex, self.log_path.read_text())
+        self.assertTrue(all(record["params"].endswith("(redacted)") for record in records if "%s" in record["sql"]))
+
+    def test_disabled_without_threshold(self):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=None, SLOW_QUERY_LOG_PATH=self.log_path):
+            self.client.get(reverse("api_items"), **self.auth)
+        self.assertFalse(self.log_path.exists())
+
+    def test_normalize_sql_collapses_literals_and_lists(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            normalize_sql("SELECT *  FROM t WHERE id IN (%s) AND name = 'yy' LIMIT 5"),
+        )
+
+    def test_summary_command_groups_by_shape(self):
+        self.capture(reverse("api_items"))
+        self.capture(reverse("api_items"))
+        out = io.StringIO()
+        call_command("slow_queries", path=str(self.log_path), view="api_items", stdout=out)
+
+        output = out.getvalue()
+        self.assertRegex(output, r"#\d count=2 ")
+        self.assertIn("views: api_items x2", output)
+        self.assertIn("plan: ", output)
+
+
+class SqliteProfileTests(TestCase):
+    def open_connection(self, pragmas):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = type(connections["default"])({**connection.settings_dict, "NAME": str(Path(directory.name) / "db.sqlite3")})
+        self.addCleanup(wrapper.close)
+        with self.settings(SQLITE_PRAGMAS=pragmas):
+            wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        wrapper = self.open_connection({
+            "journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 7000, "cache_size": -8192,
+        })
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(wrapper, "synchronous"), 1)
+        self.assertEqual(self.pragma(wrapper, "busy_timeout"), 7000)
+        self.assertEqual(self.pragma(wrapper, "cache_size"), -8192)
+
+    def test_development_profile_keeps_sqlite_defaults(self):
+        self.assertEqual(self.pragma(self.open_connection({}), "journal_mode"), "delete")
+
+
+class BenchmarkBudgetTests(TestCase):
+    def setUp(self):
+        clear_principals()
+        self.business, self.user = generate_tenant(
+            folders=6, items=30, customers=10, events=200, days=30, seed=7,
+        )
+
+    def test_generated_tenant_shape(self):
+        self.assertEqual(Item.objects.filter(business=self.business).count(), 30)
+        self.assertEqual(Event.objects.filter(business=self.business).count(), 200)
+        self.assertTrue(Folder.objects.filter(business=self.business, parent__isnull=False).exists())
+        oldest = Event.objects.filter(business=self.business).order_by("created_at").first()
+        self.assertLess(oldest.created_at, timezone.now() - timedelta(days=29))
+        self.assertEqual(get_business_stats(self.business), compute_business_stats(self.business))
+
+    def test_every_route_stays_within_its_query_budget(self):
+        results = run_benchmarks(self.business, self.user, iterations=1, host="testserver")
+
+        covered = {name.split(":")[0] for name in results} | set(EXCLUDED_ROUTES)
+        self.assertEqual(covered, {pattern.name for pattern in api_urls.urlpatterns})
+        for name, result in results.items():
+            with self.subTest(endpoint=name):
+                self.assertLess(result["status"], 400)
+                self.assertTrue(
+                    result["within_budget"],
+                    f"{name} issued {result['queries']} queries (budget {result['query_budget']})",
+                )
+
+
+class GroupCommitTests(TransactionTestCase):
+    def setUp(self):
+        self.business = Business.objects.create(name="Test Business")
+        self.writer = GroupCommitWriter()
+        self.addCleanup(self.writer.stop)
+
+    def test_concurrent_jobs_share_a_commit_and_fail_alone(self):
+        started, release = threading.Event(), threading.Event()
+        results = {}
+
+        def job(name):
+            def write():
+                if name == "first":
+                    started.set()
+                    release.wait(5)
+                Unit.objects.create(name=name, symbol=name, business=self.business)
+                if name == "bad":
+                    raise ValueError("rejected")
+                return name
+            return write
+
+        def submit(name):
+            try:
+                results[name] = self.writer.submit(job(name))
+            except ValueError as exc:
+                results[name] = exc
+
+        names = ["first", "a", "b", "bad", "c"]
+        threads = [threading.Thread(target=submit, args=(names[0],))]
+        threads[0].start()
+        started.wait(5)
+        threads += [threading.Thread(target=submit, args=(name,)) for name in names[1:]]
+        for thread in threads[1:]:
+            thread.start()
+        while self.writer._queue.qsize() < len(names) - 1:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([results[name] for name in ("first", "a", "b", "c")], ["first", "a", "b", "c"])
+        self.assertIsInstance(results["bad"], ValueError)
+        self.assertEqual(set(Unit.objects.values_list("name", flat=True)), {"first", "a", "b", "c"})
+        self.assertEqual((self.writer.batches, self.writer.largest_batch), (2, 4))
+
+    def test_event_posts_go_through_the_writer(self):
+        user = User.objects.create_user(username="09120000000", password="secret")
+        self.business.users.add(user)
+        folder = Folder.objects.create(name="Main", business=self.business)
+        item = Item.objects.create(name="Tea", business=self.business)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {create_access_token(user.id)}"}
+
+        with self.settings(GROUP_COMMIT=True), mock.patch("home.writer.get_writer", return_value=self.writer):
+            response = self.client.post(
+                reverse("api_events"),
+                {"type": "BUY", "folder_id": str(folder.id),
+                 "items": [{"item_id": str(item.id), "name": "Tea", "quantity": 4}]},
+                content_type="application/json",
+                **auth,
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.writer.jobs, 1)
+        self.assertEqual(FolderItem.objects.get(folder=folder, item=item).quantity, 4)
+
+    def test_stalled_writer_answers_busy(self):
+        user = User.objects.create_user(username="09120000000", password="secret")
+        self.business.users.add(user)
+        folder = Folder.objects.create(name="Main", business=self.business)
+        item = Item.objects.create(name="Tea", business=self.business)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {create_access_token(user.id)}"}
+        started, release = threading.Event(), threading.Event()
+
+        def stall():
+            started.set()
+            release.wait(5)
+
+        stalled = threading.Thread(target=self.writer.submit, args=(stall,))
+        stalled.start()
+        self.assertTrue(started.wait(5))
+        try:
+            with self.settings(GROUP_COMMIT=True, GROUP_COMMIT_TIMEOUT=0.05), \
+                    mock.patch("home.writer.get_writer", return_value=self.writer):
+                response = self.client.post(
+                    reverse("api_events"),
+                    {"type": "BUY", "folder_id": str(folder.id),
+                     "items": [{"item_id": str(item.id), "name": "Tea", "quantity": 4}]},
+                    content_type="application/json",
+                    **auth,
+                )
+        finally:
+            release.set()
+            stalled.join()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(FolderItem.objects.exists())
+
+
+class ConcurrentInventoryTests(TransactionTestCase):
+    writers = 8
+    sales_per_writer = 10
+
+    def test_concurrent_sells_do_not_lose_decrements(self):
+        business = Business.objects.create(name="Test Business")
+        folder = Folder.objects.create(name="Main", business=business)
+        item = Item.objects.create(name="Tea", business=business)
+        FolderItem.objects.create(folder=folder, item=item, quantity=1000, unit="unit")
+        event = Event(type=EventType.SELL, business=business, folder=folder)
+        line = EventItem(item=item, name="Tea", quantity=1)
+        barrier = threading.Barrier(self.writers)
+        failures = []
+
+        def sell():
+            try:
+                barrier.wait()
+                for _ in range(self.sales_per_writer):
+                    for attempt in range(200):
+                        try:
+                            apply_event_inventory(event, [line])
+                            break
+                        except OperationalError:
+                            time.sleep(0.01)
+                    else:
+                        failures.append("gave up")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(
+            FolderItem.objects.get(folder=folder, item=item).quantity,
+            1000 - self.writers * self.sales_per_writer,
+        )
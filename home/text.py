@@ -0,0 +1,40 @@
+import re
+import unicodedata
+
+# Arabic code points commonly typed in place of their Persian forms, plus
+# marks that should not affect matching (diacritics, tatweel, ZWNJ).
+_FOLD = {
+    "ي": "ی",  # ARABIC YEH -> FARSI YEH
+    "ى": "ی",  # ALEF MAKSURA -> FARSI YEH
+    "ك": "ک",  # ARABIC KAF -> KEHEH
+    "ة": "ه",  # TEH MARBUTA -> HEH
+    "ۀ": "ه",  # HEH WITH YEH ABOVE -> HEH
+    "أ": "ا",  # ALEF WITH HAMZA ABOVE -> ALEF
+    "إ": "ا",  # ALEF WITH HAMZA BELOW -> ALEF
+    "آ": "ا",  # ALEF WITH MADDA -> ALEF
+    "ٱ": "ا",  # ALEF WASLA -> ALEF
+    "\u0640": "",  # TATWEEL
+    "\u200c": "",  # ZERO WIDTH NON-JOINER
+    "\u200d": "",  # ZERO WIDTH JOINER
+}
+_FOLD.update({chr(code): "" for code in range(0x064B, 0x0653)})  # harakat
+_FOLD["\u0670"] = ""  # SUPERSCRIPT ALEF
+
+# Every non-ASCII decimal digit (Persian, Arabic-Indic, ...) -> ASCII, the way
+# ``auth.views.normalize_phone`` reads digits.
+_DIGITS = {
+    code: str(unicodedata.digit(chr(code)))
+    for code in range(0x80, 0x10000)
+    if unicodedata.category(chr(code)) == "Nd"
+}
+
+_TABLE = str.maketrans({**_FOLD, **{chr(code): digit for code, digit in _DIGITS.items()}})
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(value):
+    """Fold text for matching: NFKC, Persian letter forms, ASCII digits, casefold."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKC", str(value)).translate(_TABLE).casefold()
+    return _SPACE_RE.sub(" ", value).strip()
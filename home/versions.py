@@ -0,0 +1,67 @@
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Business
+from .pubsub import broker
+
+
+def _bumped_in_transaction(business_id, field, callback):
+    """True if ``field`` was already bumped for ``business_id`` in this transaction or savepoint.
+
+    Otherwise ``callback`` is registered on commit as the marker. It is
+    dropped with a rolled back savepoint, so a retried write bumps again.
+    """
+    savepoints = set(connection.savepoint_ids)
+    for sids, registered, _ in connection.run_on_commit:
+        if sids == savepoints and getattr(registered, "bumped", None) == (field, business_id):
+            return True
+    callback.bumped = (field, business_id)
+    transaction.on_commit(callback)
+    return False
+
+
+def bump_version(business_id):
+    """Advance the data version of a business after a write to its rows.
+
+    Within one transaction or savepoint the counter moves once, however many
+    rows are written. Stream subscribers are woken once the write commits.
+    """
+    if connection.in_atomic_block:
+        if _bumped_in_transaction(business_id, "data_version", lambda: broker.publish(business_id)):
+            return
+    Business.objects.filter(pk=business_id).update(data_version=F("data_version") + 1)
+    if not connection.in_atomic_block:
+        broker.publish(business_id)
+
+
+def bump_catalog_version(business_id):
+    """Advance the catalog version of a business after an item, unit or folder write.
+
+    It keys the cached catalog lists (``catalog_cache``), so stock and event
+    writes, which only move ``data_version``, leave them cached.
+    """
+    if connection.in_atomic_block and _bumped_in_transaction(business_id, "catalog_version", lambda: None):
+        return
+    Business.objects.filter(pk=business_id).update(catalog_version=F("catalog_version") + 1)
+
+
+def get_version(business_id):
+    return Business.objects.filter(pk=business_id).values_list("data_version", flat=True).first()
+
+
+async def aget_version(business_id):
+    return await Business.objects.filter(pk=business_id).values_list("data_version", flat=True).afirst()
+
+
+def get_versions(business_id):
+    """``(data_version, catalog_version)`` of a business in one query."""
+    return Business.objects.filter(pk=business_id).values_list("data_version", "catalog_version").first() or (None, None)
+
+
+async def aget_versions(business_id):
+    return await Business.objects.filter(pk=business_id).values_list("data_version", "catalog_version").afirst() or (None, None)
+
+
+def version_etag(business_id, version, *parts):
+    """Weak ETag for a business-scoped response; ``parts`` add other inputs, e.g. the clock."""
+    return 'W/"' + "-".join([business_id.hex, str(version), *map(str, parts)]) + '"'
@@ -1,7 +1,12 @@
+import base64
+import hmac
 import json
 import random
 import uuid
-from datetime import timedelta
+from concurrent.futures import CancelledError, TimeoutError as WriteTimeout
+from copy import copy
+from datetime import datetime, timedelta
+from functools import wraps
 
 from django.conf import settings
 from django.contrib.auth import authenticate
@@ -9,14 +14,24 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.core.files.storage import FileSystemStorage
 from django.db import transaction
-from django.db.models import F, FloatField, Sum
-from django.http import JsonResponse
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-
-from .api_utils import create_access_token, decode_access_token
+from django.views.decorators.http import condition, require_http_methods
+
+from .api_utils import create_access_token, decode_access_token, get_access_token_expiry
+from .catalog_cache import cached_list
+from .exports import EXPORT_FIELDS, csv_stream, export_columns, export_event_rows, export_rows, ndjson_stream
+from .folders import FolderTreeError, check_parent, delete_subtree, merge_folders, subtree_filter, subtree_rollup
+from .inventory import DeltaRuns, apply_event_inventory
+from .item_index import get_item_index, normalize_barcode, normalize_sku
+from .ledger import inventory_as_of
+from .metrics import phase, registry
 from .models import (
     Business,
     Customer,
@@ -29,6 +44,20 @@ from .models import (
     Otp,
     Unit,
 )
+from .principals import cache_principal, get_cached_principal
+from .search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, SEARCH_TABLES, index_objects, search
+from .stats import LOW_STOCK_THRESHOLD, get_business_stats
+from .stream import ChangeStream
+from .sync import SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, changes_since, fetch_rows, record_changes
+from .versions import bump_version, get_versions, version_etag
+from .writer import run_write
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+BULK_EVENTS_LIMIT = 1000
+BULK_BATCH_SIZE = 500
+LOOKUP_BATCH_LIMIT = 1000
+WRITE_RETRY_AFTER = 1
 
 
 def home_index(request):
@@ -36,7 +65,10 @@ def home_index(request):
 
 
 def _get_primary_business(user):
-    return user.businesses.first()
+    business = getattr(user, "_primary_business", None)
+    if business is None:
+        business = user.businesses.first()
+    return business
 
 
 def _ensure_business(user):
@@ -67,23 +99,14 @@ def dashboard(request):
     low_stock_items = []
 
     if business:
-        stats["total_items"] = Item.objects.filter(business=business).count()
-        stats["total_folders"] = Folder.objects.filter(business=business).count()
-
-        total_value = FolderItem.objects.filter(
-            folder__business=business,
-            item__value__isnull=False,
-        ).aggregate(
-            total=Sum(F("quantity") * F("item__value"), output_field=FloatField())
-        )["total"] or 0
-        stats["total_value"] = int(total_value)
+        stats = get_business_stats(business)
+        stats["total_value"] = int(stats["total_value"])
 
         low_stock_items = FolderItem.objects.filter(
             folder__business=business,
             quantity__gt=0,
-            quantity__lt=5,
+            quantity__lt=LOW_STOCK_THRESHOLD,
         ).select_related("item", "folder")
-        stats["low_stock_count"] = low_stock_items.count()
 
         recent_events = (
             Event.objects.filter(business=business)
@@ -96,12 +119,14 @@ def dashboard(request):
         "recent_events": recent_events,
         "low_stock_items": low_stock_items[:5],
         "display_name": _get_display_name(request.user),
+        "stream_enabled": settings.STREAM_ENABLED,
     }
     return render(request, "home/dashboard.html", context)
 
 
 def _json_response(data, status=200):
-    return JsonResponse(data, status=status, safe=isinstance(data, dict))
+    with phase("encode"):
+        return JsonResponse(data, status=status, safe=isinstance(data, dict))
 
 
 def _parse_json(request):
@@ -117,6 +142,13 @@ def _error(message, status=400):
     return _json_response({"detail": message}, status=status)
 
 
+def _write_queue_busy():
+    # The group-commit writer gave up on the job before it ran; nothing was written.
+    response = _error("Write queue busy, retry.", status=503)
+    response["Retry-After"] = str(WRITE_RETRY_AFTER)
+    return response
+
+
 def _get_bearer_token(request):
     auth_header = request.headers.get("Authorization") or request.META.get("HTTP_AUTHORIZATION", "")
     if auth_header.startswith("Bearer "):
@@ -125,19 +157,90 @@ def _get_bearer_token(request):
 
 
 def _get_current_user(request):
+    with phase("auth"):
+        return _authenticate_bearer(request)
+
+
+def _authenticate_bearer(request):
     token = _get_bearer_token(request)
     if not token:
         return None, _error("Authentication required.", status=401)
 
+    principal = get_cached_principal(token)
+    if principal:
+        return principal[0], None
+
     payload = decode_access_token(token)
     if not payload or "user_id" not in payload:
         return None, _error("Invalid token.", status=401)
 
     try:
-        return User.objects.get(id=payload["user_id"]), None
+        user = User.objects.get(id=payload["user_id"])
     except User.DoesNotExist:
         return None, _error("User not found.", status=401)
 
+    user._primary_business = _ensure_business(user)
+    cache_principal(token, user, user._primary_business)
+    return user, None
+
+
+def _versioned(etag_func):
+    """``condition(etag_func=...)`` plus headers that make clients revalidate.
+
+    Responses are per token and must be checked on every use, so they are
+    marked private and ``no-cache``; browsers then send ``If-None-Match`` on
+    their own.
+    """
+
+    def decorator(view):
+        conditional = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            return _mark_revalidate(conditional(request, *args, **kwargs))
+
+        return inner
+
+    return decorator
+
+
+def _mark_revalidate(response):
+    if response.has_header("ETag"):
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def _business_etag(request, *args, **kwargs):
+    """ETag of a business-scoped GET, read from the business's data version.
+
+    Runs before the view so an unchanged resource is answered with a 304
+    without being queried or serialized. Requests that fail authentication
+    get no ETag and reach the view, which reports the error.
+    """
+    return _version_etag(request)
+
+
+def _stockout_etag(request, *args, **kwargs):
+    return _version_etag(request, _stockout_clock())
+
+
+def _stockout_clock():
+    # The sales window slides with the clock, so a prediction is reused for an hour at most.
+    return timezone.now().strftime("%Y%m%d%H")
+
+
+def _version_etag(request, *parts):
+    if request.method not in ("GET", "HEAD"):
+        return None
+    user, error = _get_current_user(request)
+    if error:
+        return None
+    business = _ensure_business(user)
+    # The catalog version comes along for the catalog cache key.
+    version, request.catalog_version = get_versions(business.id)
+    return version_etag(business.id, version, *parts)
+
 
 @login_required
 @require_http_methods(["GET"])
@@ -200,64 +303,185 @@ def _serialize_event(event):
     }
 
 
-def _update_inventory_single_item(folder_id, item_id, quantity, operation, item_unit):
-    if not folder_id or not item_id:
-        return
+def _serialize_inventory_entry(entry):
+    return {
+        "id": str(entry.id),
+        "folder_id": str(entry.folder_id),
+        "folder_name": entry.folder.name,
+        "item_id": str(entry.item_id),
+        "item_name": entry.item.name,
+        "quantity": entry.quantity,
+        "unit": entry.unit,
+    }
+
+
+def _serialize_sync_inventory_entry(entry):
+    # Names are left out: renaming an item or folder journals only that row,
+    # so clients join on folder_id/item_id against their synced folders and items.
+    return {
+        "id": str(entry.id),
+        "folder_id": str(entry.folder_id),
+        "item_id": str(entry.item_id),
+        "quantity": entry.quantity,
+        "unit": entry.unit,
+    }
+
+
+def _parse_uuid(value):
+    if not value:
+        return None
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError("Invalid identifier.")
+
 
-    folder_item = FolderItem.objects.filter(folder_id=folder_id, item_id=item_id).first()
-
-    if folder_item:
-        if operation == "add":
-            folder_item.quantity += quantity
-        elif operation == "subtract":
-            folder_item.quantity = max(0, folder_item.quantity - quantity)
-        folder_item.save(update_fields=["quantity", "updated_at"])
-    elif operation == "add":
-        FolderItem.objects.create(
-            folder_id=folder_id,
-            item_id=item_id,
-            quantity=quantity,
-            unit=item_unit or "unit",
+def _encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, object_id = raw.split("|", 1)
+        created_at = parse_datetime(created_at)
+        object_id = uuid.UUID(object_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+    if created_at is None:
+        raise ValueError("Invalid cursor.")
+    return created_at, object_id
+
+
+def _paginate(request, queryset):
+    """Return ``(queryset, limit, error)`` for a list endpoint.
+
+    Without ``limit`` or ``cursor`` the queryset is returned unchanged with
+    ``limit=None``; otherwise it is ordered by ``(created_at, id)``, moved
+    past the cursor and cut at ``limit + 1`` rows to detect a next page.
+    """
+    if "limit" not in request.GET and "cursor" not in request.GET:
+        return queryset, None, None
+
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return None, None, _error("limit must be an integer.")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = queryset.order_by("created_at", "id")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            created_at, object_id = _decode_cursor(cursor)
+        except ValueError as exc:
+            return None, None, _error(str(exc))
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=object_id)
         )
+    return queryset[:limit + 1], limit, None
 
 
-def _reverse_event_inventory(event):
-    items = event.event_items.all()
-    for event_item in items:
-        if not event_item.item_id:
-            continue
+def _page_response(rows, limit, serialize):
+    if limit is None:
+        with phase("serialize"):
+            data = [serialize(obj) for obj in rows]
+        return _json_response(data)
 
-        if event.type == EventType.BUY and event.folder_id:
-            _update_inventory_single_item(
-                event.folder_id,
-                event_item.item_id,
-                event_item.quantity,
-                "subtract",
-                event_item.unit,
-            )
-        elif event.type == EventType.SELL and event.folder_id:
-            _update_inventory_single_item(
-                event.folder_id,
-                event_item.item_id,
-                event_item.quantity,
-                "add",
-                event_item.unit,
-            )
-        elif event.type == EventType.MOVE and event.origin_folder_id and event.destination_folder_id:
-            _update_inventory_single_item(
-                event.origin_folder_id,
-                event_item.item_id,
-                event_item.quantity,
-                "add",
-                event_item.unit,
-            )
-            _update_inventory_single_item(
-                event.destination_folder_id,
-                event_item.item_id,
-                event_item.quantity,
-                "subtract",
-                event_item.unit,
-            )
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    with phase("serialize"):
+        results = [serialize(obj) for obj in rows[:limit]]
+    return _json_response({"results": results, "next_cursor": next_cursor})
+
+
+def _list_response(request, queryset, serialize):
+    """Serialize a list endpoint, paginating by ``(created_at, id)`` when asked.
+
+    Without ``limit`` or ``cursor`` the full list is returned as before.
+    """
+    queryset, limit, error = _paginate(request, queryset)
+    if error:
+        return error
+    return _page_response(list(queryset), limit, serialize)
+
+
+def _parse_datetime_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        try:
+            parsed_date = parse_date(value)
+        except ValueError:
+            parsed_date = None
+        if parsed_date is None:
+            raise ValueError(f"{name} must be an ISO date or datetime.")
+        parsed = datetime.combine(parsed_date, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_float_param(request, name):
+    value = request.GET.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number.")
+
+
+def _filter_events(request, queryset):
+    event_type = request.GET.get("type")
+    if event_type:
+        if event_type not in EventType.values:
+            raise ValueError("Invalid event type.")
+        queryset = queryset.filter(type=event_type)
+
+    created_after = _parse_datetime_param(request, "created_after")
+    if created_after:
+        queryset = queryset.filter(created_at__gte=created_after)
+
+    created_before = _parse_datetime_param(request, "created_before")
+    if created_before:
+        queryset = queryset.filter(created_at__lt=created_before)
+
+    folder_id = _parse_uuid(request.GET.get("folder_id"))
+    if folder_id:
+        queryset = queryset.filter(
+            Q(folder_id=folder_id) | Q(origin_folder_id=folder_id) | Q(destination_folder_id=folder_id)
+        )
+
+    customer_id = _parse_uuid(request.GET.get("customer_id"))
+    if customer_id:
+        queryset = queryset.filter(customer_id=customer_id)
+
+    return queryset
+
+
+def _filter_inventory(request, queryset, business):
+    folder_id = _parse_uuid(request.GET.get("folder_id"))
+    if folder_id and request.GET.get("subtree") in ("1", "true"):
+        path = Folder.objects.filter(id=folder_id, business=business).values_list("path", flat=True).first()
+        if not path:
+            raise ValueError("Folder not found.")
+        queryset = queryset.filter(subtree_filter(path, prefix="folder__"))
+    elif folder_id:
+        queryset = queryset.filter(folder_id=folder_id)
+
+    min_quantity = _parse_float_param(request, "min_quantity")
+    if min_quantity is not None:
+        queryset = queryset.filter(quantity__gte=min_quantity)
+
+    max_quantity = _parse_float_param(request, "max_quantity")
+    if max_quantity is not None:
+        queryset = queryset.filter(quantity__lte=max_quantity)
+
+    return queryset
 
 
 @csrf_exempt
@@ -406,39 +630,25 @@ def api_verify_otp(request):
 
 
 @require_http_methods(["GET"])
+@_versioned(_business_etag)
 def api_dashboard_stats(request):
     user, error = _get_current_user(request)
     if error:
         return error
 
     business = _ensure_business(user)
+    return _stats_response(request, business)
 
-    total_items = Item.objects.filter(business=business).count()
-    total_folders = Folder.objects.filter(business=business).count()
-    total_value = FolderItem.objects.filter(
-        folder__business=business,
-        item__value__isnull=False,
-    ).aggregate(
-        total=Sum(F("quantity") * F("item__value"), output_field=FloatField())
-    )["total"] or 0
-    low_stock_count = FolderItem.objects.filter(
-        folder__business=business,
-        quantity__gt=0,
-        quantity__lt=5,
-    ).count()
 
-    return _json_response(
-        {
-            "total_items": total_items,
-            "total_folders": total_folders,
-            "total_value": int(total_value),
-            "low_stock_count": low_stock_count,
-        }
-    )
+def _stats_response(request, business):
+    stats = get_business_stats(business)
+    stats["total_value"] = int(stats["total_value"])
+    return _json_response(stats)
 
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
+@_versioned(_business_etag)
 def api_folders(request):
     user, error = _get_current_user(request)
     if error:
@@ -454,20 +664,29 @@ def api_folders(request):
         if not name:
             return _error("Folder name is required.")
 
+        parent_id = data.get("parent_id") or None
+        if parent_id and not Folder.objects.filter(id=parent_id, business=business).exists():
+            return _error("Parent folder not found.", status=404)
+
         folder = Folder.objects.create(
             name=name,
             description=data.get("description"),
-            parent_id=data.get("parent_id") or None,
+            parent_id=parent_id,
             business=business,
         )
         return _json_response(_serialize_folder(folder))
 
-    folders = Folder.objects.filter(business=business)
-    return _json_response([_serialize_folder(folder) for folder in folders])
+    return _folder_list(request, business)
+
+
+def _folder_list(request, business):
+    queryset = Folder.objects.filter(business=business)
+    return cached_list("folders", business.id, request, lambda: _list_response(request, queryset, _serialize_folder))
 
 
 @csrf_exempt
 @require_http_methods(["GET", "PATCH", "DELETE"])
+@_versioned(_business_etag)
 def api_folder_detail(request, folder_id):
     user, error = _get_current_user(request)
     if error:
@@ -501,17 +720,87 @@ def api_folder_detail(request, folder_id):
                 parent_folder = Folder.objects.filter(id=parent_id, business=business).first()
                 if not parent_folder:
                     return _error("Parent folder not found.", status=404)
+                try:
+                    check_parent(folder, parent_folder)
+                except FolderTreeError as exc:
+                    return _error(str(exc))
             folder.parent_id = parent_id
 
-        folder.save(update_fields=["name", "description", "parent_id", "updated_at"])
+        with transaction.atomic():
+            folder.save(update_fields=["name", "description", "parent_id", "path", "updated_at"])
         return _json_response(_serialize_folder(folder))
 
-    folder.delete()
+    if request.GET.get("subtree") in ("1", "true"):
+        delete_subtree(folder)
+    else:
+        folder.delete()
     return _json_response({}, status=204)
 
 
+@require_http_methods(["GET"])
+@_versioned(_business_etag)
+def api_folder_rollup(request, folder_id):
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+    folder = Folder.objects.filter(id=folder_id, business=business).first()
+    if not folder:
+        return _error("Folder not found.", status=404)
+
+    rows = subtree_rollup(folder)
+    return _json_response(
+        {
+            "folder_id": str(folder.id),
+            "total_quantity": sum(row["total_quantity"] or 0 for row in rows),
+            "total_value": sum(row["total_value"] or 0 for row in rows),
+            "items": [
+                {
+                    "item_id": str(row["item_id"]),
+                    "item_name": row["item__name"],
+                    "quantity": row["total_quantity"],
+                    "value": row["total_value"],
+                }
+                for row in rows
+            ],
+        }
+    )
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_folder_merge(request, folder_id):
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+    folder = Folder.objects.filter(id=folder_id, business=business).first()
+    if not folder:
+        return _error("Folder not found.", status=404)
+
+    data = _parse_json(request)
+    if data is None:
+        return _error("Invalid JSON payload.")
+    try:
+        target_id = _parse_uuid(data.get("target_id"))
+    except ValueError as exc:
+        return _error(str(exc))
+    target = Folder.objects.filter(id=target_id, business=business).first() if target_id else None
+    if not target:
+        return _error("Target folder not found.", status=404)
+
+    try:
+        target = merge_folders(folder, target)
+    except FolderTreeError as exc:
+        return _error(str(exc))
+    return _json_response(_serialize_folder(target))
+
+
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
+@_versioned(_business_etag)
 def api_items(request):
     user, error = _get_current_user(request)
     if error:
@@ -545,12 +834,95 @@ def api_items(request):
         )
         return _json_response(_serialize_item(item))
 
-    items = Item.objects.filter(business=business)
-    return _json_response([_serialize_item(item) for item in items])
+    return _item_list(request, business)
+
+
+def _item_list(request, business):
+    queryset = Item.objects.filter(business=business)
+    return cached_list("items", business.id, request, lambda: _list_response(request, queryset, _serialize_item))
+
+
+def _lookup_codes(values):
+    codes = []
+    for value in values:
+        if isinstance(value, str):
+            codes.extend(code for code in value.split(",") if code.strip())
+        elif value is not None:
+            codes.append(str(value))
+    return codes
+
+
+def _payload_codes(data, key):
+    """Codes under ``key`` of a lookup body: a list of strings, or one comma-separated string."""
+    value = data.get(key)
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(code, str) for code in value):
+        raise ValueError(f"{key} must be a list of strings.")
+    return _lookup_codes(value)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def api_items_lookup(request):
+    """Resolve scanned barcodes/SKUs from the per-business in-memory index.
+
+    A single code returns the item (or 404); several codes, or a POST body
+    of ``{"barcodes": [...], "skus": [...]}``, return ``{"barcode": {code:
+    item|null}, "sku": {code: item|null}}``.
+    """
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+
+    if request.method == "POST":
+        data = _parse_json(request)
+        if data is None or not isinstance(data, dict):
+            return _error("Invalid JSON payload.")
+        try:
+            barcodes = _payload_codes(data, "barcodes")
+            skus = _payload_codes(data, "skus")
+        except ValueError as exc:
+            return _error(str(exc))
+    else:
+        barcodes = _lookup_codes(request.GET.getlist("barcode"))
+        skus = _lookup_codes(request.GET.getlist("sku"))
+
+    if not barcodes and not skus:
+        return _error("barcode or sku is required.")
+    if len(barcodes) + len(skus) > LOOKUP_BATCH_LIMIT:
+        return _error(f"At most {LOOKUP_BATCH_LIMIT} codes can be looked up at once.")
+
+    index = get_item_index(business.id)
+
+    def find(code, items, normalize):
+        item = items.get(normalize(code))
+        return _serialize_item(item) if item is not None else None
+
+    if request.method == "GET" and len(barcodes) + len(skus) == 1:
+        if barcodes:
+            item = find(barcodes[0], index.by_barcode, normalize_barcode)
+        else:
+            item = find(skus[0], index.by_sku, normalize_sku)
+        if item is None:
+            return _error("Item not found.", status=404)
+        return _json_response(item)
+
+    return _json_response(
+        {
+            "barcode": {code: find(code, index.by_barcode, normalize_barcode) for code in barcodes},
+            "sku": {code: find(code, index.by_sku, normalize_sku) for code in skus},
+        }
+    )
 
 
 @csrf_exempt
 @require_http_methods(["GET", "PATCH", "DELETE"])
+@_versioned(_business_etag)
 def api_item_detail(request, item_id):
     user, error = _get_current_user(request)
     if error:
@@ -602,6 +974,7 @@ def api_item_detail(request, item_id):
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
+@_versioned(_business_etag)
 def api_units(request):
     user, error = _get_current_user(request)
     if error:
@@ -627,12 +1000,17 @@ def api_units(request):
         )
         return _json_response(_serialize_unit(unit))
 
-    units = Unit.objects.filter(business=business)
-    return _json_response([_serialize_unit(unit) for unit in units])
+    return _unit_list(request, business)
+
+
+def _unit_list(request, business):
+    queryset = Unit.objects.filter(business=business)
+    return cached_list("units", business.id, request, lambda: _list_response(request, queryset, _serialize_unit))
 
 
 @csrf_exempt
 @require_http_methods(["GET", "PATCH", "DELETE"])
+@_versioned(_business_etag)
 def api_unit_detail(request, unit_id):
     user, error = _get_current_user(request)
     if error:
@@ -675,6 +1053,7 @@ def api_unit_detail(request, unit_id):
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
+@_versioned(_business_etag)
 def api_customers(request):
     user, error = _get_current_user(request)
     if error:
@@ -705,12 +1084,16 @@ def api_customers(request):
         )
         return _json_response(_serialize_customer(customer))
 
-    customers = Customer.objects.filter(business=business)
-    return _json_response([_serialize_customer(customer) for customer in customers])
+    return _customer_list(request, business)
+
+
+def _customer_list(request, business):
+    return _list_response(request, Customer.objects.filter(business=business), _serialize_customer)
 
 
 @csrf_exempt
 @require_http_methods(["GET", "PATCH", "DELETE"])
+@_versioned(_business_etag)
 def api_customer_detail(request, customer_id):
     user, error = _get_current_user(request)
     if error:
@@ -762,8 +1145,41 @@ def api_customer_detail(request, customer_id):
     return _json_response({}, status=204)
 
 
+def _split_customer_name(customer_name):
+    if not customer_name:
+        return "", ""
+    parts = customer_name.split(" ", 1)
+    return parts[0], parts[1] if len(parts) > 1 else ""
+
+
+def _parse_event_line(item_data):
+    if not isinstance(item_data, dict):
+        raise ValueError("Each event item requires a name and quantity.")
+
+    name = (item_data.get("name") or "").strip()
+    quantity = item_data.get("quantity")
+    if not name or quantity is None:
+        raise ValueError("Each event item requires a name and quantity.")
+
+    try:
+        quantity = float(quantity)
+    except (TypeError, ValueError):
+        raise ValueError("Event item quantity must be a number.")
+
+    return {
+        "item_id": item_data.get("item_id") or None,
+        "name": name,
+        "quantity": quantity,
+        "unit": item_data.get("unit"),
+        "value": item_data.get("value"),
+        "sku": item_data.get("sku"),
+        "barcode": item_data.get("barcode"),
+    }
+
+
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
+@_versioned(_business_etag)
 def api_events(request):
     user, error = _get_current_user(request)
     if error:
@@ -779,123 +1195,277 @@ def api_events(request):
         event_type = data.get("type")
         if event_type not in EventType.values:
             return _error("Invalid event type.")
+        if event_type == EventType.MOVE and not (data.get("origin_folder_id") and data.get("destination_folder_id")):
+            return _error("Move events require origin and destination folders.")
 
         items = data.get("items") or []
         if not isinstance(items, list) or not items:
             return _error("Event items are required.")
 
-        customer_id = None
-        customer_name = (data.get("customer_name") or "").strip()
-        customer_phone = (data.get("customer_phone") or "").strip()
-        customer_address = (data.get("customer_address") or "").strip()
-
-        if event_type == EventType.SELL and (customer_name or customer_phone):
-            first_name = ""
-            last_name = ""
-            if customer_name:
-                parts = customer_name.split(" ", 1)
-                first_name = parts[0]
-                last_name = parts[1] if len(parts) > 1 else ""
-
-            customer = None
-            if customer_phone:
-                customer = Customer.objects.filter(
-                    business=business,
-                    phone=customer_phone,
-                ).first()
+        try:
+            # Parsed and resolved before the write so the write lock is held only for the writes.
+            lines = [_parse_event_line(item_data) for item_data in items]
+            _resolve_item_names(business, [line for line in lines if not line["item_id"]])
+        except ValueError as exc:
+            return _error(str(exc))
+
+        def write():
+            event = Event.objects.create(
+                type=event_type,
+                description=data.get("description"),
+                business=business,
+                customer_id=_upsert_event_customer(business, event_type, data),
+                folder_id=data.get("folder_id") or None,
+                origin_folder_id=data.get("origin_folder_id") or None,
+                destination_folder_id=data.get("destination_folder_id") or None,
+            )
+            event_items = [EventItem.objects.create(event=event, **line) for line in lines]
+            apply_event_inventory(event, event_items)
+            return event
+
+        try:
+            event = run_write(write)
+        except ValueError as exc:
+            return _error(str(exc))
+        except (WriteTimeout, CancelledError):
+            return _write_queue_busy()
+
+        return _json_response(_serialize_event(event))
+
+    return _event_list(request, business)
+
+
+def _event_list(request, business):
+    try:
+        events = _filter_events(request, Event.objects.filter(business=business))
+    except ValueError as exc:
+        return _error(str(exc))
+    return _list_response(request, events, _serialize_event)
+
+
+def _upsert_event_customer(business, event_type, data):
+    """Id of the customer named on a SELL, creating or updating it by phone."""
+    customer_name = (data.get("customer_name") or "").strip()
+    customer_phone = (data.get("customer_phone") or "").strip()
+    customer_address = (data.get("customer_address") or "").strip()
+    if event_type != EventType.SELL or not (customer_name or customer_phone):
+        return None
+
+    first_name, last_name = _split_customer_name(customer_name)
+    customer = None
+    if customer_phone:
+        customer = Customer.objects.filter(
+            business=business,
+            phone=customer_phone,
+        ).first()
+
+    if customer:
+        customer.first_name = first_name or customer.first_name
+        customer.last_name = last_name or customer.last_name
+        if customer_address:
+            customer.address = customer_address
+        customer.save()
+    else:
+        customer = Customer.objects.create(
+            business=business,
+            first_name=first_name or "Customer",
+            last_name=last_name or None,
+            phone=customer_phone or None,
+            address=customer_address or None,
+        )
+    return customer.id
+
+
+def _resolve_item_names(business, lines):
+    """Link lines without an ``item_id`` to the only item with a matching name.
+
+    Names are matched through the cached per-business index with Persian and
+    digit folding; the ids it yields are confirmed in one query so an index
+    made stale by another process cannot link a deleted item.
+    """
+    if not lines:
+        return
+    index = get_item_index(business.id)
+    resolved = [index.resolve_name(line["name"]) for line in lines]
+    candidates = {item_id for item_id in resolved if item_id}
+    if candidates:
+        candidates = set(Item.objects.filter(business=business, id__in=candidates).values_list("id", flat=True))
+    for line, item_id in zip(lines, resolved):
+        if item_id in candidates:
+            line["item_id"] = item_id
+
+
+def _prepare_bulk_event(data):
+    if not isinstance(data, dict):
+        raise ValueError("Invalid event payload.")
+
+    event_type = data.get("type")
+    if event_type not in EventType.values:
+        raise ValueError("Invalid event type.")
+    if event_type == EventType.MOVE and not (data.get("origin_folder_id") and data.get("destination_folder_id")):
+        raise ValueError("Move events require origin and destination folders.")
+
+    items = data.get("items") or []
+    if not isinstance(items, list) or not items:
+        raise ValueError("Event items are required.")
+
+    lines = [_parse_event_line(item_data) for item_data in items]
+    for line in lines:
+        line["item_id"] = _parse_uuid(line["item_id"])
+
+    return {
+        "type": event_type,
+        "description": data.get("description"),
+        "folder_id": _parse_uuid(data.get("folder_id")),
+        "origin_folder_id": _parse_uuid(data.get("origin_folder_id")),
+        "destination_folder_id": _parse_uuid(data.get("destination_folder_id")),
+        "customer_name": (data.get("customer_name") or "").strip(),
+        "customer_phone": (data.get("customer_phone") or "").strip(),
+        "customer_address": (data.get("customer_address") or "").strip(),
+        "lines": lines,
+    }
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_events_bulk(request):
+    user, error = _get_current_user(request)
+    if error:
+        return error
 
+    business = _ensure_business(user)
+
+    data = _parse_json(request)
+    if data is None:
+        return _error("Invalid JSON payload.")
+
+    payloads = data.get("events") if isinstance(data, dict) else data
+    if not isinstance(payloads, list) or not payloads:
+        return _error("Events are required.")
+    if len(payloads) > BULK_EVENTS_LIMIT:
+        return _error(f"At most {BULK_EVENTS_LIMIT} events can be submitted at once.")
+
+    results = [None] * len(payloads)
+    prepared = []
+    item_ids = set()
+    unresolved_lines = []
+    folder_ids = set()
+    phones = set()
+
+    for index, payload in enumerate(payloads):
+        try:
+            event_data = _prepare_bulk_event(payload)
+        except ValueError as exc:
+            results[index] = {"index": index, "ok": False, "detail": str(exc)}
+            continue
+
+        prepared.append((index, event_data))
+        for line in event_data["lines"]:
+            if line["item_id"]:
+                item_ids.add(line["item_id"])
+            else:
+                unresolved_lines.append(line)
+        for key in ("folder_id", "origin_folder_id", "destination_folder_id"):
+            if event_data[key]:
+                folder_ids.add(event_data[key])
+        if event_data["type"] == EventType.SELL and event_data["customer_phone"]:
+            phones.add(event_data["customer_phone"])
+
+    known_items = set(Item.objects.filter(business=business, id__in=item_ids).values_list("id", flat=True))
+    known_folders = set(Folder.objects.filter(business=business, id__in=folder_ids).values_list("id", flat=True))
+    _resolve_item_names(business, unresolved_lines)
+    known_items.update(line["item_id"] for line in unresolved_lines if line["item_id"])
+
+    customers_by_phone = {}
+    for customer in Customer.objects.filter(business=business, phone__in=phones):
+        customers_by_phone.setdefault(customer.phone, customer)
+
+    new_customers = []
+    changed_customers = {}
+    events = []
+    event_items = []
+    runs = DeltaRuns()
+    now = timezone.now()
+
+    for index, event_data in prepared:
+        folders = [event_data[key] for key in ("folder_id", "origin_folder_id", "destination_folder_id")]
+        if any(folder_id and folder_id not in known_folders for folder_id in folders):
+            results[index] = {"index": index, "ok": False, "detail": "Folder not found."}
+            continue
+        if any(line["item_id"] and line["item_id"] not in known_items for line in event_data["lines"]):
+            results[index] = {"index": index, "ok": False, "detail": "Item not found."}
+            continue
+
+        customer = None
+        customer_name = event_data["customer_name"]
+        customer_phone = event_data["customer_phone"]
+        customer_address = event_data["customer_address"]
+        if event_data["type"] == EventType.SELL and (customer_name or customer_phone):
+            first_name, last_name = _split_customer_name(customer_name)
+            customer = customers_by_phone.get(customer_phone) if customer_phone else None
             if customer:
                 customer.first_name = first_name or customer.first_name
                 customer.last_name = last_name or customer.last_name
                 if customer_address:
                     customer.address = customer_address
-                customer.save()
+                customer.updated_at = now
+                if not customer._state.adding:
+                    changed_customers[customer.id] = customer
             else:
-                customer = Customer.objects.create(
+                customer = Customer(
                     business=business,
                     first_name=first_name or "Customer",
                     last_name=last_name or None,
                     phone=customer_phone or None,
                     address=customer_address or None,
                 )
-            customer_id = customer.id
+                new_customers.append(customer)
+                if customer_phone:
+                    customers_by_phone[customer_phone] = customer
 
-        try:
-            with transaction.atomic():
-                event = Event.objects.create(
-                    type=event_type,
-                    description=data.get("description"),
-                    business=business,
-                    customer_id=customer_id,
-                    folder_id=data.get("folder_id") or None,
-                    origin_folder_id=data.get("origin_folder_id") or None,
-                    destination_folder_id=data.get("destination_folder_id") or None,
-                )
+        event = Event(
+            type=event_data["type"],
+            description=event_data["description"],
+            business=business,
+            customer=customer,
+            folder_id=event_data["folder_id"],
+            origin_folder_id=event_data["origin_folder_id"],
+            destination_folder_id=event_data["destination_folder_id"],
+        )
+        lines = [EventItem(event=event, **line) for line in event_data["lines"]]
 
-                for item_data in items:
-                    name = (item_data.get("name") or "").strip()
-                    quantity = item_data.get("quantity")
-                    if not name or quantity is None:
-                        raise ValueError("Each event item requires a name and quantity.")
-
-                    item_id = item_data.get("item_id") or None
-                    if not item_id:
-                        matches = list(
-                            Item.objects.filter(business=business, name__iexact=name).values_list("id", flat=True)[:2]
-                        )
-                        if len(matches) == 1:
-                            item_id = matches[0]
-
-                    event_item = EventItem.objects.create(
-                        event=event,
-                        item_id=item_id,
-                        name=name,
-                        quantity=quantity,
-                        unit=item_data.get("unit"),
-                        value=item_data.get("value"),
-                        sku=item_data.get("sku"),
-                        barcode=item_data.get("barcode"),
-                    )
-
-                    if event_item.item_id:
-                        if event_type == EventType.BUY and event.folder_id:
-                            _update_inventory_single_item(
-                                event.folder_id,
-                                event_item.item_id,
-                                event_item.quantity,
-                                "add",
-                                event_item.unit,
-                            )
-                        elif event_type == EventType.SELL and event.folder_id:
-                            _update_inventory_single_item(
-                                event.folder_id,
-                                event_item.item_id,
-                                event_item.quantity,
-                                "subtract",
-                                event_item.unit,
-                            )
-                        elif event_type == EventType.MOVE and event.origin_folder_id and event.destination_folder_id:
-                            _update_inventory_single_item(
-                                event.origin_folder_id,
-                                event_item.item_id,
-                                event_item.quantity,
-                                "subtract",
-                                event_item.unit,
-                            )
-                            _update_inventory_single_item(
-                                event.destination_folder_id,
-                                event_item.item_id,
-                                event_item.quantity,
-                                "add",
-                                event_item.unit,
-                            )
-        except ValueError as exc:
-            return _error(str(exc))
+        events.append(event)
+        event_items.extend(lines)
+        runs.add(event, lines)
+        results[index] = {"index": index, "ok": True, "event": event}
 
-        return _json_response(_serialize_event(event))
+    with transaction.atomic():
+        Customer.objects.bulk_create(new_customers, batch_size=BULK_BATCH_SIZE)
+        Customer.objects.bulk_update(
+            list(changed_customers.values()),
+            ["first_name", "last_name", "address", "updated_at"],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        written_customers = new_customers + list(changed_customers.values())
+        index_objects("customers", written_customers)
+        Event.objects.bulk_create(events, batch_size=BULK_BATCH_SIZE)
+        EventItem.objects.bulk_create(event_items, batch_size=BULK_BATCH_SIZE)
+        runs.apply()
+        record_changes(business.id, "customers", [customer.id for customer in written_customers])
+        record_changes(business.id, "events", [event.id for event in events])
+        bump_version(business.id)
+
+    for result in results:
+        if result["ok"]:
+            result["event"] = _serialize_event(result["event"])
 
-    events = Event.objects.filter(business=business)
-    return _json_response([_serialize_event(event) for event in events])
+    return _json_response(
+        {
+            "created": len(events),
+            "failed": len(payloads) - len(events),
+            "results": results,
+        }
+    )
 
 
 @csrf_exempt
@@ -926,36 +1496,291 @@ def api_event_detail(request, event_id):
         return _json_response(_serialize_event(event))
 
     with transaction.atomic():
-        _reverse_event_inventory(event)
+        apply_event_inventory(event, event.event_items.all(), reverse=True)
         event.delete()
     return _json_response({}, status=204)
 
 
 @require_http_methods(["GET"])
+@_versioned(_business_etag)
 def api_inventory(request):
     user, error = _get_current_user(request)
     if error:
         return error
 
     business = _ensure_business(user)
+    return _inventory_list(request, business)
+
 
-    items = FolderItem.objects.filter(folder__business=business).select_related("item", "folder")
+def _inventory_list(request, business):
+    if "as_of" in request.GET:
+        return _inventory_as_of_response(request, business)
+
+    try:
+        entries = _filter_inventory(
+            request,
+            FolderItem.objects.filter(folder__business=business).select_related("item", "folder"),
+            business,
+        )
+    except ValueError as exc:
+        return _error(str(exc))
+    return _list_response(request, entries, _serialize_inventory_entry)
+
+
+def _inventory_as_of_response(request, business):
+    """Stock per folder and item as recorded by the event ledger at ``as_of``."""
+    try:
+        as_of = _parse_datetime_param(request, "as_of")
+        folder_id = _parse_uuid(request.GET.get("folder_id"))
+        min_quantity = _parse_float_param(request, "min_quantity")
+        max_quantity = _parse_float_param(request, "max_quantity")
+    except ValueError as exc:
+        return _error(str(exc))
+    if as_of is None:
+        return _error("as_of must be an ISO date or datetime.")
+
+    state = inventory_as_of(business, as_of)
+    folder_names = dict(Folder.objects.filter(business=business).values_list("id", "name"))
+    item_names = dict(Item.objects.filter(business=business).values_list("id", "name"))
+
+    entries = []
+    with phase("serialize"):
+        for (entry_folder_id, item_id), quantity in state.quantities.items():
+            if folder_id and entry_folder_id != folder_id:
+                continue
+            if min_quantity is not None and quantity < min_quantity:
+                continue
+            if max_quantity is not None and quantity > max_quantity:
+                continue
+            entries.append(
+                {
+                    "folder_id": str(entry_folder_id),
+                    "folder_name": folder_names.get(entry_folder_id),
+                    "item_id": str(item_id),
+                    "item_name": item_names.get(item_id),
+                    "quantity": quantity,
+                    "unit": state.units.get((entry_folder_id, item_id)),
+                }
+            )
+        entries.sort(key=lambda entry: (entry["folder_name"] or "", entry["item_name"] or ""))
+    return _json_response(entries)
+
+
+@require_http_methods(["GET"])
+@_versioned(_business_etag)
+def api_export(request, dataset, fmt):
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+
+    if dataset not in EXPORT_FIELDS:
+        return _error("Unknown export.", status=404)
+    if fmt not in ("ndjson", "csv"):
+        return _error("Export format must be ndjson or csv.", status=404)
+
+    include_items = dataset == "events" and request.GET.get("include_items") in ("1", "true")
+
+    try:
+        if dataset == "inventory":
+            queryset = _filter_inventory(request, FolderItem.objects.filter(folder__business=business), business)
+        elif dataset == "events":
+            queryset = _filter_events(request, Event.objects.filter(business=business))
+        else:
+            queryset = {
+                "items": Item.objects,
+                "units": Unit.objects,
+                "folders": Folder.objects,
+                "customers": Customer.objects,
+            }[dataset].filter(business=business)
+    except ValueError as exc:
+        return _error(str(exc))
+
+    rows = export_event_rows(queryset) if include_items else export_rows(dataset, queryset)
+    if fmt == "ndjson":
+        response = StreamingHttpResponse(ndjson_stream(rows), content_type="application/x-ndjson")
+    else:
+        columns = export_columns(dataset, include_items)
+        response = StreamingHttpResponse(
+            csv_stream(rows, columns, include_items),
+            content_type="text/csv; charset=utf-8",
+        )
+    response["Content-Disposition"] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
+
+
+@require_http_methods(["GET"])
+@_versioned(_business_etag)
+def api_search(request):
+    """Ranked prefix search over items and customers.
+
+    ``q`` is folded like item names (Persian/Arabic letters, digits, case)
+    and every word must match the start of a word; ``type`` narrows it to
+    ``items`` or ``customers``.
+    """
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+
+    query = (request.GET.get("q") or "").strip()
+    if not query:
+        return _error("q is required.")
+
+    kinds = request.GET.get("type")
+    kinds = [kinds] if kinds else list(SEARCH_TABLES)
+    if any(kind not in SEARCH_TABLES for kind in kinds):
+        return _error("type must be items or customers.")
+
+    try:
+        limit = int(request.GET.get("limit", SEARCH_LIMIT))
+    except ValueError:
+        return _error("limit must be an integer.")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+    serializers = {"items": _serialize_item, "customers": _serialize_customer}
     return _json_response(
-        [
-            {
-                "id": str(entry.id),
-                "folder_id": str(entry.folder_id),
-                "folder_name": entry.folder.name,
-                "item_id": str(entry.item_id),
-                "item_name": entry.item.name,
-                "quantity": entry.quantity,
-                "unit": entry.unit,
-            }
-            for entry in items
-        ]
+        {kind: [serializers[kind](obj) for obj in search(kind, business.id, query, limit)] for kind in kinds}
     )
 
 
+# Sections of /api/bootstrap/, in response order. Each builds the response of
+# the GET of its own endpoint.
+BOOTSTRAP_SECTIONS = {
+    "stats": _stats_response,
+    "folders": _folder_list,
+    "items": _item_list,
+    "units": _unit_list,
+    "customers": _customer_list,
+    "events": _event_list,
+    "inventory": _inventory_list,
+}
+
+
+@require_http_methods(["GET"])
+@_versioned(_business_etag)
+def api_bootstrap(request):
+    """The dashboard's startup reads in one response, keyed by section.
+
+    Auth, the business lookup and the ETag check run once. ``include``
+    (comma-separated) limits the sections built; other parameters apply to
+    every list section as on its own endpoint, so the catalog sections share
+    cache entries with ``/api/items/`` and friends. Section bodies are
+    spliced in as encoded rather than decoded and encoded again.
+    """
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+
+    requested = {name.strip() for name in request.GET.get("include", "").split(",") if name.strip()}
+    unknown = sorted(requested - BOOTSTRAP_SECTIONS.keys())
+    if unknown:
+        return _error(f"Unknown sections: {', '.join(unknown)}.")
+
+    section_request = copy(request)
+    section_request.GET = request.GET.copy()
+    section_request.GET.pop("include", None)
+
+    parts = []
+    for name, build in BOOTSTRAP_SECTIONS.items():
+        if requested and name not in requested:
+            continue
+        response = build(section_request, business)
+        if response.status_code != 200:
+            return response
+        parts.append(b'"' + name.encode() + b'": ' + response.content)
+    with phase("encode"):
+        return HttpResponse(b"{" + b", ".join(parts) + b"}", content_type="application/json")
+
+
+@require_http_methods(["GET"])
+@_versioned(_business_etag)
+def api_sync(request):
+    """Rows created, changed or deleted after the ``since`` cursor.
+
+    ``since=0`` (the default) pages through the whole dataset. Clients keep
+    the returned ``cursor`` and ask again at once while ``has_more`` is set.
+    Deleted rows are listed by id under ``deleted``.
+    """
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+
+    try:
+        since = int(request.GET.get("since") or 0)
+        limit = int(request.GET.get("limit", SYNC_PAGE_SIZE))
+    except ValueError:
+        return _error("since and limit must be integers.")
+    if since < 0:
+        return _error("Invalid cursor.")
+    limit = max(1, min(limit, SYNC_MAX_PAGE_SIZE))
+
+    changed, deleted, cursor, has_more = changes_since(business.id, since, limit)
+    serializers = {
+        "items": _serialize_item,
+        "folders": _serialize_folder,
+        "units": _serialize_unit,
+        "customers": _serialize_customer,
+        "events": _serialize_event,
+        "inventory": _serialize_sync_inventory_entry,
+    }
+    payload = {"cursor": str(cursor), "has_more": has_more}
+    for kind, serialize in serializers.items():
+        rows = fetch_rows(kind, business.id, changed[kind]) if changed[kind] else []
+        with phase("serialize"):
+            payload[kind] = [serialize(row) for row in rows]
+    payload["deleted"] = {kind: [str(object_id) for object_id in ids] for kind, ids in deleted.items()}
+    return _json_response(payload)
+
+
+@require_http_methods(["GET"])
+def api_stream(request):
+    """Server-sent ``change`` events carrying the data version, sync cursor and dashboard stats.
+
+    Under ASGI, ``stream.StreamRouter`` calls this view for auth and serves the
+    events itself; iterating the response here holds a thread per connection.
+    """
+    user, error = _get_current_user(request)
+    if error:
+        return error
+
+    business = _ensure_business(user)
+    stream = ChangeStream(
+        business,
+        last_event_id=request.headers.get("Last-Event-ID"),
+        expires_at=get_access_token_expiry(_get_bearer_token(request)),
+    )
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the events.
+    response["X-Accel-Buffering"] = "no"
+    response.change_stream = stream
+    return response
+
+
+@require_http_methods(["GET"])
+def api_metrics(request):
+    """Prometheus scrape endpoint; needs ``METRICS_TOKEN`` or a staff user's token."""
+    token = _get_bearer_token(request)
+    metrics_token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        return _error("Authentication required.", status=401)
+    if not (metrics_token and hmac.compare_digest(token, metrics_token)):
+        user, error = _get_current_user(request)
+        if error:
+            return error
+        if not user.is_staff:
+            return _error("Not allowed.", status=403)
+
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_upload(request):
@@ -973,13 +1798,12 @@ def api_upload(request):
     return _json_response({"url": storage.url(saved_name)})
 
 
-def _calculate_burn_rate(sales_data):
-    if not sales_data:
+def _calculate_burn_rate(daily_sales):
+    if not daily_sales:
         return 0.0
 
     daily_totals = {}
-    for sale_date, quantity in sales_data:
-        day = sale_date.date()
+    for day, quantity in daily_sales:
         daily_totals[day] = daily_totals.get(day, 0) + quantity
 
     if not daily_totals:
@@ -989,6 +1813,7 @@ def _calculate_burn_rate(sales_data):
 
 
 @require_http_methods(["GET"])
+@_versioned(_stockout_etag)
 def api_ai_predict_stockout(request):
     user, error = _get_current_user(request)
     if error:
@@ -1001,26 +1826,48 @@ def api_ai_predict_stockout(request):
     except ValueError:
         return _error("days_history must be an integer.")
 
-    predictions = []
-    risky_items_count = 0
-    cutoff_date = timezone.now() - timedelta(days=days_history)
+    on_hand, daily_sales = _stockout_querysets(business, days_history)
+    return _json_response(_stockout_predictions(on_hand, daily_sales))
 
-    items = Item.objects.filter(business=business)
-    for item in items:
-        total_quantity = (
-            FolderItem.objects.filter(item=item).aggregate(total=Sum("quantity"))["total"] or 0
-        )
-        if total_quantity == 0:
-            continue
 
-        sales = EventItem.objects.filter(
+def _stockout_querysets(business, days_history):
+    """Stock on hand per item and SELL quantities per item and day; independent queries."""
+    cutoff_date = timezone.now() - timedelta(days=days_history)
+    on_hand = (
+        FolderItem.objects.filter(item__business=business)
+        .values("item_id", "item__name")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+    )
+    daily_sales = (
+        EventItem.objects.filter(
             event__business=business,
             event__type=EventType.SELL,
-            item=item,
+            item__isnull=False,
             event__created_at__gte=cutoff_date,
-        ).values_list("event__created_at", "quantity")
+        )
+        .annotate(day=TruncDate("event__created_at"))
+        .values("item_id", "day")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+    )
+    return on_hand, daily_sales
+
+
+def _stockout_predictions(on_hand, daily_sales):
+    predictions = []
+    risky_items_count = 0
+
+    sales_by_item = {}
+    for row in daily_sales:
+        sales_by_item.setdefault(row["item_id"], []).append((row["day"], row["total"]))
+
+    for row in on_hand:
+        total_quantity = row["total"] or 0
+        if total_quantity == 0:
+            continue
 
-        daily_burn_rate = _calculate_burn_rate(list(sales))
+        daily_burn_rate = _calculate_burn_rate(sales_by_item.get(row["item_id"]))
 
         if daily_burn_rate > 0:
             days_left = int(total_quantity / daily_burn_rate)
@@ -1037,8 +1884,8 @@ def api_ai_predict_stockout(request):
 
             predictions.append(
                 {
-                    "item_id": str(item.id),
-                    "item_name": item.name,
+                    "item_id": str(row["item_id"]),
+                    "item_name": row["item__name"],
                     "current_quantity": total_quantity,
                     "avg_daily_sales": round(daily_burn_rate, 2),
                     "days_until_stockout": days_left,
@@ -1048,8 +1895,8 @@ def api_ai_predict_stockout(request):
         else:
             predictions.append(
                 {
-                    "item_id": str(item.id),
-                    "item_name": item.name,
+                    "item_id": str(row["item_id"]),
+                    "item_name": row["item__name"],
                     "current_quantity": total_quantity,
                     "avg_daily_sales": 0,
                     "days_until_stockout": 999,
@@ -1058,4 +1905,4 @@ def api_ai_predict_stockout(request):
             )
 
     predictions.sort(key=lambda x: x["days_until_stockout"])
-    return _json_response({"predictions": predictions, "total_low_stock_risk": risky_items_count})
+    return {"predictions": predictions, "total_low_stock_risk": risky_items_count}
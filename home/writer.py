@@ -0,0 +1,131 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+class GroupCommitWriter:
+    """Run write jobs on one thread, committing whatever queued up together.
+
+    While a batch commits, new submissions wait in the queue; the next batch
+    takes all of them (up to ``max_batch``) in a single transaction, so the
+    write lock is taken and released once per batch rather than once per
+    request. Each job runs in its own savepoint: a job that raises is rolled
+    back alone and its caller gets the exception, while the others commit.
+    """
+
+    def __init__(self, max_batch=100):
+        self.max_batch = max_batch
+        self.batches = 0
+        self.jobs = 0
+        self.largest_batch = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, job, timeout=None):
+        """Run ``job()`` on the writer thread and return its result or raise its error."""
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((job, future))
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # A job already running will commit; wait for it rather than report a false failure.
+            if future.cancel():
+                raise
+            return future.result()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while batch[-1] is not None and len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = batch[-1] is None
+                jobs = [entry for entry in batch if entry is not None]
+                if jobs:
+                    self._commit(jobs)
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+    def _commit(self, jobs):
+        connection.close_if_unusable_or_obsolete()
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for job, future in jobs:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, job(), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # The commit itself failed; nothing in the batch was written.
+            for _, future in jobs:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        self.batches += 1
+        self.jobs += len(jobs)
+        self.largest_batch = max(self.largest_batch, len(jobs))
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter(max_batch=getattr(settings, "GROUP_COMMIT_MAX_BATCH", 100))
+        return _writer
+
+
+def stop_writer():
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def run_write(job):
+    """Run ``job()`` in a transaction, through the group-commit writer when enabled.
+
+    A caller already inside a transaction runs the job inline so it stays
+    part of that transaction.
+    """
+    if not getattr(settings, "GROUP_COMMIT", False) or connection.in_atomic_block:
+        with transaction.atomic():
+            return job()
+    return get_writer().submit(job, timeout=getattr(settings, "GROUP_COMMIT_TIMEOUT", None))